@@ -4,6 +4,7 @@ Twitter DAG is the workflow to run the pipeline tasks responsible to manipulate
 
 The expected input file format is zipfile. One zipfile at the time can be processed in each DAG run.
 Each zipfile may contain 1 or more Newline Delimited JSON file(s), for a total size of 64 mb after compression.
+Gzip, bzip2, xz compressed, or plain NDJSON files, and tar files of NDJSON files are accepted as well.
 
 A DAG run is a running instance of the workflow. It requires you to set a `COLLECTION_ID`, and a `INPUT_PATH`.
 The COLLECTION_ID is the Docker volume name with the zipfile to be manipulated. Whereas the INPUT_PATH is the zipfile name.
@@ -13,6 +14,7 @@ Ensure that the arguments in the body of the HTTP POST request are `dag_id=twitt
 """
 
 import logging
+import os
 from datetime import datetime, timedelta
 from docker.types import Mount
 from textwrap import dedent
@@ -55,16 +57,35 @@ def push_collection_id(ti=None, params=None, dag_run=None, test_mode=None):
     ti.xcom_push(key="cID", value=cID)
 
 
+# extensions of the input files, replaced in the output filepaths
+input_extensions = (".zip", ".tar", ".tgz", ".gz", ".bz2", ".xz", ".ndjson", ".jsonl")
+
+
+def get_output_filepath(fp: str, suffix: str) -> str:
+    """Output zipfile path of a task, with the given suffix added to the input fp."""
+    root = fp
+    while root.endswith(input_extensions):
+        root = os.path.splitext(root)[0]
+    return root + suffix + ".zip"
+
+
+def get_extract_options(fp: str) -> str:
+    """Options of the extract task for the input fp. Only zip files, whose members
+    are added by each upload of a collection, are extracted incrementally."""
+    return "--incremental" if fp.endswith(".zip") else ""
+
+
 @task(task_id="push_filepaths")
 def push_filepaths(ti=None, params=None, dag_run=None, test_mode=None):
     """Push filepath XCom without a specific target"""
     fp = params["INPUT_PATH"] if test_mode else dag_run.conf["INPUT_PATH"]
     ti.xcom_push(key="filepath_raw", value=fp)
     console.info("XCom filepath pushed: {}".format(fp))
+    # only the members of zip files are extracted incrementally
+    ti.xcom_push(key="extract_options", value=get_extract_options(fp))
     # suffixes added to input fp to generate output filepaths
-    file_extension = ".zip"
     for suffix in ["_extracted", "_transformed", "_annotated", "_geocoded"]:
-        output_fp = fp.replace(file_extension, suffix + file_extension)
+        output_fp = get_output_filepath(fp, suffix)
         ti.xcom_push(key="filepath" + suffix, value=output_fp)
         console.info("XCom filepath pushed: {}".format(output_fp))
 
@@ -188,7 +209,10 @@ with DAG(
         mount_tmp_dir=False,
         command='python extract_tweets.py \
         --input-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_raw") }} \
-        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_extracted") }}',
+        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_extracted") }} \
+        --seen-ids-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_extracted") }}.seen_ids \
+        --checkpoint \
+        {{ ti.xcom_pull(task_ids="push_filepaths", key="extract_options") }}',
     )
     # documentation
     extract_tweets.doc_m = dedent(
@@ -196,6 +220,10 @@ with DAG(
         #### Extract Tweets
         Extracts/creates specific fields to enforce the SMDRM Datapoint Data Model.
         It minimizes the memory consumption footprint by removing unnecessary data.
+        Tweets whose ID was already extracted to the output, by this or a previous
+        upload of the same file, are dropped. Only the zip members added since the
+        previous upload are processed by each task, and appended to its output.
+        Other input files are extracted whole.
         """
     )
 
@@ -217,7 +245,10 @@ with DAG(
         mount_tmp_dir=False,
         command='python transform_tweets.py \
         --input-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_extracted") }} \
-        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_transformed") }}',
+        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_transformed") }} \
+        --ner-cache-path /data/ner_cache.sqlite \
+        --checkpoint \
+        --incremental',
     )
     # documentation
     transform_tweets.doc_m = dedent(
@@ -225,6 +256,7 @@ with DAG(
         #### Transform Tweets
         Appy normalization transformations on the datapoint `text` field,
         and extracts place candidates for geocoding purposes.
+        NER results of texts are cached across uploads of the collection.
         """
     )
 
@@ -236,7 +268,7 @@ with DAG(
         environment={
             # TODO: parametize
             "ANNOTATOR_ID": "floods",
-            },
+        },
         image="tasks/annotate-tweets",
         docker_url=docker_url,
         network_mode="smdrm_default",
@@ -250,7 +282,9 @@ with DAG(
         mount_tmp_dir=False,
         command='python annotate_tweets.py \
         --input-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_transformed") }} \
-        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_annotated") }}',
+        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_annotated") }} \
+        --checkpoint \
+        --incremental',
     )
     # documentation
     annotate_tweets.doc_m = dedent(
@@ -277,7 +311,9 @@ with DAG(
         mount_tmp_dir=False,
         command='python geocode_tweets.py \
         --input-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_annotated") }} \
-        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_geocoded") }}',
+        --output-path {{ ti.xcom_pull(task_ids="push_filepaths", key="filepath_geocoded") }} \
+        --checkpoint \
+        --incremental',
     )
     # documentation
     geocode_tweets.doc_m = dedent(
@@ -48,6 +48,7 @@ class TestXComPush:
 
         assert ti.state == DagRunState.SUCCESS
         assert ti.xcom_pull(task_ids=task_id, key="filepath_raw") == "/data/test.zip"
+        assert ti.xcom_pull(task_ids=task_id, key="extract_options") == "--incremental"
         assert (
             ti.xcom_pull(task_ids=task_id, key="filepath_extracted")
             == "/data/test_extracted.zip"
@@ -64,3 +65,31 @@ class TestXComPush:
             ti.xcom_pull(task_ids=task_id, key="filepath_geocoded")
             == "/data/test_geocoded.zip"
         )
+
+
+@pytest.mark.parametrize(
+    "fp",
+    [
+        "/data/test.zip",
+        "/data/test.ndjson",
+        "/data/test.ndjson.gz",
+        "/data/test.tar.xz",
+        "/data/test.tgz",
+    ],
+)
+def test_get_output_filepath(fp):
+    """Test if output filepaths replace the extensions of any input file format."""
+    assert twitter.get_output_filepath(fp, "_extracted") == "/data/test_extracted.zip"
+
+
+@pytest.mark.parametrize(
+    "fp, expected",
+    [
+        ("/data/test.zip", "--incremental"),
+        ("/data/test.ndjson.gz", ""),
+        ("/data/test.tar.xz", ""),
+    ],
+)
+def test_get_extract_options(fp, expected):
+    """Test if only zip files are extracted incrementally."""
+    assert twitter.get_extract_options(fp) == expected
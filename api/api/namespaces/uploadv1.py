@@ -8,8 +8,19 @@ from api.core.triggers import AirflowJobsTrigger
 
 ns = Namespace('uploads', description='File upload operations')
 
+# content types of the input files accepted by the pipeline tasks
+upload_content_types = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-tar",
+    "application/x-ndjson",
+}
+
 parser = ns.parser()
-parser.add_argument('file', location='files', help="The zipfile to upload.",
+parser.add_argument('file', location='files', help="The zipfile, (compressed) NDJSON, or tar file to upload.",
                            type=FileStorage, required=True)
 parser.add_argument('dag_id', location='args', default="twitter", help="The ID of the Airflow DAG workflow in charge to run the pipeline.", required=True)
 parser.add_argument('collection_id', location='args', default="smdrm_uploads-volume", help="The ID of the collection from which the upload comes.", required=True)
@@ -27,17 +38,17 @@ class Uploads(Resource):
 @ns.route('/upload/')
 @ns.expect(parser)
 @ns.response(413, 'Upload exceeds the max size limit')
-@ns.response(415, 'Upload content type is not "application/zip"')
+@ns.response(415, 'Upload content type is not a zip, gzip, bzip2, xz, tar, or NDJSON file')
 class Upload(Resource):
     @ns.doc('upload_file')
     def post(self):
-        '''Upload a zipfile.'''
+        '''Upload a zipfile, (compressed) NDJSON, or tar file.'''
         args = parser.parse_args()
         # FileStorage instance
         fs = args['file']
 
-        # check if content is zip
-        if fs.content_type != "application/zip":
+        # check if content is an accepted input file
+        if fs.content_type not in upload_content_types:
             ns.abort(415)
 
         # ensure upload directory exists
@@ -37,6 +37,31 @@ def test_upload(client, monkeypatch):
         )
     assert res.json == {'filename': 'test.zip', 'airflow_response': {'airflow': 'dagrun'}}
 
+def test_upload_with_gzip_content_type(client, monkeypatch):
+    '''Test if upload endpoint accepts gzip compressed NDJSON files'''
+
+    # mock input
+    mocked_gzipfile = FileStorage(
+        stream=BytesIO(b'anything'),
+        filename="test.ndjson.gz",
+        content_type="application/gzip",
+    )
+
+    # prepare requests data
+    data = {"file": mocked_gzipfile}
+    query_string = "?dag_id=test&collection_id=42"
+
+    # apply the monkeypatch to requests.post to mock the response payload
+    monkeypatch.setattr(requests, "post", mocked_airflow_dagrun_post)
+
+    # test file upload
+    res = client.post(
+            "/api/v1/uploads/upload/"+query_string,
+            content_type='multipart/form-data',
+            data=data,
+        )
+    assert res.json == {'filename': 'test.ndjson.gz', 'airflow_response': {'airflow': 'dagrun'}}
+
 def test_upload_with_invalid_content_type(client, monkeypatch):
     '''Test if upload endpoint fails when sending POST request to Airflow API with invalid content type'''
 
@@ -60,7 +85,7 @@ def test_upload_with_invalid_content_type(client, monkeypatch):
             content_type='multipart/form-data',
             data=data,
         )
-    assert res.status_code == 415, 'Expected error code is 415 for "content_type" != "application/zip"'
+    assert res.status_code == 415, 'Expected error code is 415 for "content_type" not in upload content types'
 
 def test_upload_with_exceeded_content_length(client):
     '''Test if upload endpoint fails when sending oversized files'''
@@ -1,2 +1,2 @@
-__version__ = "0.1.10"
+__version__ = "0.1.30"
 __description__ = "Library Disaster Risk Management, a.k.a. libdrm, is the toolbox for the SMDRM pipeline tasks."
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBatchSize:
+    """Size of the requests of texts to a model API e.g. an annotator, adjusted towards
+    a target latency from the observed response times, and payload bytes.
+
+    The seconds per payload byte are estimated by an exponential moving average of
+    the observed requests, with weight smoothing for the last one. Texts are split in
+    requests of as many texts as fit in the byte budget of the target latency, within
+    min_size, and max_size texts, so that long texts are sent in smaller requests.
+    Requests are of initial_size texts, or max_size, until the first observation.
+    It is safe to use from concurrent threads."""
+
+    def __init__(
+        self,
+        target_latency: float,
+        min_size: int = 1,
+        max_size: int = 1000,
+        initial_size: int = None,
+        smoothing: float = 0.5,
+    ):
+        if not 0 < min_size <= max_size:
+            raise ValueError("Sizes must be 0 < min_size <= max_size.")
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.initial_size = min(max(initial_size or max_size, min_size), max_size)
+        self.smoothing = smoothing
+        self.seconds_per_byte = None
+        # sizes, and latencies of the observed requests
+        self.sizes = []
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def split(self, texts: typing.List[str]) -> typing.Iterable[typing.List[str]]:
+        """Split texts in consecutive requests, sized by the current estimate."""
+        start = 0
+        while start < len(texts):
+            with self.lock:
+                seconds_per_byte = self.seconds_per_byte
+            if seconds_per_byte is None:
+                end = start + self.initial_size
+            else:
+                budget = self.target_latency / seconds_per_byte
+                end = start
+                payload_bytes = 0
+                while end < len(texts) and end - start < self.max_size:
+                    payload_bytes += len(texts[end].encode("utf-8"))
+                    if end - start >= self.min_size and payload_bytes > budget:
+                        break
+                    end += 1
+            yield texts[start:end]
+            start = end
+
+    def observe(self, size: int, payload_bytes: int, latency: float) -> None:
+        """Update the estimate with the latency of a request of size texts."""
+        seconds_per_byte = latency / max(payload_bytes, 1)
+        with self.lock:
+            if self.seconds_per_byte is None:
+                self.seconds_per_byte = seconds_per_byte
+            else:
+                self.seconds_per_byte += self.smoothing * (
+                    seconds_per_byte - self.seconds_per_byte
+                )
+            self.sizes.append(size)
+            self.latencies.append(latency)
+        logger.debug(
+            dict(request_size=size, payload_bytes=payload_bytes, latency=latency)
+        )
+
+    def call(
+        self, func: typing.Callable, texts: typing.List[str]
+    ) -> typing.Iterable[typing.Tuple[typing.List[str], typing.Any]]:
+        """Call func on the requests texts are split in, and observe their latency.
+        Yields each request, and the result of func."""
+        for request in self.split(texts):
+            start = time.perf_counter()
+            result = func(request)
+            self.observe(
+                len(request),
+                sum(len(text.encode("utf-8")) for text in request),
+                time.perf_counter() - start,
+            )
+            yield request, result
+
+    def get_stats(self) -> dict:
+        """Statistics of the sizes, and latencies of the observed requests."""
+        with self.lock:
+            sizes = list(self.sizes)
+            latencies = sorted(self.latencies)
+        if not sizes:
+            return dict(requests=0)
+        return dict(
+            requests=len(sizes),
+            request_size_min=min(sizes),
+            request_size_mean=round(sum(sizes) / len(sizes), 2),
+            request_size_max=max(sizes),
+            request_size_last=sizes[-1],
+            latency_mean=round(sum(latencies) / len(latencies), 4),
+            latency_p95=round(latencies[int(0.95 * (len(latencies) - 1))], 4),
+            latency_max=round(latencies[-1], 4),
+        )
@@ -0,0 +1,118 @@
+import logging
+import os
+import shutil
+import typing
+
+from . import jsoncodec
+
+logger = logging.getLogger(__name__)
+
+
+def write_durably(path: str, data: bytes) -> None:
+    """Write data to path atomically, and flush it to disk.
+    A partially written file never replaces a previous version of path."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # persist the directory entry of the renamed file
+    dir_fd = os.open(os.path.dirname(path) or os.curdir, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class Checkpoint:
+    """Progress of a task at batch granularity, to resume it after a failure.
+
+    Output batches are committed to a directory next to the output path, each as
+    a durable N.ndjson file, with a manifest of the number of input datapoints consumed
+    to produce them. A task restarted with the same input, and options skips the
+    consumed input datapoints, and appends new batches to the committed ones.
+
+    Input datapoints must map to output batches sequentially i.e. pipeline steps must
+    not read ahead of the batches they yield, as parallel steps do."""
+
+    def __init__(self, output_path: str, input_path: str, options: dict = None):
+        self.directory = output_path + ".ckpt"
+        stat = os.stat(input_path)
+        self.fingerprint = dict(
+            input_path=os.path.abspath(input_path),
+            input_size=stat.st_size,
+            input_mtime_ns=stat.st_mtime_ns,
+            options=options or {},
+        )
+        # committed output batches, and the input datapoints consumed to produce them
+        self.batches = 0
+        self.consumed = 0
+        # input datapoints pulled by the pipeline, skipped ones included
+        self.pulled = 0
+        self.load()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def get_part_path(self, batch_id: int) -> str:
+        return os.path.join(self.directory, "{}.ndjson".format(batch_id))
+
+    def load(self) -> None:
+        """Load the committed progress. Progress of a different input, or options is discarded."""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "rb") as f:
+            manifest = jsoncodec.loads(f.read())
+        if manifest["fingerprint"] != self.fingerprint:
+            logger.warning("Checkpoint of a different input, or options. Discarded.")
+            self.clear()
+            return
+        self.batches = manifest["batches"]
+        self.consumed = manifest["consumed"]
+        logger.info(
+            "Resume after batch {} with {} input datapoints consumed.".format(
+                self.batches, self.consumed
+            )
+        )
+
+    def iter_input(self, datapoints: typing.Iterable[dict]) -> typing.Iterable[dict]:
+        """Iterate input datapoints that have not been consumed yet, and count them."""
+        for datapoint in datapoints:
+            self.pulled += 1
+            if self.pulled <= self.consumed:
+                continue
+            yield datapoint
+
+    def track(
+        self, batches: typing.Iterable[str]
+    ) -> typing.Iterable[typing.Tuple[str, int]]:
+        """Iterate output batches with the number of input datapoints consumed so far.
+        The number is taken when the batch is yielded, before any read ahead."""
+        for batch in batches:
+            yield batch, self.pulled
+
+    def commit(self, batch: typing.Union[bytes, str], consumed: int) -> None:
+        """Commit an output batch durably, then the progress manifest."""
+        os.makedirs(self.directory, exist_ok=True)
+        if isinstance(batch, str):
+            batch = batch.encode("utf-8")
+        write_durably(self.get_part_path(self.batches + 1), batch)
+        manifest = dict(
+            fingerprint=self.fingerprint, batches=self.batches + 1, consumed=consumed
+        )
+        write_durably(self.manifest_path, jsoncodec.dumps(manifest).encode("utf-8"))
+        self.batches += 1
+        self.consumed = consumed
+
+    def iter_parts(self) -> typing.Iterable[typing.Tuple[int, str]]:
+        """Iterate batch ID, and path of the committed output batches."""
+        for batch_id in range(1, self.batches + 1):
+            yield batch_id, self.get_part_path(batch_id)
+
+    def clear(self) -> None:
+        """Remove the committed progress."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.batches = 0
+        self.consumed = 0
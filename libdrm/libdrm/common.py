@@ -1,5 +1,9 @@
+import collections
+import concurrent.futures
 import os
 import functools
+import queue
+import threading
 import time
 import typing
 
@@ -16,7 +20,7 @@ def path_arg(path: str) -> str:
     if not os.path.exists(path):
         raise FileNotFoundError("Path not found.")
     if os.path.isdir(path):
-        raise ValueError("Path is a directory, but a zip file is expected.")
+        raise ValueError("Path is a directory, but an input file is expected.")
     return os.path.abspath(path)
 
 
@@ -30,14 +34,98 @@ def iter_in_batches(
         batch.append(line)
         if len(batch) == batch_size:
             yield batch
-            # flush batch
-            batch.clear()
+            # new batch, consumers may keep a reference to the yielded one
+            batch = []
         continue
     # ensure all data points are yielded
     if batch:
         yield batch
 
 
+def iter_bounded_map(
+    executor: concurrent.futures.Executor,
+    func: typing.Callable,
+    iterable: typing.Iterable[tuple],
+    max_pending: int,
+    ordered: bool = True,
+) -> typing.Iterable:
+    """Iterate results of func applied to each tuple of arguments in iterable via executor.
+    At most max_pending calls are in flight, so that large inputs are not submitted at once.
+    Results follow the input order, unless ordered is False (results as they complete)."""
+    pending = collections.deque()
+    for args in iterable:
+        pending.append(executor.submit(func, *args))
+        if len(pending) < max_pending:
+            continue
+        if ordered:
+            yield pending.popleft().result()
+        else:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                pending.remove(future)
+                yield future.result()
+    # drain calls still in flight
+    if not ordered:
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+        return
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_in_thread(iterable: typing.Iterable, maxsize: int) -> typing.Iterable:
+    """Iterate an iterable consumed by a background thread through a bounded queue.
+    The thread produces at most maxsize items ahead of the consumer, so that
+    producer, and consumer overlap while memory stays capped.
+    Exceptions raised by the iterable are raised to the consumer."""
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    # end of iteration marker
+    done = object()
+
+    def put(item) -> bool:
+        """Put item in queue unless the consumer stopped. Return False if it did."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    # close upstream generators e.g. chained threads, in this thread
+                    close = getattr(iterator, "close", None)
+                    if close is not None:
+                        close()
+                    return
+        except BaseException as exc:
+            put((done, exc))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+    finally:
+        # release the producer if the consumer is closed before the end
+        stop.set()
+        producer.join()
+
+
 def log_execution(logger):
     """Log elapsed time for successful execution, or Exception for failure for a decodated function."""
 
@@ -1,8 +1,27 @@
-import json
+import abc
+import bz2
+import concurrent.futures
+import gzip
+import lzma
+import os
 import pydantic
+import pydantic.fields
+import pydantic.utils
+import shutil
+import tarfile
 import typing
 import zipfile
 
+from . import jsoncodec
+from .checkpoints import Checkpoint
+from .common import iter_bounded_map, iter_in_batches, iter_in_thread
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
 
 class DataPointModel(pydantic.BaseModel, extra=pydantic.Extra.ignore):
     """A Pydantic validator class.
@@ -21,9 +40,127 @@ class DataPointModel(pydantic.BaseModel, extra=pydantic.Extra.ignore):
     annotation: typing.Optional[dict] = None
 
 
+# field types whose exact instances pass pydantic validation unchanged
+fast_types = (int, float, str, bool, dict, list)
+
+
+def compile_validator(
+    model: typing.Type[pydantic.BaseModel],
+) -> typing.Callable[[dict], dict]:
+    """Compile a validator of JSON dictionaries specialised for the fields of a model.
+    It returns model.parse_obj(obj).dict() with the same semantics: unknown fields are
+    ignored, required fields fail if missing, and optional fields get their defaults.
+
+    The compiled function checks each field value for the exact field type only, and
+    falls back to pydantic to coerce (e.g. a string ID) or report errors otherwise.
+    Models with custom validators, or string constraints always use pydantic."""
+
+    def parse_obj(obj: dict) -> dict:
+        return model.parse_obj(obj).dict()
+
+    config = model.__config__
+    if (
+        model.__pre_root_validators__
+        or model.__post_root_validators__
+        or config.anystr_strip_whitespace
+        or config.anystr_lower
+        or getattr(config, "anystr_upper", False)
+        or config.min_anystr_length
+        or config.max_anystr_length is not None
+        or config.extra != pydantic.Extra.ignore
+    ):
+        return parse_obj
+    namespace = dict(parse_obj=parse_obj, smart_deepcopy=pydantic.utils.smart_deepcopy)
+    lines = [
+        "def validate(obj):",
+        "    if type(obj) is not dict:",
+        "        return parse_obj(obj)",
+    ]
+    names = []
+    for i, (name, field) in enumerate(model.__fields__.items()):
+        if (
+            field.class_validators
+            or field.shape != pydantic.fields.SHAPE_SINGLETON
+            or field.outer_type_ not in fast_types
+        ):
+            return parse_obj
+        value = "v{}".format(i)
+        namespace["t{}".format(i)] = field.outer_type_
+        if field.required:
+            lines.append("    {} = obj.get({!r}, parse_obj)".format(value, field.alias))
+            lines.append("    if {} is parse_obj:".format(value))
+            lines.append("        return parse_obj(obj)")
+        else:
+            namespace["d{}".format(i)] = field.default
+            lines.append("    {} = obj.get({!r}, parse_obj)".format(value, field.alias))
+            lines.append("    if {} is parse_obj:".format(value))
+            lines.append("        {} = smart_deepcopy(d{})".format(value, i))
+        check = "type({}) is not t{}".format(value, i)
+        if field.allow_none:
+            check = "{} is not None and {}".format(value, check)
+        lines.append("    elif {}:".format(check))
+        lines.append("        return parse_obj(obj)")
+        names.append("{!r}: {}".format(name, value))
+    lines.append("    return {{{}}}".format(", ".join(names)))
+    exec("\n".join(lines), namespace)
+    return namespace["validate"]
+
+
+# fast equivalent of DataPointModel.parse_obj(obj).dict()
+parse_datapoint = compile_validator(DataPointModel)
+
+
+def parse_json_line(json_bytes: bytes) -> typing.Optional[dict]:
+    """Parse a JSON line. Return None if the line is not valid JSON."""
+    try:
+        return jsoncodec.loads(json_bytes)
+    except jsoncodec.DecodeError:
+        return None
+
+
+def read_member_chunk(
+    path: str, member: str, start: int, end: int
+) -> typing.List[typing.Optional[dict]]:
+    """Decompress, and parse the lines of a zip file member that begin
+    within the [start, end) byte range of its uncompressed content.
+    The line that crosses the start offset belongs to the previous chunk."""
+    json_lines = []
+    with zipfile.ZipFile(path, "r") as archive:
+        with archive.open(member) as content:
+            position = start
+            if start > 0:
+                # seeking compressed members decompresses the skipped bytes
+                content.seek(start - 1)
+                position = start - 1 + len(content.readline())
+            while position < end:
+                line = content.readline()
+                if not line:
+                    break
+                position += len(line)
+                json_lines.append(parse_json_line(line))
+    return json_lines
+
+
+def get_zip_compressions() -> typing.Dict[str, int]:
+    """Zip compression methods available in the current environment."""
+    compressions = {
+        "stored": zipfile.ZIP_STORED,
+        "deflate": zipfile.ZIP_DEFLATED,
+        "bzip2": zipfile.ZIP_BZIP2,
+        "lzma": zipfile.ZIP_LZMA,
+    }
+    # Python 3.14+
+    if hasattr(zipfile, "ZIP_ZSTANDARD"):
+        compressions["zstd"] = zipfile.ZIP_ZSTANDARD
+    return compressions
+
+
 class ZipFileModel:
     """A class representation to handle input zip files"""
 
+    extension = ".zip"
+    compressions = get_zip_compressions()
+
     def __init__(self, path: str):
         self.path = path
 
@@ -31,27 +168,375 @@ class ZipFileModel:
         """Return False is path is not a zip file or it does not exist."""
         return zipfile.is_zipfile(self.path)
 
-    def iter_bytes(self) -> typing.Iterable[bytes]:
+    def get_members(self) -> typing.Dict[str, int]:
+        """CRC-32 of the member files by name, from the zip central directory."""
+        with zipfile.ZipFile(self.path, "r") as archive:
+            return {
+                zip_info.filename: zip_info.CRC
+                for zip_info in archive.infolist()
+                if not zip_info.is_dir()
+            }
+
+    def iter_bytes(
+        self, members: typing.Collection[str] = None
+    ) -> typing.Iterable[bytes]:
         """Iterate content of extracted files from a zip file,
-        one line at the time."""
+        one line at the time. Only the given members are extracted, if any."""
         with zipfile.ZipFile(self.path, "r") as archive:
             for zip_ext_file in archive.infolist():
+                if members is not None and zip_ext_file.filename not in members:
+                    continue
                 with archive.open(zip_ext_file) as content:
                     yield from content
 
-    def iter_jsonl(self) -> typing.Iterable[dict]:
+    def iter_chunks(
+        self,
+        chunk_size: int = 8 * 1024 * 1024,
+        members: typing.Collection[str] = None,
+    ) -> typing.Iterable[typing.Tuple[str, str, int, int]]:
+        """Iterate (path, member, start, end) byte ranges of the uncompressed members.
+        Members larger than chunk_size are split in multiple ranges."""
+        with zipfile.ZipFile(self.path, "r") as archive:
+            for zip_info in archive.infolist():
+                if zip_info.is_dir():
+                    continue
+                if members is not None and zip_info.filename not in members:
+                    continue
+                for start in range(0, max(zip_info.file_size, 1), chunk_size):
+                    end = min(start + chunk_size, zip_info.file_size)
+                    yield self.path, zip_info.filename, start, end
+
+    def iter_jsonl(
+        self,
+        workers: int = 0,
+        ordered: bool = True,
+        chunk_size: int = 8 * 1024 * 1024,
+        members: typing.Collection[str] = None,
+    ) -> typing.Iterable[dict]:
         """Iterate content of extracted files from a zip file,
-        one line at the time but converted to JSON."""
-        for json_bytes in self.iter_bytes():
-            try:
-                yield json.loads(json_bytes)
-            except json.decoder.JSONDecodeError:
-                # empty dict at failure
-                yield None
-
-    def cache(self, output_path: str, jsonl_batch_gen: typing.Iterable[str]) -> None:
-        """Cache processed NDJSON batches to zip file and collect metrics."""
-        with zipfile.ZipFile(output_path, "w") as zf:
-            for batch_id, batch_jsonl in enumerate(jsonl_batch_gen, start=1):
-                # write ndjson batch to zip file
-                zf.writestr("{}.ndjson".format(batch_id), batch_jsonl)
+        one line at the time but converted to JSON. Invalid JSON lines are None.
+        Only the given members are extracted, if any.
+
+        When workers > 1, members (and chunks of chunk_size bytes of large members)
+        are decompressed and parsed in a pool of worker processes.
+        Lines are yielded in archive order, unless ordered is False."""
+        if workers <= 1:
+            for json_bytes in self.iter_bytes(members=members):
+                yield parse_json_line(json_bytes)
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = iter_bounded_map(
+                executor,
+                read_member_chunk,
+                self.iter_chunks(chunk_size=chunk_size, members=members),
+                max_pending=2 * workers,
+                ordered=ordered,
+            )
+            for json_lines in chunks:
+                yield from json_lines
+
+    def cache(
+        self,
+        output_path: str,
+        jsonl_batch_gen: typing.Iterable[str],
+        compression: str = "stored",
+        compresslevel: int = None,
+        queue_size: int = 0,
+        checkpoint: Checkpoint = None,
+        append: bool = False,
+    ) -> None:
+        """Cache processed NDJSON batches to zip file and collect metrics.
+
+        Batches are compressed with the given compression method, and level.
+        With queue_size > 0, batches are produced in a background thread, at most
+        queue_size ahead, so that upstream processing overlaps with compression.
+        With a checkpoint, batches are committed to it as they are produced, and
+        the zip file is assembled from the committed batches at the end.
+        With append, batches are numbered after the members of an existing zip file.
+        They are appended to a copy of it, which replaces it once complete."""
+        if compression not in self.compressions:
+            raise ValueError("Zip compression {} is not available.".format(compression))
+        if checkpoint is not None:
+            # consumed input is counted before the batches are queued
+            jsonl_batch_gen = checkpoint.track(jsonl_batch_gen)
+        if queue_size > 0:
+            jsonl_batch_gen = iter_in_thread(jsonl_batch_gen, maxsize=queue_size)
+        if checkpoint is not None:
+            for batch_jsonl, consumed in jsonl_batch_gen:
+                checkpoint.commit(batch_jsonl, consumed)
+        write_path, mode, batches = output_path, "w", 0
+        if append and zipfile.is_zipfile(output_path):
+            # a failed append leaves the existing zip file unchanged
+            with zipfile.ZipFile(output_path, "r") as zf:
+                batches = len(zf.infolist())
+            write_path, mode = output_path + ".tmp", "a"
+            shutil.copyfile(output_path, write_path)
+        try:
+            with zipfile.ZipFile(
+                write_path,
+                mode,
+                compression=self.compressions[compression],
+                compresslevel=compresslevel,
+            ) as zf:
+                if checkpoint is not None:
+                    for batch_id, part_path in checkpoint.iter_parts():
+                        zf.write(
+                            part_path, arcname="{}.ndjson".format(batches + batch_id)
+                        )
+                    jsonl_batch_gen = ()
+                for batch_id, batch_jsonl in enumerate(jsonl_batch_gen, start=1):
+                    # write ndjson batch to zip file
+                    zf.writestr("{}.ndjson".format(batches + batch_id), batch_jsonl)
+        except BaseException:
+            if write_path != output_path:
+                os.remove(write_path)
+            raise
+        if write_path != output_path:
+            os.replace(write_path, output_path)
+        if checkpoint is not None:
+            checkpoint.clear()
+
+
+class ArrowFileModel:
+    """A class representation to handle Arrow IPC stream files of datapoints.
+    It is the columnar alternative to the NDJSON batches in a zip file.
+
+    Each cached batch is a record batch with the DataPointModel fields as columns.
+    Repeated strings (created_at, text) are dictionary encoded. Nested fields (place,
+    annotation) are JSON encoded strings. Fields not in DataPointModel are dropped."""
+
+    extension = ".arrows"
+    # Arrow IPC buffer compressions
+    compressions = ("stored", "lz4", "zstd")
+    # JSON encoded columns
+    json_fields = ("place", "annotation")
+
+    def __init__(self, path: str):
+        if pyarrow is None:
+            raise ImportError("pyarrow is required by the Arrow file format.")
+        self.path = path
+
+    @staticmethod
+    def get_schema() -> "pyarrow.Schema":
+        """Arrow schema of the datapoints."""
+        dict_string = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        return pyarrow.schema(
+            [
+                ("id", pyarrow.int64()),
+                ("created_at", dict_string),
+                ("text", dict_string),
+                ("text_clean", pyarrow.string()),
+                ("place", pyarrow.string()),
+                ("annotation", pyarrow.string()),
+            ]
+        )
+
+    def is_valid(self) -> bool:
+        """Return False is path is not an Arrow IPC stream or it does not exist."""
+        try:
+            with pyarrow.OSFile(self.path, "rb") as source:
+                pyarrow.ipc.open_stream(source)
+        except (pyarrow.ArrowInvalid, OSError):
+            return False
+        return True
+
+    def iter_batches(
+        self, columns: typing.List[str] = None
+    ) -> typing.Iterable[typing.List[dict]]:
+        """Iterate batches of datapoints. Only the given columns are converted, if any."""
+        with pyarrow.memory_map(self.path, "r") as source:
+            reader = pyarrow.ipc.open_stream(source)
+            names = columns or reader.schema.names
+            for record_batch in reader:
+                values = []
+                for name in names:
+                    column = record_batch.column(name).to_pylist()
+                    if name in self.json_fields:
+                        column = [
+                            None if value is None else jsoncodec.loads(value)
+                            for value in column
+                        ]
+                    values.append(column)
+                yield [dict(zip(names, row)) for row in zip(*values)]
+
+    def iter_jsonl(
+        self, columns: typing.List[str] = None, workers: int = 0
+    ) -> typing.Iterable[dict]:
+        """Iterate datapoints, one at the time. Only the given columns are converted, if any.
+        Workers are ignored, batches are memory mapped, and decoded in the current process."""
+        for batch in self.iter_batches(columns=columns):
+            yield from batch
+
+    def to_record_batch(self, datapoints: typing.List[dict]) -> "pyarrow.RecordBatch":
+        """Convert a batch of datapoints into an Arrow record batch."""
+        schema = self.get_schema()
+        arrays = []
+        for field in schema:
+            values = [datapoint.get(field.name) for datapoint in datapoints]
+            if field.name in self.json_fields:
+                values = [
+                    None if value is None else jsoncodec.dumps(value)
+                    for value in values
+                ]
+            if pyarrow.types.is_dictionary(field.type):
+                array = pyarrow.array(values, type=field.type.value_type)
+                arrays.append(array.dictionary_encode())
+            else:
+                arrays.append(pyarrow.array(values, type=field.type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def cache(
+        self,
+        output_path: str,
+        datapoints_batches: typing.Iterable[typing.List[dict]],
+        compression: str = "stored",
+        compresslevel: int = None,
+        queue_size: int = 0,
+        checkpoint: Checkpoint = None,
+        append: bool = False,
+    ) -> None:
+        """Cache batches of datapoints to an Arrow IPC stream file.
+        Options are the same of ZipFileModel.cache(), with Arrow IPC buffer compressions.
+        Checkpoints, and append are not supported."""
+        if checkpoint is not None or append:
+            raise ValueError("Checkpoints, and append require the ndjson format.")
+        if compression not in self.compressions:
+            raise ValueError(
+                "Arrow compression {} is not available.".format(compression)
+            )
+        options = pyarrow.ipc.IpcWriteOptions()
+        if compression != "stored":
+            options.compression = pyarrow.Codec(
+                compression, compression_level=compresslevel
+            )
+        if queue_size > 0:
+            datapoints_batches = iter_in_thread(datapoints_batches, maxsize=queue_size)
+        with pyarrow.OSFile(output_path, "wb") as sink:
+            with pyarrow.ipc.new_stream(
+                sink, self.get_schema(), options=options
+            ) as writer:
+                for datapoints in datapoints_batches:
+                    writer.write_batch(self.to_record_batch(datapoints))
+
+
+# magic numbers of the compressed streams, and their readers
+stream_compressions = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+
+
+def open_decompressed(fileobj: typing.BinaryIO) -> typing.BinaryIO:
+    """Wrap a buffered binary file in the reader of its compression, if any.
+    The compression is sniffed from the magic number of the content."""
+    magic = fileobj.peek(6)[:6]
+    for signature, reader in stream_compressions:
+        if magic.startswith(signature):
+            return reader(fileobj, "rb")
+    return fileobj
+
+
+def parse_json_lines(lines: typing.List[bytes]) -> typing.List[typing.Optional[dict]]:
+    return [parse_json_line(line) for line in lines]
+
+
+class StreamFileModel(abc.ABC):
+    """Base class of the input files that are read as a stream of NDJSON lines.
+    Subclasses implement is_valid(), and iter_bytes()."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abc.abstractmethod
+    def is_valid(self) -> bool:
+        """Return False if path is not a file of the subclass format."""
+
+    @abc.abstractmethod
+    def iter_bytes(self) -> typing.Iterable[bytes]:
+        """Iterate the lines of the stream as bytes."""
+
+    def iter_jsonl(
+        self,
+        workers: int = 0,
+        ordered: bool = True,
+        chunk_size: int = 10000,
+    ) -> typing.Iterable[dict]:
+        """Iterate lines of the stream converted to JSON. Invalid JSON lines are None.
+        Same as ZipFileModel.iter_jsonl(), but the stream is decompressed in the current
+        process, and only chunks of chunk_size lines are parsed by the worker processes."""
+        if workers <= 1:
+            for json_bytes in self.iter_bytes():
+                yield parse_json_line(json_bytes)
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = iter_bounded_map(
+                executor,
+                parse_json_lines,
+                ((chunk,) for chunk in iter_in_batches(self.iter_bytes(), chunk_size)),
+                max_pending=2 * workers,
+                ordered=ordered,
+            )
+            for json_lines in chunks:
+                yield from json_lines
+
+
+class NDJSONFileModel(StreamFileModel):
+    """A class representation to handle plain, gzip, bzip2, or xz compressed NDJSON files."""
+
+    def is_valid(self) -> bool:
+        """Return False if path does not begin with a JSON object once decompressed."""
+        try:
+            with open(self.path, "rb") as f:
+                head = open_decompressed(f).read(4096)
+        except (OSError, EOFError, lzma.LZMAError):
+            return False
+        return head.lstrip().startswith(b"{")
+
+    def iter_bytes(self) -> typing.Iterable[bytes]:
+        """Iterate decompressed lines of the file, one line at the time."""
+        with open(self.path, "rb") as f:
+            yield from open_decompressed(f)
+
+
+class TarFileModel(StreamFileModel):
+    """A class representation to handle input tar files, compressed or not.
+    Members are NDJSON files, compressed or not."""
+
+    def is_valid(self) -> bool:
+        """Return False is path is not a tar file or it does not exist."""
+        try:
+            return tarfile.is_tarfile(self.path)
+        except OSError:
+            return False
+
+    def iter_bytes(self) -> typing.Iterable[bytes]:
+        """Iterate decompressed lines of the tar file members, one line at the time.
+        The tar file is read sequentially, without seeking its compressed stream."""
+        with tarfile.open(self.path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                yield from open_decompressed(archive.extractfile(member))
+
+
+# file models by task output format
+file_models = {"ndjson": ZipFileModel, "arrow": ArrowFileModel}
+
+
+def open_file_model(
+    path: str,
+) -> typing.Union[ZipFileModel, ArrowFileModel, StreamFileModel]:
+    """Get the file model of the given path wrt its content.
+    Zip, Arrow IPC stream, and tar files are recognized, in this order.
+    Other contents default to NDJSONFileModel, whose is_valid() sniffs their compression."""
+    if zipfile.is_zipfile(path):
+        return ZipFileModel(path)
+    if pyarrow is not None:
+        arrow_file = ArrowFileModel(path)
+        if arrow_file.is_valid():
+            return arrow_file
+    tar_file = TarFileModel(path)
+    if tar_file.is_valid():
+        return tar_file
+    return NDJSONFileModel(path)
@@ -0,0 +1,55 @@
+import logging
+import os
+import typing
+
+from . import jsoncodec
+from .checkpoints import write_durably
+
+logger = logging.getLogger(__name__)
+
+
+class MembersManifest:
+    """Members of an input zip file already processed by a task, to process only the
+    members added to it afterwards e.g. when a collection is uploaded again with new data.
+
+    Members are identified by name, and CRC-32 from the zip central directory, so that
+    a change to a processed member is detected. The manifest is saved durably
+    to path, once the output of the new members is complete. It is discarded if the
+    output_path it describes, if any, does not exist anymore."""
+
+    def __init__(self, path: str, output_path: str = None):
+        self.path = path
+        # CRC-32 by member name
+        self.members = {}
+        if output_path is not None and not os.path.exists(output_path):
+            return
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                self.members = jsoncodec.loads(f.read())["members"]
+
+    def get_new_members(self, members: typing.Dict[str, int]) -> typing.List[str]:
+        """Names of the given members, with their CRC-32, that are not processed yet.
+        If a processed member changed, or was removed, its output is stale, and can not
+        be removed from the appended output: the manifest is reset, and all members are
+        returned, so that the task rebuilds its output instead of appending to it."""
+        stale = [name for name, crc in self.members.items() if members.get(name) != crc]
+        if stale:
+            logger.warning(
+                "Members {} changed, or were removed. Output is rebuilt.".format(stale)
+            )
+            self.members = {}
+        new_members = [name for name in members if name not in self.members]
+        logger.info(
+            dict(
+                processed_members=len(members) - len(new_members),
+                new_members=len(new_members),
+            )
+        )
+        return new_members
+
+    def add(self, members: typing.Dict[str, int]) -> None:
+        """Add processed members, and save the manifest."""
+        self.members.update(members)
+        write_durably(
+            self.path, jsoncodec.dumps(dict(members=self.members)).encode("utf-8")
+        )
@@ -0,0 +1,110 @@
+import json
+import typing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JSONCodec:
+    """JSON codec based on the Python standard library.
+    Encoded JSON is not ASCII escaped, so that non-latin texts keep their size."""
+
+    name = "json"
+    # exceptions raised on invalid input
+    errors = (json.decoder.JSONDecodeError, UnicodeDecodeError)
+
+    def loads(self, data: typing.Union[bytes, str]) -> typing.Any:
+        return json.loads(data)
+
+    def dumps(self, obj: typing.Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    def dumps_ndjson(self, objs: typing.Iterable[typing.Any]) -> str:
+        """Encode an iterable of objects as Newline Delimited JSON."""
+        return "".join([self.dumps(obj) + "\n" for obj in objs])
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON codec based on orjson."""
+
+    name = "orjson"
+    errors = (orjson.JSONDecodeError,) if orjson else ()
+
+    def loads(self, data: typing.Union[bytes, str]) -> typing.Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: typing.Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def dumps_ndjson(self, objs: typing.Iterable[typing.Any]) -> str:
+        option = orjson.OPT_APPEND_NEWLINE
+        return b"".join([orjson.dumps(obj, option=option) for obj in objs]).decode(
+            "utf-8"
+        )
+
+
+class MsgspecCodec(JSONCodec):
+    """JSON codec based on msgspec."""
+
+    name = "msgspec"
+    errors = (msgspec.DecodeError,) if msgspec else ()
+
+    def __init__(self):
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+
+    def loads(self, data: typing.Union[bytes, str]) -> typing.Any:
+        return self.decoder.decode(data)
+
+    def dumps(self, obj: typing.Any) -> str:
+        return self.encoder.encode(obj).decode("utf-8")
+
+    def dumps_ndjson(self, objs: typing.Iterable[typing.Any]) -> str:
+        buffer = bytearray()
+        for obj in objs:
+            self.encoder.encode_into(obj, buffer, -1)
+            buffer.extend(b"\n")
+        return buffer.decode("utf-8")
+
+
+def available_codecs() -> typing.List[str]:
+    """Names of the codecs that can be used in the current environment."""
+    names = [JSONCodec.name]
+    if orjson is not None:
+        names.append(OrjsonCodec.name)
+    if msgspec is not None:
+        names.append(MsgspecCodec.name)
+    return names
+
+
+def get_codec(name: str = None) -> JSONCodec:
+    """Get a JSON codec by name, or the fastest one available if name is None."""
+    codecs = {
+        JSONCodec.name: JSONCodec,
+        OrjsonCodec.name: OrjsonCodec,
+        MsgspecCodec.name: MsgspecCodec,
+    }
+    available = available_codecs()
+    if name is None:
+        # prefer third party codecs, orjson first
+        name = available[1] if len(available) > 1 else JSONCodec.name
+    if name not in available:
+        raise ValueError("JSON codec {} is not available.".format(name))
+    return codecs[name]()
+
+
+# default codec
+codec = get_codec()
+
+# shortcuts to the default codec
+DecodeError = codec.errors
+loads = codec.loads
+dumps = codec.dumps
+dumps_ndjson = codec.dumps_ndjson
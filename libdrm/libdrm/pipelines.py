@@ -1,21 +1,215 @@
+import concurrent.futures
+import logging
+import resource
+import time
 import typing
 
+from . import jsoncodec
+from .common import iter_bounded_map, iter_in_batches, iter_in_thread
+
+logger = logging.getLogger(__name__)
+
+# step, and its keyword arguments, of the pipeline run by a worker process
+_worker_step = None
+
+
+def _init_worker(step: typing.Callable, kwargs: typing.Optional[dict]) -> None:
+    """Set the step run by the worker process.
+    Step arguments are sent once per worker instead of once per chunk."""
+    global _worker_step
+    _worker_step = (step, kwargs)
+
+
+def _run_worker_step(chunk: list) -> list:
+    """Run the worker process step on a chunk of items."""
+    step, kwargs = _worker_step
+    return list(step(iter(chunk), **kwargs) if kwargs else step(iter(chunk)))
+
+
+class ParallelStep:
+    """A pipeline step whose input is split into chunks processed in a pool of processes.
+    Output chunks are reassembled in input order. At most max_chunks are in flight.
+
+    The step must be picklable, and stateless across items i.e. it should not
+    aggregate the stream (e.g. metrics), because each chunk is processed independently."""
+
+    def __init__(
+        self,
+        step: typing.Callable,
+        workers: int,
+        chunk_size: int = 1000,
+        max_chunks: int = None,
+    ):
+        self.step = step
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks or 2 * workers
+        self.__name__ = getattr(step, "__name__", type(step).__name__)
+
+    def __call__(self, iterator: typing.Iterable, **kwargs) -> typing.Iterable:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.step, kwargs),
+        ) as executor:
+            chunks = iter_bounded_map(
+                executor,
+                _run_worker_step,
+                ((chunk,) for chunk in iter_in_batches(iterator, self.chunk_size)),
+                max_pending=self.max_chunks,
+            )
+            for chunk in chunks:
+                yield from chunk
+
+
+class ThreadedStep:
+    """A pipeline step that runs in its own thread, connected to the downstream step
+    by a queue of at most queue_size items. The bounded queue provides backpressure.
+
+    Threads overlap I/O bound steps (e.g. HTTP requests) with the other steps,
+    but CPU bound steps still share the interpreter lock."""
+
+    def __init__(self, step: typing.Callable, queue_size: int):
+        self.step = step
+        self.queue_size = queue_size
+        self.__name__ = get_step_name(step)
+
+    def __call__(self, iterator: typing.Iterable, **kwargs) -> typing.Iterable:
+        output = self.step(iterator, **kwargs) if kwargs else self.step(iterator)
+        return iter_in_thread(output, maxsize=self.queue_size)
+
+
+class StepProfile:
+    """Items, and time spent in the next() calls of a step output.
+    The time is inclusive of the upstream steps, pulled by the step to produce its items.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def profile(self, iterator: typing.Iterable) -> typing.Iterable:
+        """Iterate items of the step output, and collect its profile."""
+        iterator = iter(iterator)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds += time.perf_counter() - start
+                return
+            self.seconds += time.perf_counter() - start
+            self.items += 1
+            yield item
+
+
+def get_step_name(step: typing.Callable) -> str:
+    return getattr(step, "__name__", type(step).__name__)
+
 
 class Pipeline:
     """Pipeline Class represents a data pipeline made by a concatenation of steps.
-    Each step is generator that applies a specific transformation to the stream of data."""
+    Each step is generator that applies a specific transformation to the stream of data.
+
+    With profile=True, each step is instrumented, and a JSON report with the items
+    in, and out, self time (i.e. excluding upstream steps), and throughput of each step,
+    and the process peak RSS is logged once the pipeline output is exhausted. Threaded steps are
+    timed in their thread, so the step downstream of one includes the waits on its queue."""
 
     def __init__(
         self,
         steps: typing.List[typing.Tuple[typing.Callable, typing.Optional[dict]]] = None,
+        profile: bool = False,
+        name: str = "pipeline",
     ):
         self.steps = steps or list()
+        self.profile = profile
+        self.name = name
+        self.report = None
 
-    def add(self, step: typing.Iterable, kwargs: dict = None) -> None:
+    def add(
+        self,
+        step: typing.Iterable,
+        kwargs: dict = None,
+        workers: int = 0,
+        chunk_size: int = 1000,
+        max_chunks: int = None,
+        queue_size: int = 0,
+    ) -> None:
+        """Add a step to the pipeline.
+        With workers > 1, the step runs in parallel processes. See ParallelStep.
+        With queue_size > 0, the step runs in its own thread. See ThreadedStep."""
+        if workers > 1:
+            step = ParallelStep(
+                step, workers, chunk_size=chunk_size, max_chunks=max_chunks
+            )
+        if queue_size > 0:
+            step = ThreadedStep(step, queue_size)
         self.steps.append((step, kwargs))
 
+    @property
+    def reads_ahead(self) -> bool:
+        """True if a step pulls input items ahead of the items it yields."""
+        return any(
+            isinstance(step, (ParallelStep, ThreadedStep)) for step, _ in self.steps
+        )
+
     def execute(self, datapoints: typing.Iterable[dict]) -> typing.Iterable[str]:
+        if self.profile:
+            return self.execute_with_profile(datapoints)
         iterator = datapoints
         for step, kwargs in self.steps:
             iterator = step(iterator, **kwargs) if kwargs else step(iterator)
         return iterator
+
+    def execute_with_profile(
+        self, datapoints: typing.Iterable[dict]
+    ) -> typing.Iterable[str]:
+        """Execute the pipeline with each step output instrumented."""
+        profiles = [StepProfile("input")]
+        iterator = profiles[0].profile(datapoints)
+        for step, kwargs in self.steps:
+            profiles.append(StepProfile(get_step_name(step)))
+            if isinstance(step, ThreadedStep):
+                # time the step in its thread, instead of the waits on its queue
+                iterator = (
+                    step.step(iterator, **kwargs) if kwargs else step.step(iterator)
+                )
+                iterator = iter_in_thread(
+                    profiles[-1].profile(iterator), maxsize=step.queue_size
+                )
+                continue
+            iterator = step(iterator, **kwargs) if kwargs else step(iterator)
+            iterator = profiles[-1].profile(iterator)
+        yield from iterator
+        self.report = self.make_report(profiles)
+        logger.info(jsoncodec.dumps(self.report))
+
+    def make_report(self, profiles: typing.List[StepProfile]) -> dict:
+        """Report of the step profiles. Step self time is its inclusive time
+        minus the inclusive time of the upstream step."""
+        steps = []
+        for upstream, profile in zip(profiles, profiles[1:]):
+            self_seconds = max(profile.seconds - upstream.seconds, 0.0)
+            steps.append(
+                dict(
+                    step=profile.name,
+                    items_in=upstream.items,
+                    items_out=profile.items,
+                    self_seconds=round(self_seconds, 6),
+                    items_per_second=round(upstream.items / self_seconds, 2)
+                    if self_seconds
+                    else None,
+                )
+            )
+        return dict(
+            pipeline=self.name,
+            input_seconds=round(profiles[0].seconds, 6),
+            total_seconds=round(profiles[-1].seconds, 6),
+            # resident set size high-water mark of the process, not of a step
+            process_peak_rss_mb=round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2
+            ),
+            steps=steps,
+        )
@@ -13,6 +13,10 @@ packages = ["libdrm"]
 
 install_requires = ["pydantic~=1.8", "pytest>=7"]
 
+# optional fast JSON codec, see libdrm.jsoncodec
+# optional columnar file format, see libdrm.datamodels.ArrowFileModel
+extras_require = {"fast": ["orjson>=3.6"], "columnar": ["pyarrow>=6"]}
+
 setup(
     name="libdrm",
     version=about["__version__"],
@@ -35,6 +39,7 @@ setup(
     packages=packages,
     python_requires=">=3.7, <3.9",
     install_requires=install_requires,
+    extras_require=extras_require,
     project_urls={
         "Bug Reports": "https://github.com/ec-jrc/SMDRM/issues",
         "Source": "https://github.com/ec-jrc/SMDRM",
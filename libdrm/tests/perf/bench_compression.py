@@ -0,0 +1,103 @@
+"""Zip compression methods of ZipFileModel.cache() on the annotators performance corpora.
+
+For each compression, and write mode (synchronous, or background thread), it reports
+the output file size, the time of a task i.e. read input, encode, and cache output,
+and the time of the downstream task to read the output back."""
+
+import logging
+import os
+import tempfile
+
+from libdrm import jsoncodec
+from libdrm.common import iter_in_batches
+from libdrm.datamodels import ZipFileModel
+
+from perfutils import best_of, default_data_dir, get_corpora, write_results
+
+console = logging.getLogger("libdrm.perftests")
+
+
+def run_task(input_path: str, output_path: str, scale: int, **cache_options) -> None:
+    """Read, encode, and cache the input datapoints scale times."""
+    datapoints = (
+        datapoint
+        for _ in range(scale)
+        for datapoint in ZipFileModel(input_path).iter_jsonl()
+    )
+    batches = (
+        jsoncodec.dumps_ndjson(batch)
+        for batch in iter_in_batches(datapoints, batch_size=1000)
+    )
+    ZipFileModel(input_path).cache(output_path, batches, **cache_options)
+
+
+def read_output(output_path: str) -> None:
+    for _ in ZipFileModel(output_path).iter_jsonl():
+        continue
+
+
+def run(data_dir: str, repeat: int, scale: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "output.zip")
+        for corpus, path in get_corpora(data_dir).items():
+            for compression in ZipFileModel.compressions:
+                for queue_size in (0, 4):
+                    task_seconds = best_of(
+                        lambda: run_task(
+                            path,
+                            output_path,
+                            scale,
+                            compression=compression,
+                            queue_size=queue_size,
+                        ),
+                        repeat,
+                    )
+                    result = dict(
+                        corpus=corpus,
+                        scale=scale,
+                        compression=compression,
+                        queue_size=queue_size,
+                        size_bytes=os.path.getsize(output_path),
+                        task_seconds=round(task_seconds, 6),
+                        read_seconds=round(
+                            best_of(lambda: read_output(output_path), repeat), 6
+                        ),
+                    )
+                    console.info(result)
+                    results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Zip compression benchmark.")
+    parser.add_argument(
+        "--data-dir",
+        default=default_data_dir,
+        help="The directory of the zip files to benchmark. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="The number of repetitions, the best is kept. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--scale",
+        default=1,
+        type=int,
+        help="The number of times each corpus is processed in a run. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="The path to which you want to save the JSON results.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = run(args.data_dir, args.repeat, args.scale)
+    if args.output_path:
+        write_results(args.output_path, "compression", results)
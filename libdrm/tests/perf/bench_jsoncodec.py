@@ -0,0 +1,113 @@
+"""Per-task speedup of the JSON codecs on the annotators performance corpora.
+
+Each task decodes its input datapoints, and encodes its output datapoints in NDJSON
+batches, with the exception of cache_tweets that encodes ElasticSearch bulk operations.
+Output datapoints are enriched with the fields each task adds, to reflect their size."""
+
+import logging
+import zipfile
+
+from libdrm import jsoncodec
+from libdrm.common import iter_in_batches
+
+from perfutils import best_of, default_data_dir, get_corpora, write_results
+
+console = logging.getLogger("libdrm.perftests")
+
+
+def enrich(datapoint: dict, task: str) -> dict:
+    """Add the fields generated up to the given task to a datapoint."""
+    datapoint = dict(datapoint, text_clean=None, place=None, annotation=None)
+    if task in ("transform", "annotate", "geocode", "cache"):
+        datapoint["text_clean"] = datapoint["text"].lower()
+        datapoint["place"] = {"candidates": {"GPE": ["Barcelona"]}}
+    if task in ("annotate", "geocode", "cache"):
+        datapoint["annotation"] = {"floods": 0.040091}
+    if task in ("geocode", "cache"):
+        datapoint["place"]["meta"] = [
+            {
+                "country_name": "Spain",
+                "country_code": "ESP",
+                "region_name": "Cataluña",
+                "city_name": "Barcelona",
+                "latitude": 41.38879,
+                "longitude": 2.15899,
+                "region_id": 9784,
+            }
+        ]
+    return datapoint
+
+
+def task_json_work(codec, lines: list, datapoints: list, task: str) -> None:
+    """JSON decoding, and encoding done by the given task."""
+    for line in lines:
+        codec.loads(line)
+    if task == "cache":
+        for datapoint in datapoints:
+            meta = codec.dumps({"index": {"_id": datapoint["id"], "_index": "smdrm"}})
+            event = codec.dumps({**datapoint, **dict(tags=["perf"])})
+            "{meta}\n{event}\n".format(meta=meta, event=event)
+        return
+    for batch in iter_in_batches(datapoints, batch_size=1000):
+        codec.dumps_ndjson(batch)
+
+
+def run(data_dir: str, repeat: int) -> list:
+    results = []
+    tasks = ["extract", "transform", "annotate", "geocode", "cache"]
+    for corpus, path in get_corpora(data_dir).items():
+        with zipfile.ZipFile(path) as archive:
+            lines = [
+                line
+                for info in archive.infolist()
+                for line in archive.read(info).splitlines()
+            ]
+        raw = [jsoncodec.get_codec("json").loads(line) for line in lines]
+        for task in tasks:
+            datapoints = [enrich(datapoint, task) for datapoint in raw]
+            baseline = None
+            for name in jsoncodec.available_codecs():
+                codec = jsoncodec.get_codec(name)
+                seconds = best_of(
+                    lambda: task_json_work(codec, lines, datapoints, task), repeat
+                )
+                baseline = baseline or seconds
+                result = dict(
+                    corpus=corpus,
+                    task=task,
+                    codec=name,
+                    lines=len(lines),
+                    seconds=round(seconds, 6),
+                    speedup=round(baseline / seconds, 2),
+                )
+                console.info(result)
+                results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JSON codecs benchmark.")
+    parser.add_argument(
+        "--data-dir",
+        default=default_data_dir,
+        help="The directory of the zip files to benchmark. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="The number of repetitions, the best is kept. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="The path to which you want to save the JSON results.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = run(args.data_dir, args.repeat)
+    if args.output_path:
+        write_results(args.output_path, "jsoncodec", results)
@@ -0,0 +1,144 @@
+"""Throughput of the libdrm building blocks on synthetic Twitter collections.
+
+For each collection size, it measures
+  - ZipFileModel.iter_jsonl() reading, and parsing of the collection
+  - iter_in_batches() batching of datapoints
+  - ZipFileModel.cache() writing of NDJSON batches
+  - Pipeline.execute() overhead per item, and step, with, and without profile
+Collections are generated once per size, and seed in the work directory."""
+
+import logging
+import os
+import tempfile
+
+from libdrm.common import iter_in_batches
+from libdrm.datamodels import ZipFileModel
+from libdrm.pipelines import Pipeline
+
+from perfutils import best_of, write_results
+from synthetic import get_collection, iter_lines
+
+console = logging.getLogger("libdrm.perftests")
+
+
+def identity(items):
+    """Pipeline step that does nothing but pass items through."""
+    for item in items:
+        yield item
+
+
+def consume(iterable) -> None:
+    for _ in iterable:
+        continue
+
+
+def bench_iter_jsonl(path: str, lines: int, repeat: int) -> dict:
+    seconds = best_of(lambda: consume(ZipFileModel(path).iter_jsonl()), repeat)
+    return dict(items=lines, seconds=seconds)
+
+
+def bench_iter_in_batches(lines: int, repeat: int) -> dict:
+    seconds = best_of(
+        lambda: consume(iter_in_batches(({} for _ in range(lines)), batch_size=1000)),
+        repeat,
+    )
+    baseline = best_of(lambda: consume({} for _ in range(lines)), repeat)
+    return dict(items=lines, seconds=seconds - baseline)
+
+
+def bench_cache(path: str, lines: int, repeat: int, work_dir: str) -> dict:
+    # a batch of 1000 collection lines, written lines / 1000 times
+    batch = b"\n".join(iter_lines(1000)).decode("utf-8", errors="replace") + "\n"
+    output_path = os.path.join(work_dir, "cache.zip")
+    seconds = best_of(
+        lambda: ZipFileModel(path).cache(
+            output_path, (batch for _ in range(lines // 1000))
+        ),
+        repeat,
+    )
+    return dict(items=lines, seconds=seconds, bytes=len(batch) * (lines // 1000))
+
+
+def bench_pipeline(lines: int, repeat: int, steps: int, profile: bool) -> dict:
+    def execute():
+        pipeline = Pipeline(profile=profile)
+        for _ in range(steps):
+            pipeline.add(identity)
+        consume(pipeline.execute(range(lines)))
+
+    seconds = best_of(execute, repeat)
+    baseline = best_of(lambda: consume(range(lines)), repeat)
+    return dict(
+        items=lines,
+        seconds=seconds,
+        steps=steps,
+        profile=profile,
+        ns_per_item_step=round((seconds - baseline) / lines / steps * 10**9, 2),
+    )
+
+
+def run(sizes: list, repeat: int, seed: int, work_dir: str) -> list:
+    results = []
+    for lines in sizes:
+        path = get_collection(work_dir, lines, seed)
+        benchmarks = dict(
+            iter_jsonl=lambda: bench_iter_jsonl(path, lines, repeat),
+            iter_in_batches=lambda: bench_iter_in_batches(lines, repeat),
+            cache=lambda: bench_cache(path, lines, repeat, work_dir),
+            pipeline=lambda: bench_pipeline(lines, repeat, 5, profile=False),
+            pipeline_profile=lambda: bench_pipeline(lines, repeat, 5, profile=True),
+        )
+        for name, bench in benchmarks.items():
+            result = dict(benchmark=name, lines=lines, seed=seed, **bench())
+            result["seconds"] = round(result["seconds"], 6)
+            result["items_per_second"] = (
+                round(result["items"] / result["seconds"], 2)
+                if result["seconds"] > 0
+                else None
+            )
+            console.info(result)
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="libdrm benchmark.")
+    parser.add_argument(
+        "--sizes",
+        default=[10000, 100000, 1000000],
+        type=int,
+        nargs="+",
+        help="The number of lines of the synthetic collections. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="The random seed of the synthetic collections. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=os.path.join(tempfile.gettempdir(), "libdrm-perf"),
+        help="The directory of the synthetic collections. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="The number of repetitions, the best is kept. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="The path to which you want to save the JSON results.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # profile reports of the pipeline benchmark
+    logging.getLogger("libdrm.pipelines").setLevel(logging.WARNING)
+    results = run(args.sizes, args.repeat, args.seed, args.work_dir)
+    if args.output_path:
+        write_results(args.output_path, "libdrm", results)
@@ -0,0 +1,90 @@
+"""Throughput of the compiled datapoint validator against pydantic on the annotators performance corpora.
+
+Corpora datapoints are extended with fields of raw tweets, that validation ignores,
+to reflect the input of extract_tweets."""
+
+import logging
+import zipfile
+
+from libdrm import jsoncodec
+from libdrm.datamodels import DataPointModel, parse_datapoint
+
+from perfutils import best_of, default_data_dir, get_corpora, write_results
+
+console = logging.getLogger("libdrm.perftests")
+
+# raw tweet fields ignored by validation
+raw_fields = dict(
+    lang="en",
+    source="<a href='https://mobile.twitter.com'>Twitter Web App</a>",
+    truncated=False,
+    user={"id": 1, "screen_name": "smdrm", "followers_count": 100},
+    entities={"hashtags": [], "urls": [], "user_mentions": []},
+    retweet_count=0,
+    favorite_count=0,
+)
+
+
+def validate_with_pydantic(objs: list) -> None:
+    for obj in objs:
+        DataPointModel.parse_obj(obj).dict()
+
+
+def validate_compiled(objs: list) -> None:
+    for obj in objs:
+        parse_datapoint(obj)
+
+
+def run(data_dir: str, repeat: int) -> list:
+    results = []
+    validators = dict(pydantic=validate_with_pydantic, compiled=validate_compiled)
+    for corpus, path in get_corpora(data_dir).items():
+        with zipfile.ZipFile(path) as archive:
+            objs = [
+                dict(jsoncodec.loads(line), **raw_fields)
+                for info in archive.infolist()
+                for line in archive.read(info).splitlines()
+            ]
+        baseline = None
+        for name, validate in validators.items():
+            seconds = best_of(lambda: validate(objs), repeat)
+            baseline = baseline or seconds
+            result = dict(
+                corpus=corpus,
+                validator=name,
+                datapoints=len(objs),
+                seconds=round(seconds, 6),
+                datapoints_per_second=round(len(objs) / seconds, 2),
+                speedup=round(baseline / seconds, 2),
+            )
+            console.info(result)
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Datapoint validation benchmark.")
+    parser.add_argument(
+        "--data-dir",
+        default=default_data_dir,
+        help="The directory of the zip files to benchmark. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="The number of repetitions, the best is kept. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="The path to which you want to save the JSON results.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = run(args.data_dir, args.repeat)
+    if args.output_path:
+        write_results(args.output_path, "validation", results)
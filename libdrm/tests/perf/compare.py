@@ -0,0 +1,76 @@
+"""Compare the JSON results of a benchmark between two versions.
+
+Results are matched by key fields, and the ratio of a metric (new / old) is logged.
+It exits with status 1 if any ratio exceeds the threshold, to flag regressions."""
+
+import json
+import logging
+import sys
+import typing
+
+console = logging.getLogger("libdrm.perftests")
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(
+    old: dict, new: dict, keys: typing.List[str], metric: str
+) -> typing.List[dict]:
+    """Ratios of a metric of the new results to the matching old results."""
+    old_results = {
+        tuple(result.get(key) for key in keys): result for result in old["results"]
+    }
+    comparisons = []
+    for result in new["results"]:
+        old_result = old_results.get(tuple(result.get(key) for key in keys))
+        if old_result is None or not old_result.get(metric):
+            continue
+        comparison = {key: result.get(key) for key in keys}
+        comparison.update(
+            old=old_result[metric],
+            new=result[metric],
+            ratio=round(result[metric] / old_result[metric], 3),
+        )
+        comparisons.append(comparison)
+    return comparisons
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare benchmark results.")
+    parser.add_argument("old_path", help="The path of the baseline JSON results.")
+    parser.add_argument("new_path", help="The path of the new JSON results.")
+    parser.add_argument(
+        "--keys",
+        default=["benchmark", "lines"],
+        nargs="+",
+        help="The result fields that identify a measure. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--metric",
+        default="seconds",
+        help="The result field to compare, lower is better. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--threshold",
+        default=1.1,
+        type=float,
+        help="The ratio above which a measure is a regression. Default is %(default)s.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    old, new = load_results(args.old_path), load_results(args.new_path)
+    console.info(dict(old=old.get("libdrm"), new=new.get("libdrm")))
+    regressions = 0
+    for comparison in compare(old, new, args.keys, args.metric):
+        if comparison["ratio"] > args.threshold:
+            regressions += 1
+            console.warning(comparison)
+        else:
+            console.info(comparison)
+    sys.exit(1 if regressions else 0)
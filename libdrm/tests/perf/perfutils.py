@@ -0,0 +1,46 @@
+"""Shared helpers of the libdrm performance benchmarks."""
+
+import glob
+import json
+import os
+import platform
+import time
+import typing
+
+from libdrm import __version__
+
+# directory of this file
+cwd = os.path.dirname(os.path.abspath(__file__))
+# multilingual 5k datapoints corpora of the annotators performance tests
+default_data_dir = os.path.join(cwd, "../../../annotators/tests/perf/data")
+
+
+def get_corpora(data_dir: str = default_data_dir) -> typing.Dict[str, str]:
+    """Map corpus name e.g. en_5k to its zip file path."""
+    paths = sorted(glob.glob(os.path.join(data_dir, "*.zip")))
+    if not paths:
+        raise FileNotFoundError("No zip files found in {}.".format(data_dir))
+    return {os.path.basename(path)[: -len(".zip")]: path for path in paths}
+
+
+def best_of(func: typing.Callable, repeat: int = 3) -> float:
+    """Best wall time of a function call in seconds over a number of repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def write_results(path: str, benchmark: str, results: typing.List[dict]) -> None:
+    """Write benchmark results with environment metadata as JSON."""
+    report = dict(
+        benchmark=benchmark,
+        libdrm=__version__,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        results=results,
+    )
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,264 @@
+"""Seeded synthetic Twitter API v1.1 collections.
+
+Lines are tweet objects with the fields the tasks read, and the bulk of fields they drop,
+of a realistic size i.e. about 3 KB, and 5 KB for retweets.
+A share of them are retweets, extended tweets (i.e. truncated text, and full text
+in extended_tweet), and malformed lines (truncated JSON, invalid UTF-8, empty lines).
+The same seed, and number of lines produce the same collection."""
+
+import datetime
+import os
+import random
+import typing
+import zipfile
+
+from libdrm import jsoncodec
+
+# share of lines of each kind
+retweet_ratio = 0.3
+extended_ratio = 0.3
+malformed_ratio = 0.01
+
+words = (
+    "flood river water rain storm rescue emergency evacuation bridge road city "
+    "village people help level alert warning damage houses closed update news "
+    "inundación lluvia rescate alerta cheia chuva resgate فيضان مطر"
+).split()
+places = ["Barcelona", "Lisboa", "Valencia", "Porto", "Sevilla", "Cairo", "London"]
+months = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+weekdays = "Mon Tue Wed Thu Fri Sat Sun".split()
+start_time = datetime.datetime(2021, 6, 1)
+
+
+def make_text(rng: random.Random, size: int) -> str:
+    tokens = [rng.choice(words) for _ in range(size)]
+    tokens.insert(rng.randrange(len(tokens)), rng.choice(places))
+    if rng.random() < 0.5:
+        tokens.append("#" + rng.choice(words))
+    if rng.random() < 0.5:
+        tokens.append(
+            "https://t.co/" + "".join(rng.choices("abcdefghijk0123456789", k=10))
+        )
+    return " ".join(tokens)
+
+
+def make_created_at(rng: random.Random) -> str:
+    """Twitter created_at format e.g. Wed Jun 16 16:14:20 +0000 2021."""
+    t = start_time + datetime.timedelta(seconds=rng.randrange(30 * 24 * 3600))
+    return "{} {} {:02d} {:02d}:{:02d}:{:02d} +0000 {}".format(
+        weekdays[t.weekday()],
+        months[t.month - 1],
+        t.day,
+        t.hour,
+        t.minute,
+        t.second,
+        t.year,
+    )
+
+
+def make_user(rng: random.Random) -> dict:
+    user_id = rng.randrange(10**9)
+    image_url = "http://pbs.twimg.com/profile_images/{}/photo_normal.jpg".format(
+        rng.randrange(10**18)
+    )
+    return {
+        "id": user_id,
+        "id_str": str(user_id),
+        "name": "user {}".format(user_id),
+        "screen_name": "user{}".format(user_id),
+        "location": rng.choice(places),
+        "url": None,
+        "description": make_text(rng, 15),
+        "translator_type": "none",
+        "protected": False,
+        "verified": False,
+        "followers_count": rng.randrange(10**5),
+        "friends_count": rng.randrange(10**4),
+        "listed_count": rng.randrange(100),
+        "favourites_count": rng.randrange(10**4),
+        "statuses_count": rng.randrange(10**5),
+        "created_at": make_created_at(rng),
+        "utc_offset": None,
+        "time_zone": None,
+        "geo_enabled": rng.random() < 0.5,
+        "lang": None,
+        "contributors_enabled": False,
+        "is_translator": False,
+        "profile_background_color": "F5F8FA",
+        "profile_background_image_url": "",
+        "profile_background_image_url_https": "",
+        "profile_background_tile": False,
+        "profile_link_color": "1DA1F2",
+        "profile_sidebar_border_color": "C0DEED",
+        "profile_sidebar_fill_color": "DDEEF6",
+        "profile_text_color": "333333",
+        "profile_use_background_image": True,
+        "profile_image_url": image_url,
+        "profile_image_url_https": image_url.replace("http:", "https:"),
+        "profile_banner_url": "https://pbs.twimg.com/profile_banners/{}/1".format(
+            user_id
+        ),
+        "default_profile": True,
+        "default_profile_image": False,
+        "following": None,
+        "follow_request_sent": None,
+        "notifications": None,
+    }
+
+
+def make_entities(rng: random.Random, text: str) -> dict:
+    """Entities of a text, with indices of hashtags, urls, and user mentions."""
+    entities = {"hashtags": [], "urls": [], "user_mentions": [], "symbols": []}
+    for token in text.split():
+        start = text.index(token)
+        indices = [start, start + len(token)]
+        if token.startswith("#"):
+            entities["hashtags"].append({"text": token[1:], "indices": indices})
+        elif token.startswith("https://"):
+            entities["urls"].append(
+                {
+                    "url": token,
+                    "expanded_url": "https://www.example.com/news/{}".format(
+                        rng.randrange(10**9)
+                    ),
+                    "display_url": "example.com/news/…",
+                    "indices": indices,
+                }
+            )
+    for _ in range(rng.randrange(3)):
+        user = rng.randrange(10**9)
+        entities["user_mentions"].append(
+            {
+                "screen_name": "user{}".format(user),
+                "name": "user {}".format(user),
+                "id": user,
+                "id_str": str(user),
+                "indices": [0, 0],
+            }
+        )
+    return entities
+
+
+def make_status(rng: random.Random, tweet_id: int, extended: bool) -> dict:
+    full_text = make_text(rng, rng.randrange(10, 50))
+    status = {
+        "created_at": make_created_at(rng),
+        "id": tweet_id,
+        "id_str": str(tweet_id),
+        "text": full_text[:140],
+        "source": '<a href="https://mobile.twitter.com" rel="nofollow">Twitter Web App</a>',
+        "truncated": extended and len(full_text) > 140,
+        "in_reply_to_status_id": None,
+        "in_reply_to_status_id_str": None,
+        "in_reply_to_user_id": None,
+        "in_reply_to_user_id_str": None,
+        "in_reply_to_screen_name": None,
+        "user": make_user(rng),
+        "geo": None,
+        "coordinates": None,
+        "place": None,
+        "contributors": None,
+        "is_quote_status": False,
+        "quote_count": rng.randrange(10),
+        "reply_count": rng.randrange(10),
+        "retweet_count": rng.randrange(100),
+        "favorite_count": rng.randrange(100),
+        "entities": make_entities(rng, full_text[:140]),
+        "favorited": False,
+        "retweeted": False,
+        "possibly_sensitive": False,
+        "filter_level": "low",
+        "lang": rng.choice(["en", "es", "pt", "ar"]),
+        "timestamp_ms": str(rng.randrange(10**12, 2 * 10**12)),
+    }
+    if extended:
+        status["extended_tweet"] = {
+            "full_text": full_text,
+            "display_text_range": [0, len(full_text)],
+            "entities": make_entities(rng, full_text),
+        }
+    return status
+
+
+def make_tweet(rng: random.Random, tweet_id: int) -> dict:
+    """A tweet, retweet, or extended tweet object."""
+    if rng.random() < retweet_ratio:
+        retweeted = make_status(rng, rng.randrange(tweet_id), extended=True)
+        tweet = make_status(rng, tweet_id, extended=False)
+        tweet["text"] = "RT @{}: {}".format(
+            retweeted["user"]["screen_name"], retweeted["text"]
+        )[:140]
+        tweet["retweeted_status"] = retweeted
+        return tweet
+    return make_status(rng, tweet_id, rng.random() < extended_ratio)
+
+
+def make_malformed_line(rng: random.Random, line: bytes) -> bytes:
+    kind = rng.randrange(3)
+    if kind == 0:
+        return line[: rng.randrange(1, len(line))]
+    if kind == 1:
+        return line[:20] + b"\xff\xfe" + line[20:]
+    return b""
+
+
+def iter_lines(lines: int, seed: int = 0) -> typing.Iterable[bytes]:
+    """Iterate JSON lines of a synthetic collection."""
+    rng = random.Random(seed)
+    for n in range(lines):
+        line = jsoncodec.dumps(make_tweet(rng, 10**18 + n)).encode("utf-8")
+        if rng.random() < malformed_ratio:
+            line = make_malformed_line(rng, line)
+        yield line
+
+
+def write_collection(
+    path: str, lines: int, seed: int = 0, member_lines: int = 100000
+) -> str:
+    """Write a synthetic collection to a zip file of NDJSON members of member_lines."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        member, member_id = [], 0
+        for line in iter_lines(lines, seed):
+            member.append(line)
+            if len(member) == member_lines:
+                member_id += 1
+                zf.writestr("{}.ndjson".format(member_id), b"\n".join(member) + b"\n")
+                member = []
+        if member:
+            zf.writestr("{}.ndjson".format(member_id + 1), b"\n".join(member) + b"\n")
+    return path
+
+
+def get_collection(work_dir: str, lines: int, seed: int = 0) -> str:
+    """Path to a synthetic collection in work_dir. It is written on first use."""
+    path = os.path.join(work_dir, "synthetic_{}_{}.zip".format(lines, seed))
+    if not os.path.exists(path):
+        os.makedirs(work_dir, exist_ok=True)
+        write_collection(path + ".tmp", lines, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetic Twitter collections.")
+    parser.add_argument(
+        "--lines",
+        default=10000,
+        type=int,
+        help="The number of lines of the collection. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="The random seed. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        required=True,
+        help="The path to which you want to save the zip file.",
+    )
+    args = parser.parse_args()
+    write_collection(args.output_path, args.lines, args.seed)
@@ -0,0 +1,31 @@
+import pytest
+
+from libdrm.batching import AdaptiveBatchSize
+
+
+def test_adaptive_batch_size_split():
+    """Test if requests fit the byte budget of the target latency, within bounds."""
+    batch_size = AdaptiveBatchSize(1.0, min_size=2, max_size=4, initial_size=3)
+    texts = ["a" * 10] * 7
+    assert [len(request) for request in batch_size.split(texts)] == [3, 3, 1]
+    # 0.1 second per 10 bytes text i.e. 10 texts per second
+    batch_size.observe(3, 30, 0.3)
+    assert [len(request) for request in batch_size.split(texts)] == [4, 3]
+    # long texts are sent in smaller requests, down to min_size
+    assert [len(request) for request in batch_size.split(["a" * 100] * 3)] == [2, 1]
+    # the estimate moves towards the last observation
+    batch_size.observe(2, 20, 0.1)
+    assert batch_size.seconds_per_byte == pytest.approx(0.0075)
+
+
+def test_adaptive_batch_size_call():
+    """Test if the requests of a call are observed, and their results yielded."""
+    batch_size = AdaptiveBatchSize(1.0, max_size=2)
+    results = list(batch_size.call(lambda texts: len(texts), ["a", "b", "c"]))
+    assert results == [(["a", "b"], 2), (["c"], 1)]
+    stats = batch_size.get_stats()
+    assert (stats["requests"], stats["request_size_min"]) == (2, 1)
+    assert stats["request_size_max"] == stats["request_size_last"] + 1 == 2
+    assert AdaptiveBatchSize(1.0).get_stats() == dict(requests=0)
+    with pytest.raises(ValueError):
+        AdaptiveBatchSize(1.0, min_size=2, max_size=1)
@@ -0,0 +1,80 @@
+import pytest
+import os
+import zipfile
+
+from libdrm.checkpoints import Checkpoint, write_durably
+from libdrm.common import iter_in_batches
+from libdrm.datamodels import ZipFileModel
+
+
+def make_batches(datapoints, fail_after=None):
+    """NDJSON batches of 3 datapoint IDs. Fail after the given number of batches."""
+    for batch_id, batch in enumerate(iter_in_batches(datapoints, 3), start=1):
+        if batch_id == fail_after:
+            raise RuntimeError("interrupted")
+        yield "".join('{"id": %d}\n' % datapoint["id"] for datapoint in batch)
+
+
+def read_members(path):
+    with zipfile.ZipFile(path) as zf:
+        return [(name, zf.read(name)) for name in zf.namelist()]
+
+
+@pytest.mark.parametrize("queue_size", [0, 2])
+def test_resume_from_checkpoint(tmp_path, queue_size):
+    """Test if a resumed task output equals the output of an uninterrupted run."""
+    input_path = str(tmp_path / "input.ndjson")
+    with open(input_path, "w") as f:
+        f.write("input")
+    datapoints = [dict(id=n) for n in range(10)]
+    expected_path = str(tmp_path / "expected.zip")
+    ZipFileModel(expected_path).cache(expected_path, make_batches(iter(datapoints)))
+
+    output_path = str(tmp_path / "output.zip")
+    checkpoint = Checkpoint(output_path, input_path)
+    with pytest.raises(RuntimeError):
+        ZipFileModel(output_path).cache(
+            output_path,
+            make_batches(checkpoint.iter_input(iter(datapoints)), fail_after=3),
+            queue_size=queue_size,
+            checkpoint=checkpoint,
+        )
+    assert os.path.exists(checkpoint.manifest_path)
+
+    checkpoint = Checkpoint(output_path, input_path)
+    assert checkpoint.batches == 2
+    assert checkpoint.consumed == 6
+    resumed = []
+    ZipFileModel(output_path).cache(
+        output_path,
+        make_batches(
+            (resumed.append(dp) or dp for dp in checkpoint.iter_input(iter(datapoints)))
+        ),
+        queue_size=queue_size,
+        checkpoint=checkpoint,
+    )
+    assert resumed == datapoints[6:]
+    assert read_members(output_path) == read_members(expected_path)
+    assert not os.path.exists(checkpoint.directory)
+
+
+def test_checkpoint_of_different_options_is_discarded(tmp_path):
+    """Test if progress committed with different options is not resumed."""
+    input_path = str(tmp_path / "input.ndjson")
+    with open(input_path, "w") as f:
+        f.write("input")
+    output_path = str(tmp_path / "output.zip")
+    checkpoint = Checkpoint(output_path, input_path, options=dict(batch_size=3))
+    checkpoint.commit('{"id": 1}\n', 1)
+    assert Checkpoint(output_path, input_path, options=dict(batch_size=3)).batches == 1
+    checkpoint = Checkpoint(output_path, input_path, options=dict(batch_size=5))
+    assert checkpoint.batches == 0
+    assert not os.path.exists(checkpoint.directory)
+
+
+def test_write_durably_relative_path(tmp_path, monkeypatch):
+    """Test if write_durably writes a path relative to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    write_durably("data", b"data")
+    assert (tmp_path / "data").read_bytes() == b"data"
+    assert os.listdir(str(tmp_path)) == ["data"]
@@ -1,4 +1,11 @@
-from libdrm.common import iter_in_batches
+import itertools
+import os
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from libdrm import __version__
+from libdrm.common import get_version, iter_in_batches, iter_bounded_map, iter_in_thread
 
 
 def test_iter_in_batches():
@@ -12,3 +19,50 @@ def test_iter_in_batches():
             # ensure batches smaller than the batch_size are returned
             assert len(batch) == 4
     assert index == 5
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_bounded_map(ordered):
+    """Test if iter_bounded_map returns all results, in input order when ordered."""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(
+            iter_bounded_map(
+                executor, pow, [(n, 2) for n in range(20)], 4, ordered=ordered
+            )
+        )
+    expected = [n**2 for n in range(20)]
+    assert (results if ordered else sorted(results)) == expected
+
+
+def test_iter_in_thread():
+    """Test if iter_in_thread yields all items in order."""
+    assert list(iter_in_thread(iter(range(100)), maxsize=3)) == list(range(100))
+
+
+def test_iter_in_thread_raises():
+    """Test if exceptions raised in the background thread reach the consumer."""
+
+    def failing():
+        yield 1
+        raise KeyError("fake")
+
+    items = iter_in_thread(failing(), maxsize=1)
+    assert next(items) == 1
+    with pytest.raises(KeyError):
+        next(items)
+
+
+def test_iter_in_thread_close():
+    """Test if the background thread is released when the consumer stops early."""
+    threads = threading.active_count()
+    items = iter_in_thread(itertools.count(), maxsize=2)
+    assert next(items) == 0
+    assert threading.active_count() == threads + 1
+    items.close()
+    assert threading.active_count() == threads
+
+
+def test_version_in_lockstep():
+    """Test if the package version is the version of VERSION.txt."""
+    path = os.path.join(os.path.dirname(__file__), "../../VERSION.txt")
+    assert get_version(path).strip() == __version__
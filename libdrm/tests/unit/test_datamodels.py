@@ -1,8 +1,25 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
 import pytest
 import pydantic
+import tarfile
+import zipfile
 from zipfile import BadZipFile
 
-from libdrm.datamodels import DataPointModel, ZipFileModel
+from libdrm.datamodels import (
+    ArrowFileModel,
+    DataPointModel,
+    NDJSONFileModel,
+    StreamFileModel,
+    TarFileModel,
+    ZipFileModel,
+    compile_validator,
+    open_file_model,
+    parse_datapoint,
+)
 
 
 def test_DataPointModel_with_valid_input():
@@ -41,6 +58,68 @@ def test_DataPointModel_with_enriched_input():
     )
 
 
+base = {"id": 1, "created_at": "date", "text": "text"}
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        base,
+        dict(base, lang="en", user={"id": 2}),
+        dict(base, text_clean="text", place={"city": "x"}, annotation={"floods": 0.9}),
+        dict(base, text_clean=None, place=None, annotation=None),
+        dict(base, id="1"),
+        dict(base, id=1.5),
+        dict(base, id=True),
+        dict(base, id="one"),
+        dict(base, id=None),
+        dict(base, created_at=1),
+        dict(base, text=None),
+        dict(base, text_clean=1),
+        dict(base, place=[("city", "x")]),
+        dict(base, annotation="floods"),
+        {"id": 1, "text": "text"},
+        {},
+        [("id", 1)],
+        None,
+    ],
+)
+def test_parse_datapoint_equals_pydantic(obj):
+    """Test if the compiled validator returns, or fails as DataPointModel does."""
+    try:
+        expected = DataPointModel.parse_obj(obj).dict()
+    except pydantic.ValidationError:
+        with pytest.raises(pydantic.ValidationError):
+            parse_datapoint(obj)
+    else:
+        result = parse_datapoint(obj)
+        assert result == expected
+        assert list(result) == list(expected)
+        assert [type(value) for value in result.values()] == [
+            type(value) for value in expected.values()
+        ]
+
+
+def test_parse_datapoint_on_valid_zipfile(valid_archive_path):
+    """Test if the compiled validator equals DataPointModel on sample data."""
+    for jsonl in ZipFileModel(valid_archive_path).iter_jsonl():
+        tweet = jsonl["tweet"]
+        assert parse_datapoint(tweet) == DataPointModel.parse_obj(tweet).dict()
+
+
+def test_compile_validator_with_custom_validators():
+    """Test if models with custom validators are validated by pydantic."""
+
+    class Model(pydantic.BaseModel):
+        text: str
+
+        @pydantic.validator("text")
+        def lower(cls, value):
+            return value.lower()
+
+    assert compile_validator(Model)({"text": "TEXT"}) == {"text": "text"}
+
+
 def test_is_zip_file_with_valid_zipfile(valid_archive_path):
     """Test if zip file at the given path is valid."""
     assert ZipFileModel(valid_archive_path).is_valid()
@@ -86,3 +165,183 @@ def test_iter_json_on_valid_zipfile_wrong_data(wrong_archive_path):
     assert zf.is_valid()
     with pytest.raises(StopIteration):
         next(zf.iter_jsonl())
+
+
+@pytest.fixture()
+def multi_member_archive_path(tmp_path):
+    """Path to a zip file with multiple NDJSON members, and an invalid line."""
+    path = str(tmp_path / "multi.zip")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for member in range(3):
+            lines = [
+                json.dumps(dict(id=member * 100 + line, text="text " * line))
+                for line in range(50)
+            ]
+            lines[7] = "not a valid JSON line"
+            zf.writestr("{}.ndjson".format(member), "\n".join(lines) + "\n")
+    return path
+
+
+def test_iter_jsonl_with_workers(multi_member_archive_path):
+    """Test if the parallel reader yields the same lines, in the same order,
+    of the sequential reader when members are split in multiple chunks."""
+    zf = ZipFileModel(multi_member_archive_path)
+    expected = list(zf.iter_jsonl())
+    assert len(expected) == 150
+    assert expected.count(None) == 3
+    assert list(zf.iter_jsonl(workers=2, chunk_size=256)) == expected
+
+
+def test_iter_jsonl_with_workers_unordered(multi_member_archive_path):
+    """Test if the unordered parallel reader yields all lines."""
+    zf = ZipFileModel(multi_member_archive_path)
+    result = list(zf.iter_jsonl(workers=2, ordered=False, chunk_size=256))
+    key = lambda jsonl: -1 if jsonl is None else jsonl["id"]
+    assert sorted(result, key=key) == sorted(zf.iter_jsonl(), key=key)
+
+
+@pytest.fixture()
+def datapoints_batches():
+    """Batches of enriched datapoints, with repeated texts."""
+    datapoint = dict(
+        id=1,
+        created_at="Mon Jan 20 02:44:02 +0000 2020",
+        text="RT a text about Barcelona",
+        text_clean="a text about _locincl_",
+        place={"candidates": {"GPE": ["Barcelona"]}},
+        annotation=None,
+    )
+    yield [
+        [dict(datapoint, id=n) for n in range(3)],
+        [dict(datapoint, id=3, place=None, annotation={"floods": 0.5})],
+    ]
+
+
+def test_arrow_file_model_cache_and_iter_jsonl(tmp_path, datapoints_batches):
+    """Test if datapoints cached to an Arrow file are read back unchanged."""
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "datapoints.arrows")
+    arrow_file = ArrowFileModel(path)
+    # tasks pass the same options to the zip, and Arrow file models
+    arrow_file.cache(path, iter(datapoints_batches), checkpoint=None)
+    assert arrow_file.is_valid()
+    assert list(arrow_file.iter_batches()) == datapoints_batches
+    assert list(arrow_file.iter_jsonl()) == [
+        datapoint for batch in datapoints_batches for datapoint in batch
+    ]
+
+
+def test_arrow_file_model_columns(tmp_path, datapoints_batches):
+    """Test if only the given columns are read, and repeated strings are dictionary encoded."""
+    pyarrow = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "datapoints.arrows")
+    ArrowFileModel(path).cache(path, iter(datapoints_batches))
+    result = list(ArrowFileModel(path).iter_jsonl(columns=["id", "place"]))
+    assert result[0] == {"id": 0, "place": {"candidates": {"GPE": ["Barcelona"]}}}
+    assert result[3] == {"id": 3, "place": None}
+    with pyarrow.ipc.open_stream(pyarrow.OSFile(path)) as reader:
+        assert pyarrow.types.is_dictionary(reader.schema.field("text").type)
+
+
+def test_open_file_model(tmp_path, valid_archive_path, invalid_archive_path):
+    """Test if open_file_model returns the file model wrt the file content."""
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "datapoints.arrows")
+    ArrowFileModel(path).cache(path, iter([]))
+    assert isinstance(open_file_model(path), ArrowFileModel)
+    assert isinstance(open_file_model(valid_archive_path), ZipFileModel)
+    assert not open_file_model(invalid_archive_path).is_valid()
+
+
+@pytest.mark.parametrize("compression", list(ZipFileModel.compressions))
+@pytest.mark.parametrize("queue_size", [0, 2])
+def test_cache_with_compression(tmp_path, valid_archive_path, compression, queue_size):
+    """Test if cached NDJSON batches are compressed, and read back unchanged."""
+    path = str(tmp_path / "output.zip")
+    batches = ['{"id": %d}\n' % n * 10 for n in range(5)]
+    ZipFileModel(valid_archive_path).cache(
+        path, iter(batches), compression=compression, queue_size=queue_size
+    )
+    with zipfile.ZipFile(path) as zf:
+        assert zf.namelist() == [
+            "1.ndjson",
+            "2.ndjson",
+            "3.ndjson",
+            "4.ndjson",
+            "5.ndjson",
+        ]
+        assert {info.compress_type for info in zf.infolist()} == {
+            ZipFileModel.compressions[compression]
+        }
+    assert len(list(ZipFileModel(path).iter_jsonl())) == 50
+
+
+def test_cache_with_unknown_compression(tmp_path, valid_archive_path):
+    """Test if cache raises ValueError for unknown compressions."""
+    with pytest.raises(ValueError):
+        ZipFileModel(valid_archive_path).cache(
+            str(tmp_path / "output.zip"), iter([]), compression="unknown"
+        )
+
+
+@pytest.mark.parametrize(
+    "name, writer",
+    [
+        ("plain.ndjson", open),
+        ("gzip.ndjson.gz", gzip.open),
+        ("bzip2.ndjson.bz2", bz2.open),
+        ("xz.ndjson.xz", lzma.open),
+    ],
+)
+def test_ndjson_file_model(tmp_path, valid_archive_path, name, writer):
+    """Test if (compressed) NDJSON files are read like the zip file of their content."""
+    zip_file = ZipFileModel(valid_archive_path)
+    path = str(tmp_path / name)
+    with writer(path, "wb") as f:
+        for line in zip_file.iter_bytes():
+            f.write(line)
+    ndjson_file = open_file_model(path)
+    assert isinstance(ndjson_file, NDJSONFileModel)
+    assert ndjson_file.is_valid()
+    assert list(ndjson_file.iter_bytes()) == list(zip_file.iter_bytes())
+    assert list(ndjson_file.iter_jsonl()) == list(zip_file.iter_jsonl())
+    assert list(ndjson_file.iter_jsonl(workers=2, chunk_size=3)) == list(
+        zip_file.iter_jsonl()
+    )
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:xz"])
+def test_tar_file_model(tmp_path, multi_member_archive_path, mode):
+    """Test if tar files of (compressed) NDJSON members are read in member order."""
+    zip_file = ZipFileModel(multi_member_archive_path)
+    path = str(tmp_path / "collection.tar")
+    with zipfile.ZipFile(multi_member_archive_path) as archive, tarfile.open(
+        path, mode
+    ) as tar:
+        os.mkdir(str(tmp_path / "members"))
+        for n, name in enumerate(archive.namelist()):
+            member_path = str(tmp_path / "members" / name)
+            # odd members are gzip compressed
+            with (gzip.open if n % 2 else open)(member_path, "wb") as f:
+                f.write(archive.read(name))
+            tar.add(member_path, arcname=name)
+    tar_file = open_file_model(path)
+    assert isinstance(tar_file, TarFileModel)
+    assert tar_file.is_valid()
+    assert list(tar_file.iter_jsonl()) == list(zip_file.iter_jsonl())
+
+
+def test_open_file_model_with_invalid_content(tmp_path, invalid_archive_path):
+    """Test if contents that are not JSON objects are not valid NDJSON files."""
+    path = str(tmp_path / "text.gz")
+    with gzip.open(path, "wb") as f:
+        f.write(b"not json\n")
+    for path in [path, invalid_archive_path]:
+        assert isinstance(open_file_model(path), NDJSONFileModel)
+        assert not open_file_model(path).is_valid()
+
+
+def test_stream_file_model_is_abstract(valid_archive_path):
+    """Test if the stream base class requires is_valid(), and iter_bytes()."""
+    with pytest.raises(TypeError):
+        StreamFileModel(valid_archive_path)
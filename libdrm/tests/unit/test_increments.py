@@ -0,0 +1,83 @@
+import json
+import os
+import pytest
+import zipfile
+
+from libdrm.datamodels import ZipFileModel
+from libdrm.increments import MembersManifest
+
+
+def write_members(path, members, mode="w"):
+    with zipfile.ZipFile(path, mode) as zf:
+        for name, ids in members.items():
+            zf.writestr(name, "".join(json.dumps(dict(id=i)) + "\n" for i in ids))
+
+
+def test_members_manifest(tmp_path):
+    """Test if only new members are processed after the manifest is saved,
+    and all members if a processed member changed."""
+    input_path = str(tmp_path / "input.zip")
+    write_members(input_path, {"1.ndjson": [1, 2], "2.ndjson": [3]})
+    manifest = MembersManifest(str(tmp_path / "members.json"))
+    members = ZipFileModel(input_path).get_members()
+    assert manifest.get_new_members(members) == ["1.ndjson", "2.ndjson"]
+    manifest.add(members)
+    # the collection is uploaded again with a new member
+    write_members(input_path, {"3.ndjson": [4]}, mode="a")
+    manifest = MembersManifest(str(tmp_path / "members.json"))
+    new_members = manifest.get_new_members(ZipFileModel(input_path).get_members())
+    assert new_members == ["3.ndjson"]
+    assert manifest.members
+    result = list(ZipFileModel(input_path).iter_jsonl(members=new_members))
+    assert result == [dict(id=4)]
+    parallel = ZipFileModel(input_path).iter_jsonl(workers=2, members=new_members)
+    assert list(parallel) == result
+    # a processed member changed, the output is rebuilt from all members
+    write_members(input_path, {"1.ndjson": [1, 2], "2.ndjson": [3, 5], "3.ndjson": [4]})
+    new_members = manifest.get_new_members(ZipFileModel(input_path).get_members())
+    assert new_members == ["1.ndjson", "2.ndjson", "3.ndjson"]
+    assert manifest.members == {}
+    # a processed member was removed
+    manifest.add(ZipFileModel(input_path).get_members())
+    write_members(input_path, {"1.ndjson": [1, 2], "3.ndjson": [4]})
+    new_members = manifest.get_new_members(ZipFileModel(input_path).get_members())
+    assert new_members == ["1.ndjson", "3.ndjson"]
+
+
+def test_cache_with_append(tmp_path):
+    """Test if batches are appended after the members of an existing zip file."""
+    output_path = str(tmp_path / "output.zip")
+    zip_file = ZipFileModel(output_path)
+    zip_file.cache(output_path, iter(['{"id": 1}\n', '{"id": 2}\n']), append=True)
+    zip_file.cache(output_path, iter(['{"id": 3}\n']), append=True)
+    with zipfile.ZipFile(output_path) as zf:
+        assert zf.namelist() == ["1.ndjson", "2.ndjson", "3.ndjson"]
+    assert [line["id"] for line in zip_file.iter_jsonl()] == [1, 2, 3]
+    # without append, the zip file is replaced
+    zip_file.cache(output_path, iter(['{"id": 4}\n']))
+    assert [line["id"] for line in zip_file.iter_jsonl()] == [4]
+
+
+def test_cache_with_failed_append(tmp_path):
+    """Test if a failed append leaves the existing zip file unchanged."""
+    output_path = str(tmp_path / "output.zip")
+    zip_file = ZipFileModel(output_path)
+    zip_file.cache(output_path, iter(['{"id": 1}\n']))
+
+    def make_batches():
+        yield '{"id": 2}\n'
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        zip_file.cache(output_path, make_batches(), append=True)
+    assert [line["id"] for line in zip_file.iter_jsonl()] == [1]
+    assert os.listdir(str(tmp_path)) == ["output.zip"]
+
+
+def test_members_manifest_without_output(tmp_path):
+    """Test if the manifest of a missing output is discarded."""
+    manifest = MembersManifest(str(tmp_path / "members.json"))
+    manifest.add({"1.ndjson": 0})
+    output_path = str(tmp_path / "output.zip")
+    manifest = MembersManifest(str(tmp_path / "members.json"), output_path)
+    assert manifest.get_new_members({"1.ndjson": 0}) == ["1.ndjson"]
@@ -0,0 +1,43 @@
+import pytest
+
+from libdrm import jsoncodec
+
+
+@pytest.fixture(params=jsoncodec.available_codecs())
+def codec(request):
+    """Each JSON codec available in the current environment."""
+    return jsoncodec.get_codec(request.param)
+
+
+def test_loads(codec):
+    """Test if loads decodes JSON bytes and strings."""
+    assert codec.loads(b'{"id": 1, "text": "\\u00e9"}') == {"id": 1, "text": "é"}
+    assert codec.loads('{"id": 1}') == {"id": 1}
+
+
+def test_loads_with_invalid_input(codec):
+    """Test if loads raises one of the codec errors on invalid JSON."""
+    with pytest.raises(codec.errors):
+        codec.loads(b"Does it look valid JSON bytes to you??")
+
+
+def test_dumps_is_not_ascii_escaped(codec):
+    """Test if dumps keeps non-ASCII characters."""
+    result = codec.dumps({"text": "Un texte écrit à Paris 🏈"})
+    assert isinstance(result, str)
+    assert "écrit à Paris 🏈" in result
+    assert codec.loads(result) == {"text": "Un texte écrit à Paris 🏈"}
+
+
+def test_dumps_ndjson(codec):
+    """Test if dumps_ndjson encodes one JSON object per line."""
+    datapoints = [dict(id=n, place=None, annotation={"floods": 0.5}) for n in range(3)]
+    result = codec.dumps_ndjson(datapoints)
+    assert result.count("\n") == 3
+    assert [codec.loads(line) for line in result.splitlines()] == datapoints
+
+
+def test_get_codec_not_available():
+    """Test if get_codec raises ValueError for unknown codecs."""
+    with pytest.raises(ValueError):
+        jsoncodec.get_codec("unknown")
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import pytest
+import threading
+import time
+
+from libdrm.common import iter_in_batches
+from libdrm.pipelines import Pipeline, ParallelStep, ThreadedStep
+
+
+def square(numbers, offset=0):
+    """Fake CPU bound step."""
+    for number in numbers:
+        yield number**2 + offset
+
+
+def worker_pid(numbers):
+    """Fake step that tags items with the ID of the process running it."""
+    for number in numbers:
+        yield os.getpid()
+
+
+def test_pipeline_execute():
+    """Test if steps are chained in the order they are added."""
+    pipeline = Pipeline()
+    pipeline.add(square)
+    pipeline.add(square, dict(offset=1))
+    assert list(pipeline.execute(range(4))) == [1, 2, 17, 82]
+
+
+def test_pipeline_parallel_step():
+    """Test if a parallel step returns the same output, in the same order, of the sequential step."""
+    pipeline = Pipeline()
+    pipeline.add(square, dict(offset=1), workers=2, chunk_size=7, max_chunks=3)
+    assert isinstance(pipeline.steps[0][0], ParallelStep)
+    assert list(pipeline.execute(range(100))) == [n**2 + 1 for n in range(100)]
+
+
+def test_pipeline_parallel_step_runs_in_workers():
+    """Test if a parallel step runs in processes other than the current one."""
+    pipeline = Pipeline()
+    pipeline.add(worker_pid, workers=2, chunk_size=5)
+    pids = set(pipeline.execute(range(50)))
+    assert os.getpid() not in pids
+
+
+def thread_id(numbers):
+    """Fake step that tags items with the ID of the thread running it."""
+    for number in numbers:
+        yield threading.get_ident()
+
+
+def slow_io(numbers, seconds=0.01):
+    """Fake I/O bound step."""
+    for number in numbers:
+        time.sleep(seconds)
+        yield number
+
+
+def test_pipeline_threaded_step():
+    """Test if a threaded step returns the same output of the sequential step in its own thread."""
+    pipeline = Pipeline()
+    pipeline.add(square, dict(offset=1), queue_size=2)
+    pipeline.add(square, queue_size=1)
+    assert isinstance(pipeline.steps[0][0], ThreadedStep)
+    assert pipeline.reads_ahead
+    assert list(pipeline.execute(range(100))) == [(n**2 + 1) ** 2 for n in range(100)]
+    pipeline = Pipeline()
+    pipeline.add(thread_id, queue_size=2)
+    assert threading.get_ident() not in set(pipeline.execute(range(10)))
+
+
+def test_pipeline_threaded_steps_overlap():
+    """Test if a threaded step runs concurrently with the next step. Both wait on
+    a barrier while handling the first item, which only passes if they overlap."""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def produce(numbers):
+        for number in numbers:
+            yield number
+            if number == 0:
+                barrier.wait()
+
+    def consume(numbers):
+        for number in numbers:
+            if number == 0:
+                barrier.wait()
+            yield number
+
+    pipeline = Pipeline()
+    pipeline.add(produce, queue_size=2)
+    pipeline.add(consume)
+    assert list(pipeline.execute(range(20))) == list(range(20))
+
+
+def test_pipeline_threaded_step_raises():
+    """Test if exceptions of a threaded step are raised to the pipeline consumer."""
+
+    def fail(numbers):
+        yield next(numbers)
+        raise RuntimeError("failed")
+
+    pipeline = Pipeline()
+    pipeline.add(fail, queue_size=2)
+    iterator = pipeline.execute(iter(range(10)))
+    assert next(iterator) == 0
+    with pytest.raises(RuntimeError):
+        next(iterator)
+
+
+def batches(numbers, batch_size=3):
+    """Fake batching step."""
+    yield from iter_in_batches(numbers, batch_size=batch_size)
+
+
+def test_pipeline_profile(caplog):
+    """Test if the profiled pipeline returns the same output,
+    and logs a JSON report with the items in, and out of each step."""
+    pipeline = Pipeline(profile=True, name="test")
+    pipeline.add(square)
+    pipeline.add(batches)
+    with caplog.at_level(logging.INFO, logger="libdrm.pipelines"):
+        result = list(pipeline.execute(range(10)))
+    assert result == [[0, 1, 4], [9, 16, 25], [36, 49, 64], [81]]
+    report = json.loads(caplog.records[-1].getMessage())
+    assert report == pipeline.report
+    assert report["pipeline"] == "test"
+    assert [
+        (step["step"], step["items_in"], step["items_out"]) for step in report["steps"]
+    ] == [("square", 10, 10), ("batches", 10, 4)]
+    assert report["process_peak_rss_mb"] > 0
+    for step in report["steps"]:
+        assert step["self_seconds"] >= 0
+        assert "peak_rss_mb" not in step
+
+
+def test_pipeline_profile_threaded_step(caplog):
+    """Test if threaded steps are profiled in their thread."""
+    pipeline = Pipeline(profile=True)
+    pipeline.add(slow_io, queue_size=2)
+    pipeline.add(batches)
+    with caplog.at_level(logging.INFO, logger="libdrm.pipelines"):
+        assert len(list(pipeline.execute(range(10)))) == 4
+    slow_io_step, batches_step = pipeline.report["steps"]
+    assert (slow_io_step["items_in"], slow_io_step["items_out"]) == (10, 10)
+    assert slow_io_step["self_seconds"] >= 0.1
@@ -0,0 +1,94 @@
+import json
+import pytest
+
+from libdrm.common import iter_in_batches
+from libdrm.datamodels import ZipFileModel
+from libdrm.shards import (
+    cache_shards,
+    get_manifest_path,
+    get_shard_paths,
+    hash_id,
+    load_manifest,
+)
+
+
+def make_ndjson_batches(datapoints, batch_size=10):
+    for batch in iter_in_batches(datapoints, batch_size):
+        yield "".join(json.dumps(datapoint) + "\n" for datapoint in batch)
+
+
+def read_ids(path):
+    return [json.loads(line)["id"] for line in ZipFileModel(path).iter_bytes()]
+
+
+def test_get_shard_paths():
+    """Test if shard paths number the shards of an output path."""
+    assert get_shard_paths("/data/test_extracted.zip", 2) == [
+        "/data/test_extracted-00001-of-00002.zip",
+        "/data/test_extracted-00002-of-00002.zip",
+    ]
+    assert get_manifest_path("/data/test_extracted.zip") == (
+        "/data/test_extracted.manifest.json"
+    )
+
+
+@pytest.mark.parametrize("shard_by", ["id", "round-robin"])
+def test_cache_shards(tmp_path, shard_by):
+    """Test if shards partition the datapoints, and the manifest counts them."""
+    output_path = str(tmp_path / "output.zip")
+    # Twitter IDs whose low bits are 0
+    ids = [n << 22 for n in range(1000)]
+    manifest = cache_shards(
+        ZipFileModel,
+        output_path,
+        (dict(id=i) for i in ids + ids[:10]),
+        shards=4,
+        make_batches=make_ndjson_batches,
+        shard_by=shard_by,
+        chunk_size=7,
+    )
+    assert manifest == load_manifest(get_manifest_path(output_path))
+    shard_ids = [read_ids(shard["path"]) for shard in manifest["files"]]
+    assert [len(i) for i in shard_ids] == [
+        shard["datapoints"] for shard in manifest["files"]
+    ]
+    assert sorted(sum(shard_ids, [])) == sorted(ids + ids[:10])
+    # shards are balanced
+    assert all(200 < len(i) < 300 for i in shard_ids)
+    if shard_by == "id":
+        # the same ID always lands in the same shard
+        for shard, i in enumerate(shard_ids):
+            assert all(hash_id(datapoint_id) % 4 == shard for datapoint_id in i)
+
+
+def test_cache_shards_with_failed_writer(tmp_path):
+    """Test if the error of a shard writer is raised to the producer."""
+
+    def make_batches(datapoints):
+        for datapoint in datapoints:
+            raise RuntimeError("failed")
+        yield ""
+
+    with pytest.raises(RuntimeError, match="failed"):
+        cache_shards(
+            ZipFileModel,
+            str(tmp_path / "output.zip"),
+            (dict(id=i) for i in range(10000)),
+            shards=2,
+            make_batches=make_batches,
+            chunk_size=10,
+            queue_size=1,
+        )
+
+
+def test_cache_shards_with_unknown_strategy(tmp_path):
+    """Test if an unknown shard strategy raises ValueError."""
+    with pytest.raises(ValueError):
+        cache_shards(
+            ZipFileModel,
+            str(tmp_path / "o.zip"),
+            [],
+            2,
+            make_ndjson_batches,
+            shard_by="x",
+        )
@@ -1,12 +1,15 @@
-import json
 import logging
 import os
 import requests
 import sys
 import typing
 
+from libdrm import jsoncodec
+from libdrm.batching import AdaptiveBatchSize
 from libdrm.common import iter_in_batches, get_version, path_arg, log_execution
-from libdrm.datamodels import DataPointModel, ZipFileModel
+from libdrm.datamodels import DataPointModel, ZipFileModel, file_models, open_file_model
+from libdrm.checkpoints import Checkpoint
+from libdrm.increments import MembersManifest
 from libdrm.pipelines import Pipeline
 
 # setup logging
@@ -16,9 +19,13 @@ console = logging.getLogger("annotate_tweets")
 def get_annotation_scores(texts: list, annotator_id: str) -> typing.List[str]:
     """Template HTTP POST call to REST API annotator to annotate a list of texts."""
     url = "http://{host}:{port}/model/annotate".format(host=annotator_id, port=5000)
-    response = requests.post(url, json={"texts": texts})
+    response = requests.post(
+        url,
+        headers={"Content-Type": "application/json"},
+        data=jsoncodec.dumps({"texts": texts}).encode("utf-8"),
+    )
     response.raise_for_status()
-    return response.json()
+    return jsoncodec.loads(response.content)
 
 
 def get_cnn_texts_from_batch(batch: typing.Iterable[dict]) -> typing.List[str]:
@@ -31,18 +38,38 @@ def get_cnn_texts_from_batch(batch: typing.Iterable[dict]) -> typing.List[str]:
     return cnn_texts
 
 
+def annotate_texts(
+    texts: typing.List[str],
+    annotator_id: str,
+    request_size: AdaptiveBatchSize = None,
+) -> typing.List[str]:
+    """Annotation scores of texts. With a request size controller, texts are sent
+    in requests sized towards its target latency."""
+    if request_size is None:
+        return get_annotation_scores(texts, annotator_id=annotator_id)
+    scores = []
+    for _, request_scores in request_size.call(
+        lambda request: get_annotation_scores(request, annotator_id=annotator_id),
+        texts,
+    ):
+        scores.extend(request_scores)
+    return scores
+
+
 def annotate_batches(
     datapoints_batches: typing.Iterable[dict],
     annotator_id: str,
+    request_size: AdaptiveBatchSize = None,
 ) -> typing.Iterable[dict]:
     """Annotate datapoints batches.
     Batches are required only for annotation to reduce the number of calls to the annotator."""
 
     for datapoints_batch in datapoints_batches:
         # annotate texts
-        scores = get_annotation_scores(
+        scores = annotate_texts(
             get_cnn_texts_from_batch(datapoints_batch),
-            annotator_id=annotator_id
+            annotator_id=annotator_id,
+            request_size=request_size,
         )
         # update annotation field in batch
         for datapoint, score in zip(datapoints_batch, scores):
@@ -54,6 +81,7 @@ def annotate_batches(
 
 def task_metrics(
     datapoints: typing.Iterable[dict],
+    request_size: AdaptiveBatchSize = None,
 ) -> typing.Iterable[dict]:
     """Compute task metrics."""
     annotated = 0
@@ -61,7 +89,15 @@ def task_metrics(
         if datapoint["annotation"] is not None: 
             annotated += 1
         yield datapoint
-    console.info(dict(annotated=annotated))
+    metrics = dict(annotated=annotated)
+    if request_size is not None:
+        metrics.update(
+            {
+                "annotator_{}".format(name): value
+                for name, value in request_size.get_stats().items()
+            }
+        )
+    console.info(metrics)
 
 
 def log_datapoints(
@@ -79,9 +115,7 @@ def make_ndjson_batches(
 ) -> typing.Iterable[str]:
     """Iterate NDJSON batches from a generator of JSON datapoints."""
     for batch in iter_in_batches(datapoints, batch_size=batch_size):
-        yield "".join(
-            [json.dumps(datapoint, ensure_ascii=False) + "\n" for datapoint in batch]
-        )
+        yield jsoncodec.dumps_ndjson(batch)
 
 
 @log_execution(console)
@@ -92,28 +126,99 @@ def run(args):
 
     # make output path
     if not args.output_path:
-        args.output_path = args.input_path.replace(".zip", "_ann.zip")
+        root, _ = os.path.splitext(args.input_path)
+        args.output_path = root + "_ann" + file_models[args.format].extension
         console.warning("Default output path is {}".format(args.output_path))
 
     # input path validation
-    zip_file = ZipFileModel(args.input_path)
-    if not zip_file.is_valid():
-        raise TypeError("Not a valid zip file.")
+    input_file = open_file_model(args.input_path)
+    if not input_file.is_valid():
+        raise TypeError("Not a valid input file.")
+
+    # annotator requests are sized towards a target latency
+    request_size = None
+    if args.annotator_target_latency:
+        request_size = AdaptiveBatchSize(
+            args.annotator_target_latency,
+            min_size=args.annotator_min_request_size,
+            max_size=args.annotator_max_request_size or args.batch_size,
+        )
 
     # build annotation pipeline
-    annotate_pipeline = Pipeline()
-    annotate_pipeline.add(iter_in_batches, dict(batch_size=args.batch_size))
-    annotate_pipeline.add(annotate_batches, dict(annotator_id=args.annotator_id))
-    annotate_pipeline.add(task_metrics)
+    annotate_pipeline = Pipeline(profile=args.profile, name="annotate_tweets")
+    # input reading, and requests to the annotator API run in their own threads
+    # when step queue size > 0, to overlap with each other, and with the other steps
+    annotate_pipeline.add(
+        iter_in_batches,
+        dict(batch_size=args.batch_size),
+        queue_size=args.step_queue_size,
+    )
+    annotate_pipeline.add(
+        annotate_batches,
+        dict(annotator_id=args.annotator_id, request_size=request_size),
+        # annotated batches are yielded as datapoints
+        queue_size=args.step_queue_size * args.batch_size,
+    )
+    annotate_pipeline.add(task_metrics, dict(request_size=request_size))
     annotate_pipeline.add(log_datapoints)
-    annotate_pipeline.add(make_ndjson_batches)
+    if args.format == "arrow":
+        annotate_pipeline.add(iter_in_batches, dict(batch_size=args.batch_size))
+    else:
+        annotate_pipeline.add(make_ndjson_batches, dict(batch_size=args.batch_size))
 
+    # process only the input members added since the previous run
+    members_manifest = new_members = None
+    # only zip input files are read by members
+    read_options = {}
+    append = False
+    if args.incremental:
+        if not isinstance(input_file, ZipFileModel) or args.format != "ndjson":
+            raise ValueError(
+                "Incremental mode requires a zip input file, and the ndjson format."
+            )
+        members = input_file.get_members()
+        members_manifest = MembersManifest(
+            args.output_path + ".members.json", args.output_path
+        )
+        new_members = members_manifest.get_new_members(members)
+        read_options = dict(members=new_members)
+        # an output without processed members is overwritten
+        append = bool(members_manifest.members)
     # execute pipeline on raw datapoints
-    datapoints = zip_file.iter_jsonl()
+    datapoints = input_file.iter_jsonl(workers=args.read_workers, **read_options)
+    # resume from the output batches committed by a previous run
+    checkpoint = None
+    if args.checkpoint:
+        if args.format != "ndjson" or annotate_pipeline.reads_ahead:
+            raise ValueError(
+                "Checkpoints require the ndjson format, and sequential pipeline steps."
+            )
+        checkpoint = Checkpoint(
+            args.output_path,
+            args.input_path,
+            options=dict(
+                batch_size=args.batch_size,
+                annotator_id=args.annotator_id,
+                incremental=args.incremental,
+            ),
+        )
+        datapoints = checkpoint.iter_input(datapoints)
     annotated_datapoints = annotate_pipeline.execute(datapoints)
 
     # cache
-    zip_file.cache(args.output_path, annotated_datapoints)
+    output_file = file_models[args.format](args.output_path)
+    output_file.cache(
+        args.output_path,
+        annotated_datapoints,
+        compression=args.compression,
+        compresslevel=args.compresslevel,
+        queue_size=args.write_queue_size,
+        checkpoint=checkpoint,
+        append=append,
+    )
+    # new members are processed once their output is appended
+    if members_manifest is not None:
+        members_manifest.add({name: members[name] for name in new_members})
 
 
 if __name__ == "__main__":
@@ -144,6 +249,77 @@ if __name__ == "__main__":
         default=os.getenv("ANNOTATOR_ID", "floods"),
         help="The annotator ID to send the HTTP POST requests to. Default is %(default)s.",
     )
+    parser.add_argument(
+        "--annotator-target-latency",
+        type=float,
+        default=None,
+        help="The seconds towards which the size of annotator requests is adjusted, from their observed latency, and payload bytes. Default is one request per batch.",
+    )
+    parser.add_argument(
+        "--annotator-min-request-size",
+        type=int,
+        default=10,
+        help="The minimum number of texts of an adaptive annotator request. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--annotator-max-request-size",
+        type=int,
+        default=None,
+        help="The maximum number of texts of an adaptive annotator request. Default is the batch size.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(file_models),
+        default="ndjson",
+        help="The output file format, NDJSON batches in a zip file or Arrow IPC stream. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compression",
+        default="stored",
+        help="The output file compression: stored, deflate, bzip2, lzma, or zstd (Python 3.14+) for zip files; stored, lz4, or zstd for Arrow files. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compresslevel",
+        type=int,
+        default=None,
+        help="The output file compression level. Default is the compression default.",
+    )
+    parser.add_argument(
+        "--write-queue-size",
+        type=int,
+        default=4,
+        help="The number of output batches produced ahead of the (compressed) write in a background thread. 0 writes synchronously. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--step-queue-size",
+        type=int,
+        default=0,
+        help="The number of batches buffered between the threads of input reading, and annotator requests. 0 runs them sequentially. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        default=0,
+        help="The number of processes that decompress, and parse the input file. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Log a JSON report of items, and time of each pipeline step, and of the process peak memory.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        default=False,
+        help="Commit output batches to <output path>.ckpt, and resume from them after a failure. Requires the ndjson format, and sequential steps.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Process only the input zip members added since the previous run, listed in <output path>.members.json, and append their output batches. Requires the ndjson format.",
+    )
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument(
         "--version",
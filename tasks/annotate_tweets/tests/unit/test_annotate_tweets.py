@@ -0,0 +1,78 @@
+import requests
+import runpy
+import sys
+
+from libdrm import jsoncodec
+from libdrm.batching import AdaptiveBatchSize
+from libdrm.datamodels import ArrowFileModel, ZipFileModel
+from tests.conftest import annotate_tweets
+
+
+def test_annotate_batches_with_request_size(monkeypatch):
+    """Test if texts of a batch are annotated in requests of the adaptive size,
+    and scores are assigned in order."""
+    calls = []
+
+    def get_annotation_scores(texts, annotator_id):
+        calls.append(texts)
+        return [text.upper() for text in texts]
+
+    monkeypatch.setattr(annotate_tweets, "get_annotation_scores", get_annotation_scores)
+    batch = [dict(text_clean=text, annotation=None) for text in "abc"]
+    request_size = AdaptiveBatchSize(1.0, max_size=2)
+    annotated = list(
+        annotate_tweets.annotate_batches(iter([batch]), "floods", request_size)
+    )
+    assert calls == [["a", "b"], ["c"]]
+    assert [datapoint["annotation"] for datapoint in annotated] == [
+        {"floods": "A"},
+        {"floods": "B"},
+        {"floods": "C"},
+    ]
+    assert request_size.get_stats()["requests"] == 2
+
+
+class AnnotatorMockResponse:
+    """Annotator response that scores each text by its length."""
+
+    def __init__(self, texts):
+        self.content = jsoncodec.dumps([len(text) for text in texts]).encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+
+def test_run_with_arrow_input(tmp_path, monkeypatch):
+    """Test if the task annotates an Arrow input file, which is not read by members."""
+
+    def post(url, headers, data):
+        return AnnotatorMockResponse(jsoncodec.loads(data)["texts"])
+
+    monkeypatch.setattr(requests, "post", post)
+    input_path = str(tmp_path / "input.arrows")
+    ArrowFileModel(input_path).cache(
+        input_path,
+        iter(
+            [
+                [
+                    dict(id=1, text="a text", text_clean="a text"),
+                    dict(id=2, text="b", text_clean="b"),
+                ]
+            ]
+        ),
+    )
+    output_path = str(tmp_path / "output.zip")
+    argv = [
+        "annotate_tweets.py",
+        "--input-path",
+        input_path,
+        "--output-path",
+        output_path,
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    runpy.run_path(annotate_tweets.__file__, run_name="__main__")
+    result = list(ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["annotation"] for datapoint in result] == [
+        {"floods": 6},
+        {"floods": 1},
+    ]
@@ -1,11 +1,11 @@
 from datetime import datetime
-import json
 import logging
 import os
 import sys
 import typing
 
-from libdrm.datamodels import ZipFileModel
+from libdrm import jsoncodec
+from libdrm.datamodels import open_file_model
 from libdrm.common import get_version, path_arg, log_execution
 
 from elasticsearch import Elasticsearch
@@ -36,9 +36,9 @@ def build_bulk_operations(
         # define operations on datapoint
 
         # add metadata
-        meta = json.dumps({"index": {"_id": datapoint["id"], "_index": index}})
+        meta = jsoncodec.dumps({"index": {"_id": datapoint["id"], "_index": index}})
         # add tags
-        event = json.dumps({**datapoint, **dict(tags=tags)})
+        event = jsoncodec.dumps({**datapoint, **dict(tags=tags)})
 
         # bulk operation schema
         bulk_op = "{meta}\n{event}\n".format(meta=meta, event=event)
@@ -84,9 +84,9 @@ def run(args):
         console.setLevel(logging.DEBUG)
 
     # input path validation
-    zip_file = ZipFileModel(args.input_path)
-    if not zip_file.is_valid():
-        raise TypeError("Not a valid zip file.")
+    input_file = open_file_model(args.input_path)
+    if not input_file.is_valid():
+        raise TypeError("Not a valid input file.")
 
     # add filename as tag if no tags are given
     if not args.tags:
@@ -113,7 +113,7 @@ def run(args):
 
     # cache data
     console.info("Cache datapoints to ElasticSearch")
-    datapoints = zip_file.iter_jsonl()
+    datapoints = input_file.iter_jsonl()
     operations = build_bulk_operations(index, datapoints, tags=args.tags)
     bulk_response = cache_datapoints(client, operations)
     console.debug(bulk_response)
@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 import pytest
 import typing
 from conftest import cache_tweets
@@ -59,7 +60,12 @@ def test_build_bulk_operations(datapoint, operations):
     # operations
     actual = cache_tweets.build_bulk_operations(index, datapoints, tags)
     assert isinstance(actual, typing.Generator)
-    assert next(actual) == operations
+    # compare decoded operations, encoding depends on the JSON codec
+    bulk_op = next(actual)
+    assert bulk_op.endswith("\n")
+    assert [json.loads(op) for op in bulk_op.splitlines()] == [
+        json.loads(op) for op in operations.splitlines()
+    ]
 
 
 def test_cache_datapoints(client, operations):
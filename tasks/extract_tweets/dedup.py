@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import math
+import os
+import typing
+
+from libdrm import jsoncodec
+from libdrm.checkpoints import write_durably
+
+console = logging.getLogger("extract_tweets")
+
+
+class BloomFilter:
+    """A Bloom filter of capacity items with a false positive rate of error_rate.
+    Positions of an item are derived from one 128 bits BLAKE2b digest (double hashing)."""
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        bits: bytearray = None,
+        count: int = 0,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # optimal number of bits, and of hash functions
+        self.size = max(
+            8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        )
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def add(self, key: bytes) -> bool:
+        """Add key to the filter. Return False if it was (probably) already in it."""
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=16).digest(), "little")
+        # positions are kept below size, for fast small integer arithmetic
+        size = self.size
+        position, step = (digest >> 64) % size, (digest & 0xFFFFFFFFFFFFFFFF) % size
+        step = step or 1
+        bits = self.bits
+        new = False
+        for _ in range(self.hashes):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+            position += step
+            if position >= size:
+                position -= size
+        if new:
+            self.count += 1
+            if self.count == self.capacity + 1:
+                console.warning(
+                    "Bloom filter over capacity. False positives exceed {}.".format(
+                        self.error_rate
+                    )
+                )
+        return new
+
+
+class SeenIds:
+    """Set of the datapoint IDs seen in a collection.
+
+    IDs are kept in an exact set up to exact_size IDs. Beyond it, they are moved to
+    a Bloom filter sized for capacity IDs, whose memory is bounded, but that reports
+    unseen IDs as seen with a probability of error_rate."""
+
+    def __init__(
+        self,
+        exact_size: int = 100000,
+        capacity: int = 10000000,
+        error_rate: float = 0.001,
+    ):
+        self.exact_size = exact_size
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ids = set()
+        self.bloom_filter = None
+
+    def __len__(self) -> int:
+        if self.bloom_filter is not None:
+            return self.bloom_filter.count
+        return len(self.ids)
+
+    @staticmethod
+    def get_key(datapoint_id: int) -> bytes:
+        return str(datapoint_id).encode("utf-8")
+
+    def add(self, datapoint_id: int) -> bool:
+        """Add a datapoint ID. Return False if it was already seen."""
+        if self.bloom_filter is not None:
+            return self.bloom_filter.add(self.get_key(datapoint_id))
+        if datapoint_id in self.ids:
+            return False
+        self.ids.add(datapoint_id)
+        if len(self.ids) > self.exact_size:
+            self.to_bloom_filter()
+        return True
+
+    def to_bloom_filter(self) -> None:
+        """Move the exact set of IDs to a Bloom filter."""
+        console.info(
+            "More than {} seen IDs. Switch to a Bloom filter.".format(self.exact_size)
+        )
+        self.bloom_filter = BloomFilter(self.capacity, self.error_rate)
+        for datapoint_id in self.ids:
+            self.bloom_filter.add(self.get_key(datapoint_id))
+        self.ids = set()
+
+    def save(self, path: str) -> None:
+        """Save seen IDs durably as a JSON header line, followed by the Bloom filter bits."""
+        if self.bloom_filter is None:
+            header = dict(ids=sorted(self.ids))
+            write_durably(path, jsoncodec.dumps(header).encode("utf-8") + b"\n")
+            return
+        header = dict(
+            capacity=self.bloom_filter.capacity,
+            error_rate=self.bloom_filter.error_rate,
+            count=self.bloom_filter.count,
+        )
+        write_durably(
+            path,
+            jsoncodec.dumps(header).encode("utf-8")
+            + b"\n"
+            + bytes(self.bloom_filter.bits),
+        )
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "SeenIds":
+        """Load seen IDs saved at path, or an empty set if path does not exist.
+        A saved Bloom filter keeps its capacity, and error rate."""
+        seen_ids = cls(**kwargs)
+        if not os.path.exists(path):
+            return seen_ids
+        with open(path, "rb") as f:
+            header = jsoncodec.loads(f.readline())
+            bits = f.read()
+        if "ids" in header:
+            for datapoint_id in header["ids"]:
+                seen_ids.add(datapoint_id)
+        else:
+            seen_ids.bloom_filter = BloomFilter(
+                header["capacity"],
+                header["error_rate"],
+                bits=bytearray(bits),
+                count=header["count"],
+            )
+        console.info("Loaded {} seen IDs from {}".format(len(seen_ids), path))
+        return seen_ids
+
+
+def drop_duplicates(
+    datapoints: typing.Iterable[dict], seen_ids: SeenIds
+) -> typing.Iterable[dict]:
+    """Remove datapoints whose ID was already seen from the pipeline."""
+    duplicates = 0
+    for datapoint in datapoints:
+        if not seen_ids.add(datapoint["id"]):
+            duplicates += 1
+            continue
+        yield datapoint
+    console.info(dict(duplicates=duplicates))
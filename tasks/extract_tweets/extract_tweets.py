@@ -1,13 +1,31 @@
-import json
+import datetime
+import functools
 import logging
 import os
 import sys
 import typing
 
+from libdrm import jsoncodec
 from libdrm.common import iter_in_batches, get_version, path_arg, log_execution
-from libdrm.datamodels import DataPointModel, ZipFileModel
+from libdrm.datamodels import (
+    DataPointModel,
+    StreamFileModel,
+    ZipFileModel,
+    file_models,
+    open_file_model,
+    parse_datapoint,
+)
+from libdrm.checkpoints import Checkpoint
+from libdrm.increments import MembersManifest
 from libdrm.pipelines import Pipeline
+from libdrm.shards import cache_shards, shard_strategies
 
+from dedup import SeenIds, drop_duplicates
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
 
 # setup logging
 logging.basicConfig(level=logging.INFO)
@@ -74,6 +92,94 @@ def parse_json_lines(
     console.info(dict(missing_text=missing_text))
 
 
+# month numbers of the Twitter created_at format
+months = {
+    month: "{:02d}".format(number)
+    for number, month in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), start=1
+    )
+}
+
+
+def to_utc_key(value: datetime.datetime) -> str:
+    """UTC ISO 8601 key of a datetime, naive datetimes are UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="seconds")
+
+
+def created_at_key(created_at: str) -> typing.Optional[str]:
+    """UTC ISO 8601 key of a created_at value e.g. 2021-06-16T16:14:20 for
+    Wed Jun 16 16:14:20 +0000 2021. Keys compare as the datetimes they represent.
+
+    The Twitter format in UTC is sliced, instead of parsed by strptime.
+    Other offsets, and ISO 8601 values are parsed. Unknown formats are None."""
+    month = months.get(created_at[4:7])
+    if (
+        month is not None
+        and len(created_at) == 30
+        and created_at[20:25] == "+0000"
+        and created_at[26:30].isdigit()
+        and created_at[8:10].isdigit()
+    ):
+        return (
+            created_at[26:30]
+            + "-"
+            + month
+            + "-"
+            + created_at[8:10]
+            + "T"
+            + created_at[11:19]
+        )
+    for parse in (
+        lambda value: datetime.datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y"),
+        datetime.datetime.fromisoformat,
+    ):
+        try:
+            return to_utc_key(parse(created_at))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def time_window_arg(value: str) -> str:
+    """Custom time window argument parser. Return the UTC ISO 8601 key of the value."""
+    return to_utc_key(datetime.datetime.fromisoformat(value))
+
+
+def reject_time_window(
+    created_at: typing.Any, since: str = None, until: str = None
+) -> typing.Optional[str]:
+    """Metric of a created_at value out of the [since, until) time window, or None.
+    since, and until are UTC ISO 8601 keys. Values that are not strings e.g. missing
+    ones are not rejected, but left to validation."""
+    if not isinstance(created_at, str):
+        return None
+    key = created_at_key(created_at)
+    if key is None:
+        return "invalid_created_at"
+    if (since and key < since) or (until and key >= until):
+        return "out_of_window"
+    return None
+
+
+def filter_time_window(
+    json_lines: typing.Iterable[dict],
+    since: str = None,
+    until: str = None,
+) -> typing.Iterable[dict]:
+    """Remove json lines created out of the [since, until) time window from the pipeline."""
+    rejected = dict(out_of_window=0, invalid_created_at=0)
+    for jsonl in json_lines:
+        rejection = reject_time_window(jsonl.get("created_at"), since, until)
+        if rejection is not None:
+            rejected[rejection] += 1
+            continue
+        yield jsonl
+    console.info(dict(out_of_window=rejected["out_of_window"]))
+    console.info(dict(invalid_created_at=rejected["invalid_created_at"]))
+
+
 def build_datapoints(json_lines: typing.Iterable[dict]) -> typing.Iterable[dict]:
     """Build SMDRM datapoints from json lines
     base fields
@@ -87,10 +193,126 @@ def build_datapoints(json_lines: typing.Iterable[dict]) -> typing.Iterable[dict]
       - text_clean
     """
     for jsonl in json_lines:
-        # build datapoint from raw json
-        datapoint = DataPointModel.parse_obj(jsonl)
-        # yield as dictionary
-        yield datapoint.dict()
+        # build datapoint from raw json, and yield as dictionary
+        yield parse_datapoint(jsonl)
+
+
+# nested fields searched by extend_text_field, in the same order
+text_paths = [
+    ("retweeted_status", "extended_tweet", "full_text"),
+    ("retweeted_status", "full_text"),
+    ("extended_tweet", "full_text"),
+    ("full_text",),
+    ("retweeted_status", "text"),
+    ("text",),
+]
+# JSON objects, lazy ones included
+json_objects = (dict, simdjson.Object) if simdjson is not None else (dict,)
+
+
+def to_python(value: typing.Any) -> typing.Any:
+    """Convert a lazy simdjson object, or array to Python."""
+    if simdjson is not None:
+        if isinstance(value, simdjson.Object):
+            return value.as_dict()
+        if isinstance(value, simdjson.Array):
+            return value.as_list()
+    return value
+
+
+def find_extended_text(data: typing.Any, keys: typing.AbstractSet[str]) -> typing.Any:
+    """Equivalent of extend_text_field on a JSON object with the given keys.
+    It checks keys instead of catching exceptions, because missing keys
+    are expensive for lazy simdjson objects."""
+    for path in text_paths:
+        if path[0] not in keys:
+            continue
+        value = data[path[0]]
+        for key in path[1:]:
+            if not isinstance(value, json_objects) or key not in value.keys():
+                break
+            value = value[key]
+        else:
+            return value
+    return ""
+
+
+def project_fields(
+    obj: typing.Any, keys: typing.AbstractSet[str], fields: typing.Iterable[str]
+) -> dict:
+    """Copy the given fields of a JSON object with the given keys to a dictionary."""
+    return {field: to_python(obj[field]) for field in fields if field in keys}
+
+
+def extract_datapoints(
+    json_lines: typing.Iterable[bytes],
+    field_id="tweet",
+    since: str = None,
+    until: str = None,
+) -> typing.Iterable[dict]:
+    """Fused equivalent of the extraction steps, from filter_invalid_json_lines
+    to log_datapoints, on raw json lines in a single loop with the same metrics.
+    Tweets out of the [since, until) time window are rejected before validation.
+
+    With simdjson, lines are parsed on demand, and only the datapoint fields,
+    and the text fields of the tweet are converted to Python objects.
+    Otherwise, lines are fully parsed by the JSON codec."""
+    if simdjson is not None:
+        # simdjson parser is reused. It requires that its objects are released
+        parse = simdjson.Parser().parse
+        decode_errors = ValueError
+    else:
+        parse = jsoncodec.loads
+        decode_errors = jsoncodec.DecodeError
+    fields = [field.alias for field in DataPointModel.__fields__.values()]
+    invalid = 0
+    missing_text = 0
+    rejected = dict(out_of_window=0, invalid_created_at=0)
+    extracted = 0
+    for json_line in json_lines:
+        try:
+            jsonl = parse(json_line)
+        except decode_errors:
+            invalid += 1
+            continue
+        # get raw datapoint from `tweet` field if exists
+        if isinstance(jsonl, json_objects):
+            parsed_jsonl = jsonl[field_id] if field_id in jsonl.keys() else jsonl
+        else:
+            parsed_jsonl = jsonl.get(field_id, jsonl)
+        lazy = simdjson is not None and isinstance(parsed_jsonl, simdjson.Object)
+        if lazy:
+            keys = set(parsed_jsonl.keys())
+            if not find_extended_text(parsed_jsonl, keys):
+                missing_text += 1
+        elif not extend_text_field(parsed_jsonl):
+            missing_text += 1
+        if since or until:
+            if lazy:
+                created_at = (
+                    parsed_jsonl["created_at"] if "created_at" in keys else None
+                )
+            else:
+                created_at = parsed_jsonl.get("created_at")
+            rejection = reject_time_window(created_at, since, until)
+            if rejection is not None:
+                rejected[rejection] += 1
+                jsonl = parsed_jsonl = None
+                continue
+        if lazy:
+            datapoint = parse_datapoint(project_fields(parsed_jsonl, keys, fields))
+        else:
+            datapoint = parse_datapoint(to_python(parsed_jsonl))
+        jsonl = parsed_jsonl = None
+        extracted += 1
+        console.debug(datapoint)
+        yield datapoint
+    console.info(dict(invalid=invalid))
+    console.info(dict(missing_text=missing_text))
+    if since or until:
+        console.info(dict(out_of_window=rejected["out_of_window"]))
+        console.info(dict(invalid_created_at=rejected["invalid_created_at"]))
+    console.info(dict(extracted=extracted))
 
 
 def task_metrics(datapoints: typing.Iterable[dict]) -> typing.Iterable[dict]:
@@ -115,9 +337,7 @@ def make_ndjson_batches(
 ) -> typing.Iterable[str]:
     """Iterate NDJSON batches from a generator of JSON datapoints."""
     for batch in iter_in_batches(datapoints, batch_size=batch_size):
-        yield "".join(
-            [json.dumps(datapoint, ensure_ascii=False) + "\n" for datapoint in batch]
-        )
+        yield jsoncodec.dumps_ndjson(batch)
 
 
 @log_execution(console)
@@ -128,28 +348,149 @@ def run(args):
 
     # make output path
     if not args.output_path:
-        args.output_path = args.input_path.replace(".zip", "_ext.zip")
+        root, _ = os.path.splitext(args.input_path)
+        args.output_path = root + "_ext" + file_models[args.format].extension
         console.warning("Default output path is {}".format(args.output_path))
 
     # input path validation
-    zip_file = ZipFileModel(args.input_path)
-    if not zip_file.is_valid():
-        raise TypeError("Not a valid zip file.")
+    input_file = open_file_model(args.input_path)
+    if not input_file.is_valid():
+        raise TypeError("Not a valid input file.")
+
+    # process only the input members added since the previous run
+    members_manifest = new_members = None
+    # only zip input files are read by members
+    read_options = {}
+    append = False
+    if args.incremental:
+        if (
+            not isinstance(input_file, ZipFileModel)
+            or args.format != "ndjson"
+            or args.shards > 1
+        ):
+            raise ValueError(
+                "Incremental mode requires a zip input file, the ndjson format, and a single shard."
+            )
+        members = input_file.get_members()
+        members_manifest = MembersManifest(
+            args.output_path + ".members.json", args.output_path
+        )
+        new_members = members_manifest.get_new_members(members)
+        read_options = dict(members=new_members)
+        # an output without processed members is overwritten
+        append = bool(members_manifest.members)
 
     # build extraction pipeline
-    extract_pipeline = Pipeline()
-    extract_pipeline.add(filter_invalid_json_lines)
-    extract_pipeline.add(parse_json_lines, dict(field_id="tweet"))
-    extract_pipeline.add(build_datapoints)
-    extract_pipeline.add(task_metrics)
-    extract_pipeline.add(log_datapoints)
-    extract_pipeline.add(make_ndjson_batches, dict(batch_size=args.batch_size))
+    extract_pipeline = Pipeline(profile=args.profile, name="extract_tweets")
+    if args.engine == "fused":
+        if not isinstance(input_file, (ZipFileModel, StreamFileModel)):
+            raise ValueError("The fused engine requires an NDJSON input file.")
+        extract_pipeline.add(
+            extract_datapoints,
+            dict(field_id="tweet", since=args.since, until=args.until),
+        )
+        # raw json lines are parsed by the fused step
+        raw_datapoints = input_file.iter_bytes(**read_options)
+    else:
+        extract_pipeline.add(filter_invalid_json_lines)
+        extract_pipeline.add(parse_json_lines, dict(field_id="tweet"))
+        if args.since or args.until:
+            extract_pipeline.add(
+                filter_time_window, dict(since=args.since, until=args.until)
+            )
+        # datapoints validation is CPU bound
+        extract_pipeline.add(build_datapoints, workers=args.workers)
+        extract_pipeline.add(task_metrics)
+        extract_pipeline.add(log_datapoints)
+        raw_datapoints = input_file.iter_jsonl(
+            workers=args.read_workers, **read_options
+        )
+    # drop datapoints whose ID was already seen in the collection
+    seen_ids = None
+    if args.dedup or args.seen_ids_path:
+        dedup_options = dict(
+            exact_size=args.dedup_exact_size,
+            capacity=args.dedup_capacity,
+            error_rate=args.dedup_error_rate,
+        )
+        # seen IDs describe the output they were saved with, a rewritten output
+        # e.g. rebuilt after a member changed starts from no seen IDs
+        if args.seen_ids_path and append:
+            seen_ids = SeenIds.load(args.seen_ids_path, **dedup_options)
+        else:
+            seen_ids = SeenIds(**dedup_options)
+        extract_pipeline.add(drop_duplicates, dict(seen_ids=seen_ids))
+    # datapoints are batched by the pipeline, or by each shard
+    if args.format == "arrow":
+        make_batches = functools.partial(iter_in_batches, batch_size=args.batch_size)
+    else:
+        make_batches = functools.partial(
+            make_ndjson_batches, batch_size=args.batch_size
+        )
+    if args.shards <= 1:
+        extract_pipeline.add(make_batches)
+
+    # resume from the output batches committed by a previous run
+    checkpoint = None
+    if args.checkpoint:
+        if args.format != "ndjson" or extract_pipeline.reads_ahead or args.shards > 1:
+            raise ValueError(
+                "Checkpoints require the ndjson format, sequential pipeline steps, and a single shard."
+            )
+        checkpoint = Checkpoint(
+            args.output_path,
+            args.input_path,
+            options=dict(
+                batch_size=args.batch_size,
+                engine=args.engine,
+                dedup=seen_ids is not None,
+                since=args.since,
+                until=args.until,
+                incremental=args.incremental,
+            ),
+        )
+        raw_datapoints = checkpoint.iter_input(raw_datapoints)
+        # IDs of the committed output batches are seen
+        if seen_ids is not None:
+            for _, part_path in checkpoint.iter_parts():
+                with open(part_path, "rb") as f:
+                    for line in f:
+                        seen_ids.add(jsoncodec.loads(line)["id"])
 
     # execute pipeline on raw datapoints
-    extracted_datapoints = extract_pipeline.execute(zip_file.iter_jsonl())
+    extracted_datapoints = extract_pipeline.execute(raw_datapoints)
 
     # cache
-    zip_file.cache(args.output_path, extracted_datapoints)
+    if args.shards > 1:
+        # shards are written in their own thread, fed through a bounded queue
+        cache_shards(
+            file_models[args.format],
+            args.output_path,
+            extracted_datapoints,
+            args.shards,
+            make_batches,
+            shard_by=args.shard_by,
+            queue_size=max(args.write_queue_size, 1),
+            compression=args.compression,
+            compresslevel=args.compresslevel,
+        )
+    else:
+        output_file = file_models[args.format](args.output_path)
+        output_file.cache(
+            args.output_path,
+            extracted_datapoints,
+            compression=args.compression,
+            compresslevel=args.compresslevel,
+            queue_size=args.write_queue_size,
+            checkpoint=checkpoint,
+            append=append,
+        )
+    # seen IDs are saved once the output is complete
+    if args.seen_ids_path:
+        seen_ids.save(args.seen_ids_path)
+    # new members are processed once their output is appended
+    if members_manifest is not None:
+        members_manifest.add({name: members[name] for name in new_members})
 
 
 if __name__ == "__main__":
@@ -176,6 +517,118 @@ if __name__ == "__main__":
         default=1000,
         help="The size of each batch in which a file is split.",
     )
+    parser.add_argument(
+        "--format",
+        choices=list(file_models),
+        default="ndjson",
+        help="The output file format, NDJSON batches in a zip file or Arrow IPC stream. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compression",
+        default="stored",
+        help="The output file compression: stored, deflate, bzip2, lzma, or zstd (Python 3.14+) for zip files; stored, lz4, or zstd for Arrow files. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compresslevel",
+        type=int,
+        default=None,
+        help="The output file compression level. Default is the compression default.",
+    )
+    parser.add_argument(
+        "--write-queue-size",
+        type=int,
+        default=4,
+        help="The number of output batches produced ahead of the (compressed) write in a background thread. 0 writes synchronously. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--since",
+        type=time_window_arg,
+        default=None,
+        help="Drop tweets created before this ISO 8601 date, or datetime e.g. 2021-06-01 or 2021-06-01T12:00:00+02:00, in UTC unless an offset is given.",
+    )
+    parser.add_argument(
+        "--until",
+        type=time_window_arg,
+        default=None,
+        help="Drop tweets created at, or after this ISO 8601 date, or datetime.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="The number of independent output files, <output path>-0000K-of-0000N, listed in <output path>.manifest.json. Downstream tasks can process them in parallel. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=shard_strategies,
+        default="id",
+        help="Assign tweets to shards by hash of their ID, or round-robin. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["pipeline", "fused"],
+        default="pipeline",
+        help="The extraction engine. The fused engine parses only the fields it reads, in a single step. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        default=0,
+        help="The number of processes that decompress, and parse the input file. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="The number of processes that build datapoints. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Log a JSON report of items, and time of each pipeline step, and of the process peak memory.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        default=False,
+        help="Commit output batches to <output path>.ckpt, and resume from them after a failure. Requires the ndjson format, and sequential steps.",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        default=False,
+        help="Drop tweets whose ID was already seen.",
+    )
+    parser.add_argument(
+        "--seen-ids-path",
+        default=None,
+        help="The path of the IDs seen in the output, saved after the task, and loaded before it only if the output is appended in incremental mode. Implies --dedup.",
+    )
+    parser.add_argument(
+        "--dedup-exact-size",
+        type=int,
+        default=100000,
+        help="The number of seen IDs kept in an exact set, before switching to a Bloom filter. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--dedup-capacity",
+        type=int,
+        default=10000000,
+        help="The number of seen IDs the Bloom filter is sized for. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--dedup-error-rate",
+        type=float,
+        default=0.001,
+        help="The rate of unseen IDs the Bloom filter reports as seen, up to its capacity. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Extract only the input zip members added since the previous run, listed in <output path>.members.json, and append their output batches. Requires the ndjson format.",
+    )
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument(
         "--version",
@@ -0,0 +1,40 @@
+import logging
+from tests.conftest import dedup
+
+
+def test_drop_duplicates(caplog):
+    """Test if drop_duplicates discards datapoints with a seen ID, and logs them."""
+    datapoints = [dict(id=1), dict(id=2), dict(id=1), dict(id=3), dict(id=2)]
+    seen_ids = dedup.SeenIds()
+    with caplog.at_level(logging.INFO, logger="extract_tweets"):
+        result = list(dedup.drop_duplicates(datapoints, seen_ids))
+    assert [datapoint["id"] for datapoint in result] == [1, 2, 3]
+    assert "{'duplicates': 2}" in caplog.messages
+
+
+def test_seen_ids_switch_to_bloom_filter():
+    """Test if seen IDs beyond the exact size are kept in a Bloom filter."""
+    seen_ids = dedup.SeenIds(exact_size=100, capacity=10000, error_rate=0.001)
+    assert all(seen_ids.add(i) for i in range(1000))
+    assert seen_ids.bloom_filter is not None and not seen_ids.ids
+    assert len(seen_ids) == 1000
+    assert not any(seen_ids.add(i) for i in range(1000))
+    # false positives of unseen IDs are rare
+    false_positives = sum(not seen_ids.add(i) for i in range(1000, 11000))
+    assert false_positives < 100
+
+
+def test_seen_ids_save_and_load(tmp_path):
+    """Test if saved seen IDs are loaded, as exact set, or Bloom filter."""
+    for exact_size in [1000, 10]:
+        path = str(tmp_path / "seen_ids_{}".format(exact_size))
+        seen_ids = dedup.SeenIds(exact_size=exact_size, capacity=1000)
+        for i in range(100):
+            seen_ids.add(i)
+        seen_ids.save(path)
+        loaded = dedup.SeenIds.load(path, exact_size=exact_size, capacity=1000)
+        assert len(loaded) == 100
+        assert (loaded.bloom_filter is None) == (exact_size == 1000)
+        assert not any(loaded.add(i) for i in range(100))
+        assert loaded.add(100)
+    assert len(dedup.SeenIds.load(str(tmp_path / "missing"))) == 0
@@ -1,4 +1,12 @@
+import gzip
+import io
+import json
+import logging
 import pytest
+import runpy
+import sys
+import tarfile
+import zipfile
 from tests.conftest import extract_tweets
 
 
@@ -60,3 +68,248 @@ def test_make_ndjson_batches(valid_json_line):
     assert expected_batches == batch_id
     # newline chars count to find the number of datapoints
     assert expected_datapoints_per_batch == res.count("\n")
+
+
+raw_json_lines = [
+    json.dumps(dict(id=1, created_at="datetime", text="a text")),
+    json.dumps(dict(id="2", created_at="datetime", text="a text", lang="en")),
+    json.dumps(
+        dict(
+            id=3,
+            created_at="datetime",
+            text="RT a text",
+            user={"id": 1},
+            retweeted_status={"extended_tweet": {"full_text": "a longer text"}},
+        )
+    ),
+    json.dumps(
+        dict(
+            id=4,
+            created_at="datetime",
+            text="",
+            extended_tweet={"full_text": "a longer text"},
+            place={"name": "Ispra"},
+        )
+    ),
+    json.dumps(dict(id=5, created_at="datetime", text="")),
+    json.dumps(dict(tweet=dict(id=6, created_at="datetime", text="a text"))),
+    json.dumps(dict(id=7, created_at="datetime", text="a text", retweeted_status=None)),
+    '{"id": 8, "created_at": "datetime", "text": "a tex',
+    "",
+    '{"id": 9, "created_at": "datetime", "text": "caf\xe9"}',
+    '{"\\u0069d": 10, "created_at": "datetime", "text": "escaped \\u00e9"}',
+]
+
+
+@pytest.fixture()
+def raw_archive_path(tmp_path):
+    path = str(tmp_path / "raw.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("1.ndjson", "\n".join(raw_json_lines[:5]) + "\n")
+        data = "\n".join(raw_json_lines[5:]).encode("utf-8")
+        zf.writestr("2.ndjson", data.replace("caf\xe9".encode(), b"caf\xe9"))
+    yield path
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_extract_datapoints(raw_archive_path, caplog, monkeypatch, lazy):
+    """Test if the fused engine returns the datapoints, and metrics of the pipeline steps."""
+    if lazy and extract_tweets.simdjson is None:
+        pytest.skip("simdjson is not installed")
+    if not lazy:
+        monkeypatch.setattr(extract_tweets, "simdjson", None)
+        monkeypatch.setattr(extract_tweets, "json_objects", (dict,))
+    input_file = extract_tweets.ZipFileModel(raw_archive_path)
+    with caplog.at_level(logging.INFO, logger="extract_tweets"):
+        datapoints = extract_tweets.task_metrics(
+            extract_tweets.build_datapoints(
+                extract_tweets.parse_json_lines(
+                    extract_tweets.filter_invalid_json_lines(input_file.iter_jsonl())
+                )
+            )
+        )
+        expected = list(datapoints)
+        expected_metrics = [record.getMessage() for record in caplog.records]
+        caplog.clear()
+        result = list(extract_tweets.extract_datapoints(input_file.iter_bytes()))
+        metrics = [record.getMessage() for record in caplog.records]
+    assert [datapoint["id"] for datapoint in result] == [1, 2, 3, 4, 5, 6, 7, 10]
+    assert result == expected
+    assert (
+        metrics
+        == expected_metrics
+        == [
+            "{'invalid': 3}",
+            "{'missing_text': 1}",
+            "{'extracted': 8}",
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "created_at, expected",
+    [
+        ("Wed Jun 16 16:14:20 +0000 2021", "2021-06-16T16:14:20"),
+        ("Wed Jun 16 18:14:20 +0200 2021", "2021-06-16T16:14:20"),
+        ("2021-06-16T18:14:20+02:00", "2021-06-16T16:14:20"),
+        ("2021-06-16", "2021-06-16T00:00:00"),
+        ("datetime", None),
+        ("Wed Foo 16 16:14:20 +0000 2021", None),
+    ],
+)
+def test_created_at_key(created_at, expected):
+    """Test if created_at values are converted to UTC ISO 8601 keys."""
+    assert extract_tweets.created_at_key(created_at) == expected
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_extract_datapoints_in_time_window(tmp_path, caplog, monkeypatch, lazy):
+    """Test if both engines reject the same tweets out of the time window."""
+    if lazy and extract_tweets.simdjson is None:
+        pytest.skip("simdjson is not installed")
+    if not lazy:
+        monkeypatch.setattr(extract_tweets, "simdjson", None)
+        monkeypatch.setattr(extract_tweets, "json_objects", (dict,))
+    created_ats = [
+        "Mon May 31 23:59:59 +0000 2021",
+        "Tue Jun 01 00:00:00 +0000 2021",
+        "Tue Jun 01 01:30:00 +0200 2021",
+        "Wed Jun 16 16:14:20 +0000 2021",
+        "Thu Jul 01 00:00:00 +0000 2021",
+        "datetime",
+    ]
+    path = str(tmp_path / "raw.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        lines = [
+            json.dumps(dict(tweet=dict(id=n, created_at=created_at, text="a text")))
+            for n, created_at in enumerate(created_ats)
+        ]
+        zf.writestr("1.ndjson", "\n".join(lines) + "\n")
+    input_file = extract_tweets.ZipFileModel(path)
+    window = dict(since="2021-06-01T00:00:00", until="2021-07-01T00:00:00")
+    with caplog.at_level(logging.INFO, logger="extract_tweets"):
+        expected = list(
+            extract_tweets.build_datapoints(
+                extract_tweets.filter_time_window(
+                    extract_tweets.parse_json_lines(input_file.iter_jsonl()), **window
+                )
+            )
+        )
+        expected_metrics = [record.getMessage() for record in caplog.records]
+        caplog.clear()
+        result = list(
+            extract_tweets.extract_datapoints(input_file.iter_bytes(), **window)
+        )
+    assert [datapoint["id"] for datapoint in result] == [1, 3]
+    assert result == expected
+    assert expected_metrics[1:] == [
+        "{'out_of_window': 3}",
+        "{'invalid_created_at': 1}",
+    ]
+    assert "{'out_of_window': 3}" in caplog.messages
+    assert "{'invalid_created_at': 1}" in caplog.messages
+
+
+def run_task(monkeypatch, *argv):
+    """Run the task from the command line."""
+    monkeypatch.setattr(sys, "argv", ["extract_tweets.py", *argv])
+    runpy.run_path(extract_tweets.__file__, run_name="__main__")
+
+
+@pytest.mark.parametrize("engine", ["pipeline", "fused"])
+@pytest.mark.parametrize("input_name", ["raw.ndjson.gz", "raw.tar"])
+def test_run_with_stream_input(tmp_path, monkeypatch, engine, input_name):
+    """Test if the task extracts NDJSON, and tar input files, which are not read by members."""
+    data = ("\n".join(raw_json_lines) + "\n").encode("utf-8")
+    input_path = str(tmp_path / input_name)
+    if input_name.endswith(".gz"):
+        with gzip.open(input_path, "wb") as f:
+            f.write(data)
+    else:
+        with tarfile.open(input_path, "w") as tf:
+            info = tarfile.TarInfo("1.ndjson")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    output_path = str(tmp_path / "output.zip")
+    run_task(
+        monkeypatch,
+        "--input-path",
+        input_path,
+        "--output-path",
+        output_path,
+        "--engine",
+        engine,
+    )
+    result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["id"] for datapoint in result] == [1, 2, 3, 4, 5, 6, 7, 9, 10]
+
+
+def test_run_incremental_with_changed_member(tmp_path, monkeypatch):
+    """Test if the output is rebuilt, instead of appended, when a processed member changed."""
+    input_path = str(tmp_path / "raw.zip")
+    output_path = str(tmp_path / "output.zip")
+    argv = ["--input-path", input_path, "--output-path", output_path, "--incremental"]
+    with zipfile.ZipFile(input_path, "w") as zf:
+        zf.writestr("1.ndjson", raw_json_lines[0] + "\n")
+    run_task(monkeypatch, *argv)
+    with zipfile.ZipFile(input_path, "a") as zf:
+        zf.writestr("2.ndjson", raw_json_lines[1] + "\n")
+    run_task(monkeypatch, *argv)
+    result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["id"] for datapoint in result] == [1, 2]
+    # 1.ndjson is uploaded again with a new tweet
+    with zipfile.ZipFile(input_path, "w") as zf:
+        zf.writestr("1.ndjson", raw_json_lines[0] + "\n" + raw_json_lines[2] + "\n")
+        zf.writestr("2.ndjson", raw_json_lines[1] + "\n")
+    run_task(monkeypatch, *argv)
+    result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["id"] for datapoint in result] == [1, 3, 2]
+
+
+def test_run_incremental_rebuild_with_seen_ids(tmp_path, monkeypatch):
+    """Test if an output rebuilt after a member changed keeps the tweets seen
+    by the previous runs, while appended members are deduplicated."""
+
+    def tweets(*ids):
+        return "".join(
+            json.dumps(dict(id=i, created_at="datetime", text="a text")) + "\n"
+            for i in ids
+        )
+
+    input_path = str(tmp_path / "raw.zip")
+    output_path = str(tmp_path / "output.zip")
+    argv = ["--input-path", input_path, "--output-path", output_path]
+    argv += ["--engine", "fused", "--seen-ids-path", str(tmp_path / "seen")]
+    argv += ["--checkpoint", "--incremental"]
+    with zipfile.ZipFile(input_path, "w") as zf:
+        zf.writestr("a.ndjson", tweets(1, 2, 3, 4, 5))
+        zf.writestr("b.ndjson", tweets(6, 7, 8, 9, 10))
+    run_task(monkeypatch, *argv)
+    # b.ndjson changed, and c.ndjson is added
+    with zipfile.ZipFile(input_path, "w") as zf:
+        zf.writestr("a.ndjson", tweets(1, 2, 3, 4, 5))
+        zf.writestr("b.ndjson", tweets(6, 7, 8, 9, 10, 11))
+        zf.writestr("c.ndjson", tweets(12))
+    run_task(monkeypatch, *argv)
+    result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["id"] for datapoint in result] == list(range(1, 13))
+    # tweets of an appended member seen in the output are dropped
+    with zipfile.ZipFile(input_path, "a") as zf:
+        zf.writestr("d.ndjson", tweets(1, 13))
+    run_task(monkeypatch, *argv)
+    result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["id"] for datapoint in result] == list(range(1, 14))
+
+
+def test_run_again_with_seen_ids(tmp_path, monkeypatch):
+    """Test if an input extracted again to a rewritten output keeps its tweets."""
+    input_path = str(tmp_path / "raw.ndjson.gz")
+    with gzip.open(input_path, "wb") as f:
+        f.write(("\n".join(raw_json_lines[:3]) + "\n").encode("utf-8"))
+    output_path = str(tmp_path / "output.zip")
+    argv = ["--input-path", input_path, "--output-path", output_path]
+    argv += ["--seen-ids-path", str(tmp_path / "seen")]
+    for _ in range(2):
+        run_task(monkeypatch, *argv)
+        result = list(extract_tweets.ZipFileModel(output_path).iter_jsonl())
+        assert [datapoint["id"] for datapoint in result] == [1, 2, 3]
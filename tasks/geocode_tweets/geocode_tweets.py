@@ -1,12 +1,14 @@
-import json
 import logging
 import pandas
 import os
 import sys
 import typing
 
-from libdrm.datamodels import DataPointModel, ZipFileModel
+from libdrm.datamodels import DataPointModel, ZipFileModel, file_models, open_file_model
+from libdrm import jsoncodec
 from libdrm.common import iter_in_batches, get_version, path_arg, log_execution
+from libdrm.checkpoints import Checkpoint
+from libdrm.increments import MembersManifest
 from libdrm.pipelines import Pipeline
 
 # setup logging
@@ -212,9 +214,7 @@ def make_ndjson_batches(
 ) -> typing.Iterable[str]:
     """Iterate NDJSON batches from a generator of JSON datapoints."""
     for batch in iter_in_batches(datapoints, batch_size=batch_size):
-        yield "".join(
-            [json.dumps(datapoint, ensure_ascii=False) + "\n" for datapoint in batch]
-        )
+        yield jsoncodec.dumps_ndjson(batch)
 
 
 @log_execution(console)
@@ -232,13 +232,14 @@ def run(args):
 
     # make output path
     if not args.output_path:
-        args.output_path = args.input_path.replace(".zip", "_geo.zip")
+        root, _ = os.path.splitext(args.input_path)
+        args.output_path = root + "_geo" + file_models[args.format].extension
         console.warning("Default output path is {}".format(args.output_path))
 
     # input path validation
-    zip_file = ZipFileModel(args.input_path)
-    if not zip_file.is_valid():
-        console.error("Not a valid zip file.")
+    input_file = open_file_model(args.input_path)
+    if not input_file.is_valid():
+        console.error("Not a valid input file.")
         sys.exit(13)
 
     # load global places dataset
@@ -261,26 +262,80 @@ def run(args):
         )
 
     # build geocode pipeline
-    geocode_pipeline = Pipeline()
-    geocode_pipeline.add(geocode_datapoints, dict(places_df=places_df))
+    geocode_pipeline = Pipeline(profile=args.profile, name="geocode_tweets")
+    # places matching is CPU bound
+    geocode_pipeline.add(
+        geocode_datapoints, dict(places_df=places_df), workers=args.workers
+    )
     geocode_pipeline.add(task_metrics)
     geocode_pipeline.add(log_datapoints)
-    geocode_pipeline.add(make_ndjson_batches, dict(batch_size=args.batch_size))
-
+    if args.format == "arrow":
+        geocode_pipeline.add(iter_in_batches, dict(batch_size=args.batch_size))
+    else:
+        geocode_pipeline.add(make_ndjson_batches, dict(batch_size=args.batch_size))
+
+    # process only the input members added since the previous run
+    members_manifest = new_members = None
+    # only zip input files are read by members
+    read_options = {}
+    append = False
+    if args.incremental:
+        if not isinstance(input_file, ZipFileModel) or args.format != "ndjson":
+            raise ValueError(
+                "Incremental mode requires a zip input file, and the ndjson format."
+            )
+        members = input_file.get_members()
+        members_manifest = MembersManifest(
+            args.output_path + ".members.json", args.output_path
+        )
+        new_members = members_manifest.get_new_members(members)
+        read_options = dict(members=new_members)
+        # an output without processed members is overwritten
+        append = bool(members_manifest.members)
     # execute pipeline on annotated datapoints
-    datapoints = zip_file.iter_jsonl()
+    datapoints = input_file.iter_jsonl(workers=args.read_workers, **read_options)
+    # resume from the output batches committed by a previous run
+    checkpoint = None
+    if args.checkpoint:
+        if args.format != "ndjson" or geocode_pipeline.reads_ahead:
+            raise ValueError(
+                "Checkpoints require the ndjson format, and sequential pipeline steps."
+            )
+        checkpoint = Checkpoint(
+            args.output_path,
+            args.input_path,
+            options=dict(
+                incremental=args.incremental,
+                batch_size=args.batch_size,
+                region_id=args.region_id,
+                bbox=[args.min_lon, args.min_lat, args.max_lon, args.max_lat],
+            ),
+        )
+        datapoints = checkpoint.iter_input(datapoints)
     geocoded_datapoints = geocode_pipeline.execute(datapoints)
 
     # cache
-    zip_file.cache(args.output_path, geocoded_datapoints)
+    output_file = file_models[args.format](args.output_path)
+    output_file.cache(
+        args.output_path,
+        geocoded_datapoints,
+        compression=args.compression,
+        compresslevel=args.compresslevel,
+        queue_size=args.write_queue_size,
+        checkpoint=checkpoint,
+        append=append,
+    )
+    # new members are processed once their output is appended
+    if members_manifest is not None:
+        members_manifest.add({name: members[name] for name in new_members})
 
 
 if __name__ == "__main__":
     """
     Exit Codes
       11 - Path not found
-      12 - Path is a directory, but a zip file is expected
-      13 - Not a valid zip file
+      12 - Path is a directory, but an input file is expected
+      13 - Not a valid input file
     """
 
     from argparse import ArgumentParser
@@ -335,6 +390,59 @@ if __name__ == "__main__":
         type=int,
         help="region ID that triggered the task.",
     )
+    parser.add_argument(
+        "--format",
+        choices=list(file_models),
+        default="ndjson",
+        help="output file format, NDJSON batches in a zip file or Arrow IPC stream. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compression",
+        default="stored",
+        help="the output file compression: stored, deflate, bzip2, lzma, or zstd (Python 3.14+) for zip files; stored, lz4, or zstd for Arrow files. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compresslevel",
+        type=int,
+        default=None,
+        help="the output file compression level. Default is the compression default.",
+    )
+    parser.add_argument(
+        "--write-queue-size",
+        type=int,
+        default=4,
+        help="the number of output batches produced ahead of the (compressed) write in a background thread. 0 writes synchronously. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        default=0,
+        help="number of processes that decompress, and parse the input file. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="number of processes that geocode datapoints. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="log a JSON report of items, and time of each pipeline step, and of the process peak memory.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        default=False,
+        help="commit output batches to <output path>.ckpt, and resume from them after a failure. Requires the ndjson format, and sequential steps.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="process only the input zip members added since the previous run, listed in <output path>.members.json, and append their output batches. Requires the ndjson format.",
+    )
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument(
         "--version",
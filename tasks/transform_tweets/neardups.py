@@ -0,0 +1,133 @@
+import collections
+import re
+import threading
+import typing
+import zlib
+
+import numpy
+
+# Mersenne prime of the MinHash permutations i.e. (a * x + b) % prime,
+# small enough for the products to fit in 64 bits unsigned integers
+prime = (1 << 31) - 1
+# URLs, user mentions, and punctuation do not make texts different
+noise = re.compile(r"https?:\S+|@\w+|[^\w\s]+")
+
+
+def get_shingles(text: str, size: int) -> typing.Set[str]:
+    """Word n-grams of size of a text normalized without the RT prefix, URLs, user
+    mentions, and punctuation. Texts shorter than size are a single shingle."""
+    tokens = noise.sub(" ", text).lower().split()
+    if tokens[:1] == ["rt"]:
+        tokens = tokens[1:]
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def get_bands(num_perm: int, threshold: float) -> typing.Tuple[int, int]:
+    """Number of LSH bands, and rows per band, whose similarity threshold
+    i.e. (1 / bands) ** (1 / rows) is the closest to threshold."""
+    return min(
+        (
+            (num_perm // rows, rows)
+            for rows in range(1, num_perm + 1)
+            if num_perm % rows == 0
+        ),
+        key=lambda bands_rows: abs(
+            (1 / bands_rows[0]) ** (1 / bands_rows[1]) - threshold
+        ),
+    )
+
+
+def map_place_candidates(
+    candidates: typing.Optional[dict], text: str
+) -> typing.Optional[dict]:
+    """Place candidates of a near-duplicate representative that occur in text."""
+    if not candidates:
+        return None
+    mapped = {
+        tag_type: [name for name in names if name in text]
+        for tag_type, names in candidates.items()
+    }
+    return mapped if any(mapped.values()) else None
+
+
+class NearDuplicates:
+    """Cluster near-duplicate texts with MinHash signatures, and LSH.
+
+    Texts whose estimated Jaccard similarity of their shingles is at least
+    threshold are assigned to the first text of their cluster, its representative.
+    Clusters are found in one pass: each text is compared only to representatives
+    that share an LSH band bucket with it. Cluster sizes are collected across calls."""
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        shingle_size: int = 3,
+        seed: int = 0,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = get_bands(num_perm, threshold)
+        random_state = numpy.random.RandomState(seed)
+        self.a = random_state.randint(1, prime, size=(num_perm, 1)).astype(numpy.uint64)
+        self.b = random_state.randint(0, prime, size=(num_perm, 1)).astype(numpy.uint64)
+        # number of clusters by size
+        self.cluster_sizes = collections.Counter()
+        self.lock = threading.Lock()
+
+    def get_signature(self, text: str) -> numpy.ndarray:
+        """MinHash signature of the shingles of text."""
+        shingles = get_shingles(text, self.shingle_size)
+        hashes = numpy.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=numpy.uint64,
+            count=len(shingles),
+        )
+        return ((self.a * (hashes % prime) + self.b) % prime).min(axis=1)
+
+    def find_representatives(self, texts: typing.List[str]) -> typing.List[int]:
+        """Position of the representative of the cluster of each text."""
+        buckets = {}
+        signatures = []
+        representatives = []
+        sizes = collections.Counter()
+        for position, text in enumerate(texts):
+            signature = self.get_signature(text)
+            signatures.append(signature)
+            keys = [
+                (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+                for band in range(self.bands)
+            ]
+            representative = position
+            for key in keys:
+                candidate = buckets.get(key)
+                if candidate is not None and (
+                    numpy.count_nonzero(signatures[candidate] == signature)
+                    >= self.threshold * self.num_perm
+                ):
+                    representative = candidate
+                    break
+            if representative == position:
+                for key in keys:
+                    buckets.setdefault(key, position)
+            representatives.append(representative)
+            sizes[representative] += 1
+        with self.lock:
+            self.cluster_sizes.update(sizes.values())
+        return representatives
+
+    def get_stats(self) -> dict:
+        """Cluster-size statistics of the texts clustered so far."""
+        texts = sum(size * count for size, count in self.cluster_sizes.items())
+        clusters = sum(self.cluster_sizes.values())
+        return dict(
+            near_duplicate_texts=texts - clusters,
+            near_duplicate_clusters=sum(
+                count for size, count in self.cluster_sizes.items() if size > 1
+            ),
+            max_cluster_size=max(self.cluster_sizes, default=0),
+            mean_cluster_size=round(texts / clusters, 4) if clusters else 0.0,
+        )
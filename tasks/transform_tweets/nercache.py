@@ -0,0 +1,165 @@
+import collections
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import typing
+
+from libdrm import jsoncodec
+
+console = logging.getLogger("transform_tweets")
+
+# SQLite limits the number of variables of a statement
+max_variables = 500
+
+
+class NERCache:
+    """Content addressed cache of NER results i.e. (tokens, tags) of a text.
+
+    Results are keyed by hash of the text, and of the model identifier, so that
+    a new model never reuses the results of another. Recent results are kept in
+    an in-memory LRU tier of memory_size texts. If path is given, results are also
+    stored in a SQLite database, shared across batches, and runs. It is bounded to
+    disk_size texts, evicted by least recent use, and results older than ttl seconds,
+    if any, are expired. It is safe to use from concurrent threads."""
+
+    def __init__(
+        self,
+        model_id: str,
+        path: str = None,
+        memory_size: int = 100000,
+        disk_size: int = 1000000,
+        ttl: float = None,
+    ):
+        self.model_id = model_id
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        self.lock = threading.Lock()
+        if path is not None:
+            # the cache is used by the threads of the NER step
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            with self.connection:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS ner "
+                    "(key BLOB PRIMARY KEY, value BLOB, created REAL, accessed REAL)"
+                )
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS ner_accessed ON ner (accessed)"
+                )
+                if ttl is not None:
+                    self.connection.execute(
+                        "DELETE FROM ner WHERE created < ?", (time.time() - ttl,)
+                    )
+            self.disk_count = self.connection.execute(
+                "SELECT COUNT(*) FROM ner"
+            ).fetchone()[0]
+            console.info("Loaded {} NER results from {}".format(self.disk_count, path))
+
+    def get_key(self, text: str) -> bytes:
+        return hashlib.blake2b(
+            "{}\0{}".format(self.model_id, text).encode("utf-8"), digest_size=16
+        ).digest()
+
+    def get_many(self, texts: typing.List[str]) -> typing.List[typing.Optional[list]]:
+        """NER results of texts, None for those not in the cache."""
+        keys = [self.get_key(text) for text in texts]
+        with self.lock:
+            results = []
+            for key in keys:
+                result = self.memory.get(key)
+                if result is not None:
+                    self.memory.move_to_end(key)
+                results.append(result)
+            # look up memory misses on disk
+            missing = [key for key, result in zip(keys, results) if result is None]
+            if missing and self.connection is not None:
+                found = self.read(missing)
+                for position, key in enumerate(keys):
+                    if results[position] is None and key in found:
+                        results[position] = found[key]
+                        self.remember(key, found[key])
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+            return results
+
+    def put_many(self, texts: typing.List[str], results: typing.List[list]) -> None:
+        """Cache NER results of texts."""
+        keys = [self.get_key(text) for text in texts]
+        with self.lock:
+            for key, result in zip(keys, results):
+                self.remember(key, result)
+            if self.connection is not None:
+                self.write(keys, results)
+
+    def remember(self, key: bytes, result: list) -> None:
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def read(self, keys: typing.List[bytes]) -> typing.Dict[bytes, list]:
+        """Read results from disk, and mark them as used."""
+        now = time.time()
+        expired = now - self.ttl if self.ttl is not None else float("-inf")
+        found = {}
+        for start in range(0, len(keys), max_variables):
+            chunk = keys[start : start + max_variables]
+            rows = self.connection.execute(
+                "SELECT key, value, created FROM ner WHERE key IN ({})".format(
+                    ",".join("?" * len(chunk))
+                ),
+                chunk,
+            )
+            for key, value, created in rows:
+                if created >= expired:
+                    found[key] = jsoncodec.loads(value)
+        if found:
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE ner SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def write(self, keys: typing.List[bytes], results: typing.List[list]) -> None:
+        """Write results to disk, and evict the least recently used beyond disk_size."""
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR REPLACE INTO ner VALUES (?, ?, ?, ?)",
+                [
+                    (key, jsoncodec.dumps(result).encode("utf-8"), now, now)
+                    for key, result in zip(keys, results)
+                ],
+            )
+            # replaced i.e. expired results are counted too, until the exact count
+            self.disk_count += cursor.rowcount
+            if self.disk_count > self.disk_size:
+                self.disk_count = self.connection.execute(
+                    "SELECT COUNT(*) FROM ner"
+                ).fetchone()[0]
+            if self.disk_count > self.disk_size:
+                self.connection.execute(
+                    "DELETE FROM ner WHERE key IN "
+                    "(SELECT key FROM ner ORDER BY accessed LIMIT ?)",
+                    (self.disk_count - self.disk_size,),
+                )
+                self.disk_count = self.disk_size
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 4) if lookups else 0.0
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
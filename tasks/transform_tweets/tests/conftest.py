@@ -73,6 +73,8 @@ class DeepPavlovMockResponse:
     """Custom class to mock the return value of tag_with_mult_bert()
     will override the requests.Response returned from requests.post"""
 
+    status_code = 200
+
     def __init__(self, payload):
         self.payload = payload
 
@@ -1,8 +1,16 @@
 import pandas
+import time
 import pytest
 import requests
+import runpy
+import sys
+from libdrm import jsoncodec
+from libdrm.batching import AdaptiveBatchSize
+from libdrm.datamodels import ArrowFileModel, ZipFileModel
+from nercache import NERCache
 from tests.conftest import (
     transform_tweets,
+    transformations,
     DeepPavlovMockResponse,
 )
 
@@ -284,3 +292,169 @@ def test_transform_datapoints(datapoints_with_duplicates, monkeypatch):
 
         for _ in g:
             continue
+
+
+def test_transform_datapoints_in_flight(monkeypatch, allowed_tags):
+    """Test if batches tagged concurrently are yielded in input order."""
+
+    def tag_with_mult_bert(texts, **kwargs):
+        # later batches are tagged faster
+        time.sleep(0.01 / int(texts[0].split()[-1]))
+        tokens = [text.split() for text in texts]
+        return [tokens, [["O"] * len(text_tokens) for text_tokens in tokens]]
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    datapoints_batches = [
+        pandas.DataFrame(
+            [
+                {
+                    "id": batch,
+                    "text": "text of batch {}".format(batch),
+                    "place": None,
+                    "text_clean": None,
+                },
+                {
+                    "id": batch,
+                    "text": "text of batch {}".format(batch),
+                    "place": None,
+                    "text_clean": None,
+                },
+            ]
+        )
+        for batch in range(1, 6)
+    ]
+    transformed = transform_tweets.transform_datapoints(
+        iter(datapoints_batches), allowed_tags, in_flight=3
+    )
+    assert [list(batch_df.id) for batch_df in transformed] == [
+        [batch, batch] for batch in range(1, 6)
+    ]
+
+
+def test_transform_records(datapoints_with_duplicates, monkeypatch, allowed_tags):
+    """Test if transform_records tags unique texts only, keeps the input order,
+    and transforms datapoints like transform_datapoints."""
+    calls = []
+    # deeppavlov output of the unique texts, by first token
+    outputs = {
+        tokens[0]: [tokens, tags] for tokens, tags in zip(*deeppavlov_output_payload)
+    }
+
+    def tag_with_mult_bert(texts, **kwargs):
+        calls.append(texts)
+        y_hat = [outputs[text.split()[0]] for text in texts]
+        return [[tokens for tokens, _ in y_hat], [tags for _, tags in y_hat]]
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    datapoints = datapoints_with_duplicates.to_dict(orient="records")
+    transformed = next(
+        transform_tweets.transform_records(iter([datapoints]), allowed_tags)
+    )
+    assert len(calls[0]) == 4
+    assert [datapoint["id"] for datapoint in transformed] == [1, 2, 3, 2, 2, 4]
+    assert transformed[3]["place"] == {
+        "candidates": {"GPE": ["Rio de Janeiro", "Paris"]}
+    }
+    expected = next(
+        transform_tweets.transform_datapoints(
+            iter([datapoints_with_duplicates]), allowed_tags
+        )
+    )
+    assert sorted(transformed, key=lambda datapoint: datapoint["id"]) == sorted(
+        expected.to_dict(orient="records"), key=lambda datapoint: datapoint["id"]
+    )
+
+
+def test_tag_by_length(monkeypatch):
+    """Test if texts are tagged in buckets of similar token length by window,
+    and results are in the order of texts."""
+    calls = []
+
+    def tag_with_mult_bert(texts, **kwargs):
+        calls.append(texts)
+        tokens = [text.split() for text in texts]
+        return [tokens, [["O"] * len(text_tokens) for text_tokens in tokens]]
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    texts = ["a b c d", "a", "a b", "a b c d e f", "a b c", "a"]
+    assert transform_tweets.tag_by_length(
+        texts, length_buckets=[4, 2], length_window=4
+    ) == tag_with_mult_bert(texts)
+    assert calls[:-1] == [
+        ["a", "a b"],
+        ["a b c d"],
+        ["a b c d e f"],
+        ["a"],
+        ["a b c"],
+    ]
+
+
+def test_tag_by_length_with_request_size(monkeypatch):
+    """Test if the texts of each length bucket are tagged in adaptive requests."""
+    calls = []
+
+    def tag_with_mult_bert(texts, **kwargs):
+        calls.append(texts)
+        tokens = [text.split() for text in texts]
+        return [tokens, [["O"] * len(text_tokens) for text_tokens in tokens]]
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    texts = ["a b c", "a", "a b c d", "a", "a"]
+    request_size = AdaptiveBatchSize(1.0, max_size=2)
+    assert transform_tweets.tag_by_length(
+        texts, length_buckets=[2], request_size=request_size
+    ) == tag_with_mult_bert(texts)
+    assert calls[:-1] == [["a", "a"], ["a"], ["a b c", "a b c d"]]
+    assert request_size.get_stats()["requests"] == 3
+
+
+def test_run_with_arrow_input(tmp_path, monkeypatch):
+    """Test if the task transforms an Arrow input file, which is not read by members."""
+
+    def post(session, url, headers, data, timeout):
+        tokens = [text.split() for text in jsoncodec.loads(data)["texts"]]
+        tags = [["O"] * len(text_tokens) for text_tokens in tokens]
+        return DeepPavlovMockResponse(payload=[tokens, tags])
+
+    monkeypatch.setattr(requests.Session, "post", post)
+    input_path = str(tmp_path / "input.arrows")
+    ArrowFileModel(input_path).cache(
+        input_path, iter([[dict(id=1, text="a text"), dict(id=2, text="@user b")]])
+    )
+    output_path = str(tmp_path / "output.zip")
+    argv = ["transform_tweets.py", "--input-path", input_path]
+    monkeypatch.setattr(sys, "argv", argv + ["--output-path", output_path])
+    runpy.run_path(transform_tweets.__file__, run_name="__main__")
+    result = list(ZipFileModel(output_path).iter_jsonl())
+    assert [datapoint["text_clean"] for datapoint in result] == ["a text", "b"]
+
+
+def test_run_closes_ner_cache_on_error(tmp_path, monkeypatch):
+    """Test if the NER cache, and the normalizer pool are closed when the NER API fails."""
+
+    def post(session, url, headers, data, timeout):
+        raise RuntimeError("NER API is down")
+
+    closed = []
+    close = NERCache.close
+    monkeypatch.setattr(requests.Session, "post", post)
+    monkeypatch.setattr(NERCache, "close", lambda cache: closed.append(close(cache)))
+    pools = []
+    normalizer_close = transformations.TextNormalizer.close
+
+    def close_normalizer(normalizer):
+        pools.append(normalizer.pool is not None)
+        normalizer_close(normalizer)
+
+    monkeypatch.setattr(transformations.TextNormalizer, "close", close_normalizer)
+    input_path = str(tmp_path / "input.arrows")
+    ArrowFileModel(input_path).cache(input_path, iter([[dict(id=1, text="a text")]]))
+    argv = ["transform_tweets.py", "--input-path", input_path]
+    argv += ["--output-path", str(tmp_path / "output.zip")]
+    argv += ["--ner-cache-path", str(tmp_path / "ner.sqlite")]
+    argv += ["--normalize-workers", "2"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(RuntimeError):
+        runpy.run_path(transform_tweets.__file__, run_name="__main__")
+    assert closed == [None]
+    assert pools == [True]
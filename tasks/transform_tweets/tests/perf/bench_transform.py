@@ -0,0 +1,317 @@
+"""Throughput of the transform_tweets text processing on the annotators performance corpora.
+
+Run from the transform_tweets directory, so that the task modules are importable."""
+
+import glob
+import json
+import logging
+import os
+import pandas
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import typing
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+from libdrm import jsoncodec
+import transform_tweets
+from transformations import (
+    TextNormalizer,
+    apply_transformations,
+    mask_places,
+    normalize_places,
+)
+
+console = logging.getLogger("transform_tweets.perftests")
+
+# multilingual 5k datapoints corpora of the annotators performance tests
+default_data_dir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../../../annotators/tests/perf/data"
+)
+
+
+def load_texts(data_dir: str) -> typing.Dict[str, typing.List[str]]:
+    """Map corpus name e.g. en_5k to the texts of its datapoints."""
+    paths = sorted(glob.glob(os.path.join(data_dir, "*.zip")))
+    if not paths:
+        raise FileNotFoundError("No zip files found in {}.".format(data_dir))
+    corpora = {}
+    for path in paths:
+        with zipfile.ZipFile(path) as archive:
+            corpora[os.path.basename(path)[: -len(".zip")]] = [
+                jsoncodec.loads(line)["text"]
+                for info in archive.infolist()
+                for line in archive.read(info).splitlines()
+            ]
+    return corpora
+
+
+def best_of(func: typing.Callable, repeat: int = 3) -> float:
+    """Best wall time of a function call in seconds over a number of repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_normalization(corpora: dict, repeat: int, workers: int) -> list:
+    """apply_transformations() row by row against the TextNormalizer batches."""
+    results = []
+    engines = dict(
+        apply_transformations=lambda texts: [apply_transformations(t) for t in texts],
+        normalizer=TextNormalizer(),
+    )
+    if workers > 1:
+        engines["normalizer_{}_workers".format(workers)] = TextNormalizer(
+            workers=workers
+        )
+    for corpus, texts in corpora.items():
+        baseline = None
+        for name, normalize in engines.items():
+            seconds = best_of(lambda: normalize(texts), repeat)
+            baseline = baseline or seconds
+            result = dict(
+                benchmark="normalization",
+                corpus=corpus,
+                engine=name,
+                texts=len(texts),
+                seconds=round(seconds, 6),
+                texts_per_second=round(len(texts) / seconds, 2),
+                speedup=round(baseline / seconds, 2),
+            )
+            console.info(result)
+            results.append(result)
+    for normalize in engines.values():
+        getattr(normalize, "close", lambda: None)()
+    return results
+
+
+def make_place_candidates(texts: typing.List[str], seed: int = 0) -> typing.List[dict]:
+    """Place candidates of texts, as tagged by the NER model: up to 3 capitalized
+    names of 1 or 2 alphanumeric tokens of each text, or None for half of them."""
+    rng = random.Random(seed)
+    place_candidates = []
+    for text in texts:
+        tokens = text.split()
+        starts = [
+            i for i, token in enumerate(tokens) if token.isalnum() and token.istitle()
+        ]
+        if not starts or rng.random() < 0.5:
+            place_candidates.append({"candidates": None})
+            continue
+        names = []
+        for start in rng.sample(starts, min(len(starts), rng.randint(1, 3))):
+            end = start + 1
+            if end < len(tokens) and tokens[end].isalnum() and rng.random() < 0.3:
+                end += 1
+            names.append(" ".join(tokens[start:end]))
+        place_candidates.append({"candidates": {"GPE": names}})
+    return place_candidates
+
+
+def bench_place_masking(corpora: dict, repeat: int) -> list:
+    """normalize_places() by DataFrame.apply() against mask_places() batches."""
+    results = []
+    for corpus, texts in corpora.items():
+        places = make_place_candidates(texts)
+        batch_df = pandas.DataFrame(dict(text=texts, place=places))
+        engines = dict(
+            dataframe_apply=lambda: batch_df.apply(
+                lambda row: normalize_places(row.text, row.place["candidates"]),
+                axis=1,
+            ),
+            mask_places=lambda: mask_places(
+                list(batch_df.text), [place["candidates"] for place in batch_df.place]
+            ),
+        )
+        baseline = None
+        for name, mask in engines.items():
+            seconds = best_of(mask, repeat)
+            baseline = baseline or seconds
+            result = dict(
+                benchmark="place_masking",
+                corpus=corpus,
+                engine=name,
+                texts=len(texts),
+                seconds=round(seconds, 6),
+                texts_per_second=round(len(texts) / seconds, 2),
+                speedup=round(baseline / seconds, 2),
+            )
+            console.info(result)
+            results.append(result)
+    return results
+
+
+def tag_by_whitespace(texts: typing.List[str], **kwargs) -> typing.List[list]:
+    """NER model stand-in that tags capitalized tokens as B-GPE, so that the
+    engines are benchmarked without the latency of the DeepPavlov API."""
+    tokens = [text.split() for text in texts]
+    tags = [
+        ["B-GPE" if token.istitle() else "O" for token in text_tokens]
+        for text_tokens in tokens
+    ]
+    return [tokens, tags]
+
+
+def peak_memory(func: typing.Callable) -> int:
+    """Peak memory in bytes allocated by a function call, traced by tracemalloc."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_engines(corpora: dict, repeat: int, batch_size: int) -> list:
+    """transform_datapoints() on pandas.DataFrame against transform_records()
+    on JSON datapoints, from input batches to NDJSON batches."""
+    transform_tweets.tag_with_mult_bert = tag_by_whitespace
+    allowed_tags = ["B-GPE", "I-GPE", "B-FAC", "I-FAC", "B-LOC", "I-LOC"]
+    engines = dict(
+        dataframe=lambda batches: transform_tweets.transform_datapoints(
+            transform_tweets.convert_to_dataframe(batches), allowed_tags
+        ),
+        records=lambda batches: transform_tweets.transform_records(
+            batches, allowed_tags
+        ),
+    )
+    results = []
+    for corpus, texts in corpora.items():
+        datapoints = [
+            dict(id=i, text=text, place=None, text_clean=None)
+            for i, text in enumerate(texts)
+        ]
+
+        def run(transform):
+            # the records engine transforms datapoints in place
+            batches = (
+                [dict(datapoint) for datapoint in datapoints[i : i + batch_size]]
+                for i in range(0, len(datapoints), batch_size)
+            )
+            for _ in transform_tweets.make_ndjson_batches(transform(batches)):
+                pass
+
+        baseline = None
+        for name, transform in engines.items():
+            seconds = best_of(lambda: run(transform), repeat)
+            baseline = baseline or seconds
+            result = dict(
+                benchmark="engine",
+                corpus=corpus,
+                engine=name,
+                texts=len(texts),
+                seconds=round(seconds, 6),
+                texts_per_second=round(len(texts) / seconds, 2),
+                speedup=round(baseline / seconds, 2),
+                peak_memory_mb=round(peak_memory(lambda: run(transform)) / 2**20, 2),
+            )
+            console.info(result)
+            results.append(result)
+    return results
+
+
+def bench_length_buckets(
+    corpora: dict, batch_size: int, length_buckets: typing.List[int]
+) -> list:
+    """Tokens of the NER requests of batches, padded to the longest text of each
+    request, without, and with length buckets i.e. the cost driver of BERT inference."""
+    results = []
+    for corpus, texts in corpora.items():
+        requests = dict(batch=[], length_buckets=[])
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start : start + batch_size]
+            requests["batch"].append(batch)
+            requests["length_buckets"] += [
+                [batch[position] for position in bucket]
+                for bucket in transform_tweets.get_length_buckets(
+                    batch, sorted(length_buckets)
+                )
+            ]
+        baseline = None
+        for name, batches in requests.items():
+            padded_tokens = sum(
+                len(batch) * max(len(text.split()) for text in batch)
+                for batch in batches
+            )
+            baseline = baseline or padded_tokens
+            result = dict(
+                benchmark="length_buckets",
+                corpus=corpus,
+                engine=name,
+                texts=len(texts),
+                requests=len(batches),
+                padded_tokens=padded_tokens,
+                reduction=round(baseline / padded_tokens, 2),
+            )
+            console.info(result)
+            results.append(result)
+    return results
+
+
+def write_results(path: str, results: typing.List[dict]) -> None:
+    """Write benchmark results with environment metadata as JSON."""
+    report = dict(
+        benchmark="transform",
+        python=platform.python_version(),
+        machine=platform.machine(),
+        results=results,
+    )
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="transform_tweets benchmarks.")
+    parser.add_argument(
+        "--data-dir",
+        default=default_data_dir,
+        help="The directory of the zip files to benchmark. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="The number of repetitions, the best is kept. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--workers",
+        default=0,
+        type=int,
+        help="The number of processes of the parallel normalizer, if > 1. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        default=1000,
+        type=int,
+        help="The size of the batches of the engine benchmark. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--length-buckets",
+        nargs="*",
+        type=int,
+        default=[8, 16, 24],
+        help="The token lengths that bound the buckets of the NER requests. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--output-path",
+        default=None,
+        help="The path to which you want to save the JSON results.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    corpora = load_texts(args.data_dir)
+    results = bench_normalization(corpora, args.repeat, args.workers)
+    results += bench_place_masking(corpora, args.repeat)
+    results += bench_engines(corpora, args.repeat, args.batch_size)
+    results += bench_length_buckets(corpora, args.batch_size, args.length_buckets)
+    if args.output_path:
+        write_results(args.output_path, results)
@@ -0,0 +1,61 @@
+from tests.conftest import transform_tweets
+from neardups import NearDuplicates, get_bands, map_place_candidates
+
+text = "Flood alert in Valencia, the river level is rising, stay safe at home"
+
+
+def test_near_duplicates_find_representatives():
+    near_duplicates = NearDuplicates(threshold=0.8)
+    texts = [
+        text,
+        "Storm in Porto, bridges are closed until tomorrow morning",
+        "RT @user: " + text + " https://t.co/nVdULr6JXG",
+        "@user " + text + "!",
+        "Storm in Porto, bridges are closed until tomorrow morning https://t.co/x",
+    ]
+    assert near_duplicates.find_representatives(texts) == [0, 1, 0, 0, 1]
+    assert near_duplicates.get_stats() == dict(
+        near_duplicate_texts=3,
+        near_duplicate_clusters=2,
+        max_cluster_size=3,
+        mean_cluster_size=2.5,
+    )
+
+
+def test_get_bands():
+    assert get_bands(64, 0.8) == (8, 8)
+    assert get_bands(64, 0.5) == (16, 4)
+
+
+def test_map_place_candidates():
+    candidates = {"GPE": ["Valencia", "Paris"], "LOC": ["Turia"]}
+    assert map_place_candidates(candidates, text) == {"GPE": ["Valencia"], "LOC": []}
+    assert map_place_candidates(candidates, "no places") is None
+    assert map_place_candidates(None, text) is None
+
+
+def test_get_place_candidates_tags_representatives(monkeypatch, allowed_tags):
+    calls = []
+
+    def tag_with_mult_bert(texts):
+        calls.append(texts)
+        tokens = [t.replace(",", "").split() for t in texts]
+        tags = [
+            ["B-GPE" if token == "Valencia" else "O" for token in t] for t in tokens
+        ]
+        return [tokens, tags]
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    long_text = (
+        text
+        + ", the bridges are closed, and the schools will remain closed until the water level drops"
+    )
+    texts = [long_text, "RT @user: " + long_text.replace("Valencia", "València")]
+    place_candidates = transform_tweets.get_place_candidates(
+        texts, allowed_tags, near_duplicates=NearDuplicates(threshold=0.7)
+    )
+    assert calls == [[long_text]]
+    assert place_candidates == [
+        {"candidates": {"GPE": ["Valencia"]}},
+        {"candidates": None},
+    ]
@@ -0,0 +1,59 @@
+from tests.conftest import transform_tweets
+from nercache import NERCache
+
+
+def tag_by_whitespace(texts):
+    """Fake NER model that tags tokens split by whitespace as O."""
+    tokens = [text.split() for text in texts]
+    return [tokens, [["O"] * len(text_tokens) for text_tokens in tokens]]
+
+
+def test_ner_cache_memory_tier():
+    ner_cache = NERCache("model", memory_size=2)
+    ner_cache.put_many(["a b", "c"], [[["a", "b"], ["O", "O"]], [["c"], ["O"]]])
+    assert ner_cache.get_many(["a b", "d"]) == [[["a", "b"], ["O", "O"]], None]
+    # "c" is the least recently used
+    ner_cache.put_many(["d"], [[["d"], ["O"]]])
+    assert ner_cache.get_many(["c"]) == [None]
+    assert (ner_cache.hits, ner_cache.misses, ner_cache.hit_rate) == (1, 2, 0.3333)
+
+
+def test_ner_cache_disk_tier(tmp_path):
+    path = str(tmp_path / "ner.sqlite")
+    ner_cache = NERCache("model", path=path, memory_size=0, disk_size=2)
+    ner_cache.put_many(["a", "b"], [[["a"], ["O"]], [["b"], ["O"]]])
+    ner_cache.close()
+    # results persist across runs, and the least recently used is evicted
+    ner_cache = NERCache("model", path=path, memory_size=0, disk_size=2)
+    with ner_cache.connection:
+        ner_cache.connection.execute(
+            "UPDATE ner SET accessed = 0 WHERE key = ?", (ner_cache.get_key("b"),)
+        )
+    ner_cache.put_many(["c"], [[["c"], ["O"]]])
+    assert ner_cache.get_many(["a", "b", "c"]) == [
+        [["a"], ["O"]],
+        None,
+        [["c"], ["O"]],
+    ]
+    # results of another model are not reused
+    assert NERCache("other", path=path).get_many(["a"]) == [None]
+    # expired results
+    assert NERCache("model", path=path, ttl=-1).get_many(["a", "c"]) == [None, None]
+
+
+def test_tag_texts_with_ner_cache(monkeypatch):
+    calls = []
+
+    def tag_with_mult_bert(texts):
+        calls.append(texts)
+        return tag_by_whitespace(texts)
+
+    monkeypatch.setattr(transform_tweets, "tag_with_mult_bert", tag_with_mult_bert)
+    ner_cache = NERCache("model")
+    texts = ["a b", "c"]
+    assert transform_tweets.tag_texts(texts, ner_cache) == tag_by_whitespace(texts)
+    texts = ["c", "d e", "a b"]
+    assert transform_tweets.tag_texts(texts, ner_cache) == tag_by_whitespace(texts)
+    # only misses are sent to the model
+    assert calls == [["a b", "c"], ["d e"]]
+    assert ner_cache.hit_rate == 0.4
@@ -1,4 +1,11 @@
-from tests.conftest import transformations
+import glob
+import os
+import pytest
+import requests
+import zipfile
+
+from libdrm import jsoncodec
+from tests.conftest import transformations, DeepPavlovMockResponse
 
 # expected place candidate extraction output
 # wrt the datapoints fixtures in tests.conftest
@@ -96,6 +103,26 @@ def test_extract_place_candidates_non_alpha_gpe(allowed_tags):
     ]
 
 
+def test_decode_bio_spans(allowed_tags):
+    """Test if spans of a run of allowed tags end together, and may overlap."""
+    deeppavlov_output_payload = [
+        [["Rio", "de", "Janeiro", "Brazil", "!", "in", "Porto"], []],
+        [["B-GPE", "I-GPE", "I-GPE", "B-GPE", "I-GPE", "O", "B-LOC"], []],
+    ]
+    spans = transformations.decode_bio_spans(
+        deeppavlov_output_payload,
+        *transformations.compile_allowed_tags(allowed_tags),
+    )
+    assert spans == [
+        [
+            ("GPE", 0, 5, "Rio de Janeiro Brazil"),
+            ("GPE", 3, 5, "Brazil"),
+            ("LOC", 6, 7, "Porto"),
+        ],
+        [],
+    ]
+
+
 def test_normalize_places(
     datapoint_without_place, datapoint_with_gpe, datapoint_with_loc
 ):
@@ -119,3 +146,83 @@ def test_apply_transformations():
     result = transformations.apply_transformations(text)
     expected = "nos nos vemos   or or or en la sb nick and cia  runtomiami sbliv 100yardas yarders nfl  badurl   _urlincl_ _locincl_"
     assert result == expected
+
+
+def test_tag_with_mult_bert_retries(monkeypatch):
+    """Test if tag_with_mult_bert retries a NER request after a connection error."""
+    calls = []
+
+    def post(url, headers, data, timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise requests.ConnectionError("connection refused")
+        return DeepPavlovMockResponse(payload=[[["a"]], [["O"]]])
+
+    monkeypatch.setattr(requests, "post", post)
+    monkeypatch.setattr(transformations.time, "sleep", lambda seconds: None)
+    y_hat = transformations.tag_with_mult_bert(["a"], timeout=5, retries=2)
+    assert y_hat == [[["a"]], [["O"]]]
+    assert calls == [5, 5, 5]
+    with pytest.raises(requests.ConnectionError):
+        calls.clear()
+        transformations.tag_with_mult_bert(["a"], retries=1)
+
+
+# texts whose normalization depends on the order of the passes
+ordered_passes_texts = [
+    "\rRT x",
+    "a\r&amp; b",
+    "x http\n",
+    "x http://a  HTTPS",
+    "12:30@abc at 5 p.m.",
+    "RT RT  #T hi",
+    "https://x.com/12:30 ok",
+    'say "hi" \\ #tag _u#rl_ _l.oc_ x',
+    "[x]{y}~ a-b_c!! ’",
+]
+
+
+def test_normalize_text_golden_output():
+    """Test if the text normalizer output is the apply_transformations output
+    on the annotators performance corpora, if available, and on edge cases."""
+    texts = list(ordered_passes_texts)
+    data_dir = os.path.join(
+        os.path.dirname(__file__), "../../../../annotators/tests/perf/data"
+    )
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.zip"))):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                texts.extend(
+                    jsoncodec.loads(line)["text"]
+                    for line in archive.read(info).splitlines()
+                )
+    expected = [transformations.apply_transformations(text) for text in texts]
+    assert transformations.TextNormalizer()(texts) == expected
+    # the pool is started on creation, before any thread
+    normalizer = transformations.TextNormalizer(workers=2, chunk_size=4)
+    assert normalizer.pool is not None
+    assert normalizer(ordered_passes_texts) == expected[: len(ordered_passes_texts)]
+    normalizer.close()
+    assert normalizer.pool is None
+
+
+def test_mask_places():
+    """Test if mask_places returns the normalize_places output of each text."""
+    texts = [
+        "Un texte d`information sur Rio de Janeiro, écrit à Paris.",
+        "New York City",
+        "Rio de Janeiro, Rio",
+        "No es de Brasil o Argentina",
+        "a text without place candidates",
+    ]
+    place_candidates = [
+        expected_place_candidates[1]["candidates"],
+        {"GPE": ["York City", "New York"]},
+        {"GPE": ["Rio", "Rio de Janeiro"]},
+        {"GPE": ["o", "o"], "LOC": []},
+        None,
+    ]
+    assert transformations.mask_places(texts, place_candidates) == [
+        transformations.normalize_places(text, candidates)
+        for text, candidates in zip(texts, place_candidates)
+    ]
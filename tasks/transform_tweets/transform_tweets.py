@@ -1,19 +1,29 @@
+import bisect
+import collections
+import concurrent.futures
 import logging
 import os
 import pandas
 import typing
 import sys
 
-from libdrm.datamodels import ZipFileModel
+from libdrm import jsoncodec
+from libdrm.datamodels import ZipFileModel, file_models, open_file_model
+from libdrm.batching import AdaptiveBatchSize
 from libdrm.common import iter_in_batches, get_version, path_arg, log_execution
+from libdrm.checkpoints import Checkpoint
+from libdrm.increments import MembersManifest
 from libdrm.pipelines import Pipeline
 
 from transformations import (
+    make_session,
     tag_with_mult_bert,
     extract_place_candidates,
-    normalize_places,
-    apply_transformations,
+    mask_places,
+    TextNormalizer,
 )
+from nercache import NERCache
+from neardups import NearDuplicates, map_place_candidates
 
 # setup logging
 logging.basicConfig(level=logging.INFO)
@@ -44,38 +54,267 @@ def merge_duplicates_on_transformed(unique_transformed, duplicates):
     )
 
 
+def get_length_buckets(
+    texts: typing.List[str], boundaries: typing.List[int]
+) -> typing.List[typing.List[int]]:
+    """Positions of texts sorted by number of whitespace tokens, grouped into buckets
+    of up to each of the sorted boundaries, and above the last one. Empty buckets are
+    dropped."""
+    lengths = [len(text.split()) for text in texts]
+    buckets = [[] for _ in range(len(boundaries) + 1)]
+    for position in sorted(range(len(texts)), key=lengths.__getitem__):
+        buckets[bisect.bisect_left(boundaries, lengths[position])].append(position)
+    return [bucket for bucket in buckets if bucket]
+
+
+def tag_in_requests(
+    texts: typing.List[str], request_size: AdaptiveBatchSize = None, **ner_options
+) -> typing.List[list]:
+    """Tag texts with DeepPavlov NER model, and the tag_with_mult_bert() options.
+    With a request size controller, texts are sent in requests sized towards
+    its target latency."""
+    if request_size is None:
+        return tag_with_mult_bert(texts, **ner_options)
+    tokens, tags = [], []
+    for _, (request_tokens, request_tags) in request_size.call(
+        lambda request: tag_with_mult_bert(request, **ner_options), texts
+    ):
+        tokens.extend(request_tokens)
+        tags.extend(request_tags)
+    return [tokens, tags]
+
+
+def tag_by_length(
+    texts: typing.List[str],
+    length_buckets: typing.List[int] = None,
+    length_window: int = 0,
+    **ner_options,
+) -> typing.List[list]:
+    """Tag texts with DeepPavlov NER model, and the tag_in_requests() options.
+    With length buckets, texts are tagged in sub-batches of similar token length,
+    as the model pads the texts of a request to the longest one. Windows of
+    length_window texts, or all the texts if 0, are bucketed separately.
+    Results are in the order of texts."""
+    if not length_buckets:
+        return tag_in_requests(texts, **ner_options)
+    boundaries = sorted(length_buckets)
+    window = max(length_window or len(texts), 1)
+    tokens = [None] * len(texts)
+    tags = [None] * len(texts)
+    for start in range(0, len(texts), window):
+        window_texts = texts[start : start + window]
+        for bucket in get_length_buckets(window_texts, boundaries):
+            bucket_tokens, bucket_tags = tag_in_requests(
+                [window_texts[position] for position in bucket], **ner_options
+            )
+            # restore the order of texts
+            for position, text_tokens, text_tags in zip(
+                bucket, bucket_tokens, bucket_tags
+            ):
+                tokens[start + position] = text_tokens
+                tags[start + position] = text_tags
+    return [tokens, tags]
+
+
+def tag_texts(
+    texts: typing.List[str], ner_cache: NERCache = None, ner_options: dict = None
+) -> typing.List[list]:
+    """Tag texts with DeepPavlov NER model, and the tag_by_length() options.
+    With a NER cache, only the texts missing from it are sent to the model,
+    and their results are cached."""
+    ner_options = ner_options or {}
+    if ner_cache is None:
+        return tag_by_length(texts, **ner_options)
+    results = ner_cache.get_many(texts)
+    misses = [text for text, result in zip(texts, results) if result is None]
+    if misses:
+        tokens, tags = tag_by_length(misses, **ner_options)
+        tagged = [list(result) for result in zip(tokens, tags)]
+        ner_cache.put_many(misses, tagged)
+        tagged = iter(tagged)
+        results = [result if result is not None else next(tagged) for result in results]
+    return [[result[0] for result in results], [result[1] for result in results]]
+
+
+def get_place_candidates(
+    texts: typing.List[str],
+    allowed_tags: typing.List[str],
+    ner_cache: NERCache = None,
+    near_duplicates: NearDuplicates = None,
+    ner_options: dict = None,
+) -> typing.List[dict]:
+    """Place candidates of texts. With near duplicates, only the representative
+    of each cluster of near-duplicate texts is tagged, and its place candidates
+    that occur in the other texts of the cluster are mapped onto them."""
+    if near_duplicates is None:
+        y_hat = tag_texts(texts, ner_cache, ner_options)
+        return extract_place_candidates(y_hat, allowed_tags)
+    representatives = near_duplicates.find_representatives(texts)
+    positions = sorted(set(representatives))
+    y_hat = tag_texts(
+        [texts[position] for position in positions], ner_cache, ner_options
+    )
+    places = dict(zip(positions, extract_place_candidates(y_hat, allowed_tags)))
+    return [
+        places[position]
+        if representative == position
+        else {
+            "candidates": map_place_candidates(
+                places[representative]["candidates"], text
+            )
+        }
+        for position, (text, representative) in enumerate(zip(texts, representatives))
+    ]
+
+
+def complete_batch(
+    unique_datapoints: pandas.DataFrame,
+    duplicated_datapoints: pandas.DataFrame,
+    place_candidates: concurrent.futures.Future,
+    normalizer: TextNormalizer,
+) -> pandas.DataFrame:
+    """Complete the transformation of a batch, once its place candidates are tagged."""
+    unique_datapoints["place"] = place_candidates.result()
+    # normalize place candidates and non-alphanumeric chars in text
+    unique_datapoints["text_clean"] = normalizer(
+        mask_places(
+            list(unique_datapoints.text),
+            [place["candidates"] for place in unique_datapoints.place],
+        )
+    )
+    # merge the transformation applied to unique datapoints onto the duplicated
+    return merge_duplicates_on_transformed(unique_datapoints, duplicated_datapoints)
+
+
 def transform_datapoints(
     datapoints_batches: typing.Iterable[pandas.DataFrame],
     allowed_tags: typing.List[str],
+    ner_cache: NERCache = None,
+    near_duplicates: NearDuplicates = None,
+    ner_options: dict = None,
+    in_flight: int = 1,
+    normalizer: TextNormalizer = None,
 ) -> typing.Iterable[pandas.DataFrame]:
-    for batch_id, batch_df in enumerate(datapoints_batches, start=1):
+    """Transform batches of datapoints. Up to in_flight batches are tagged
+    concurrently by the NER model, and batches are yielded in input order.
+    Texts are normalized in batches by normalizer."""
+    normalizer = normalizer or TextNormalizer()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=in_flight) as executor:
+        pending = collections.deque()
+        for batch_id, batch_df in enumerate(datapoints_batches, start=1):
 
-        # find duplicated datapoints in batch
-        duplicates = get_duplicates_filter(batch_df)
-        console.debug(
-            "duplication ratio {:.4f}".format(duplicates.sum() / len(duplicates))
-        )
+            # find duplicated datapoints in batch
+            duplicates = get_duplicates_filter(batch_df)
+            console.debug(
+                "duplication ratio {:.4f}".format(duplicates.sum() / len(duplicates))
+            )
+
+            # split batch into unique and duplicated datapoints
+            # only unique datapoints are tagged with the NER algorithm
+            unique_datapoints = batch_df[~duplicates].copy()
+            duplicated_datapoints = batch_df[duplicates].copy()
+
+            # tag texts with DeepPavlov (multilingual BERT) NER model,
+            # and get place candidates using allowed tags
+            place_candidates = executor.submit(
+                get_place_candidates,
+                list(unique_datapoints.text),
+                allowed_tags,
+                ner_cache,
+                near_duplicates,
+                ner_options,
+            )
+            pending.append((unique_datapoints, duplicated_datapoints, place_candidates))
+            if len(pending) >= in_flight:
+                yield complete_batch(*pending.popleft(), normalizer)
+        while pending:
+            yield complete_batch(*pending.popleft(), normalizer)
+
+
+def index_unique_texts(
+    texts: typing.List[str],
+) -> typing.Tuple[typing.List[str], typing.List[int]]:
+    """Unique texts in input order, and the index of the unique text of each text."""
+    first_indices = {}
+    indices = [first_indices.setdefault(text, len(first_indices)) for text in texts]
+    return list(first_indices), indices
+
+
+def complete_records_batch(
+    datapoints_batch: typing.List[dict],
+    unique_texts: typing.List[str],
+    indices: typing.List[int],
+    place_candidates: concurrent.futures.Future,
+    normalizer: TextNormalizer,
+) -> typing.List[dict]:
+    """Complete the transformation of a batch of JSON datapoints in place,
+    once the place candidates of its unique texts are tagged."""
+    places = place_candidates.result()
+    # normalize place candidates and non-alphanumeric chars in unique texts
+    texts_clean = normalizer(
+        mask_places(unique_texts, [place["candidates"] for place in places])
+    )
+    # duplicated datapoints share the transformation of their first occurrence
+    for datapoint, index in zip(datapoints_batch, indices):
+        datapoint["place"] = places[index]
+        datapoint["text_clean"] = texts_clean[index]
+    return datapoints_batch
+
+
+def transform_records(
+    datapoints_batches: typing.Iterable[typing.List[dict]],
+    allowed_tags: typing.List[str],
+    ner_cache: NERCache = None,
+    near_duplicates: NearDuplicates = None,
+    ner_options: dict = None,
+    in_flight: int = 1,
+    normalizer: TextNormalizer = None,
+) -> typing.Iterable[typing.List[dict]]:
+    """Transform batches of JSON datapoints like transform_datapoints(),
+    without DataFrame copies, and merges. Datapoints keep their input order."""
+    normalizer = normalizer or TextNormalizer()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=in_flight) as executor:
+        pending = collections.deque()
+        for datapoints_batch in datapoints_batches:
+            # only unique texts are tagged with the NER algorithm
+            unique_texts, indices = index_unique_texts(
+                [datapoint["text"] for datapoint in datapoints_batch]
+            )
+            console.debug(
+                "duplication ratio {:.4f}".format(
+                    1 - len(unique_texts) / max(len(indices), 1)
+                )
+            )
+            place_candidates = executor.submit(
+                get_place_candidates,
+                unique_texts,
+                allowed_tags,
+                ner_cache,
+                near_duplicates,
+                ner_options,
+            )
+            pending.append((datapoints_batch, unique_texts, indices, place_candidates))
+            if len(pending) >= in_flight:
+                yield complete_records_batch(*pending.popleft(), normalizer)
+        while pending:
+            yield complete_records_batch(*pending.popleft(), normalizer)
 
-        # split batch into unique and duplicated datapoints
-        # only unique datapoints are tagged with the NER algorithm
-        unique_datapoints = batch_df[~duplicates].copy()
-        duplicated_datapoints = batch_df[duplicates].copy()
 
-        # tag texts with DeepPavlov (multilingual BERT) NER model
-        y_hat = tag_with_mult_bert(list(unique_datapoints.text))
-        # get place candidates using allowed tags
-        unique_datapoints["place"] = extract_place_candidates(y_hat, allowed_tags)
-        # normalize place candidates and non-alphanumeric chars in text
-        unique_datapoints["text_clean"] = unique_datapoints.apply(
-            lambda row: normalize_places(row.text, row.place["candidates"]), axis=1
-        ).apply(apply_transformations)
-        # merge the transformation applied to unique datapoints onto the duplicated
-        yield merge_duplicates_on_transformed(unique_datapoints, duplicated_datapoints)
+def to_records(
+    datapoints_batch: typing.Union[pandas.DataFrame, typing.List[dict]]
+) -> typing.List[dict]:
+    """JSON datapoints of a batch of either transform engine."""
+    if isinstance(datapoints_batch, pandas.DataFrame):
+        return datapoints_batch.to_dict(orient="records")
+    return datapoints_batch
 
 
 def task_metrics(
-    datapoints_batches: typing.Iterable[pandas.DataFrame],
-) -> typing.Iterable[pandas.DataFrame]:
+    datapoints_batches: typing.Iterable[typing.Union[pandas.DataFrame, list]],
+    ner_cache: NERCache = None,
+    near_duplicates: NearDuplicates = None,
+    ner_request_size: AdaptiveBatchSize = None,
+) -> typing.Iterable[typing.Union[pandas.DataFrame, list]]:
     """Compute task metrics."""
     batches = 0
     datapoints = 0
@@ -86,22 +325,39 @@ def task_metrics(
         # number of datapoints in batch
         datapoints += len(datapoints_batch)
         # number of datapoints in batch with place candidates
-        with_place_candidates += datapoints_batch.place.apply(
-            lambda row: bool(row["candidates"])
-        ).sum()
-        yield datapoints_batch
-    console.info(
-        dict(
-            batches=batches,
-            datapoints=datapoints,
-            with_place_candidated=with_place_candidates,
+        places = (
+            datapoints_batch.place
+            if isinstance(datapoints_batch, pandas.DataFrame)
+            else (datapoint["place"] for datapoint in datapoints_batch)
         )
+        with_place_candidates += sum(bool(place["candidates"]) for place in places)
+        yield datapoints_batch
+    metrics = dict(
+        batches=batches,
+        datapoints=datapoints,
+        with_place_candidated=with_place_candidates,
     )
+    if ner_cache is not None:
+        metrics.update(
+            ner_cache_hits=ner_cache.hits,
+            ner_cache_misses=ner_cache.misses,
+            ner_cache_hit_rate=ner_cache.hit_rate,
+        )
+    if near_duplicates is not None:
+        metrics.update(near_duplicates.get_stats())
+    if ner_request_size is not None:
+        metrics.update(
+            {
+                "ner_{}".format(name): value
+                for name, value in ner_request_size.get_stats().items()
+            }
+        )
+    console.info(metrics)
 
 
 def log_datapoints(
-    datapoints_batches: typing.Iterable[pandas.DataFrame],
-) -> typing.Iterable[pandas.DataFrame]:
+    datapoints_batches: typing.Iterable[typing.Union[pandas.DataFrame, list]],
+) -> typing.Iterable[typing.Union[pandas.DataFrame, list]]:
     """Log datapoints to console."""
     for batch_id, datapoints_batch in enumerate(datapoints_batches, start=1):
         console.debug(
@@ -109,16 +365,24 @@ def log_datapoints(
                 batch_id
             )
         )
-        console.debug(datapoints_batch.head(5))
+        console.debug(datapoints_batch[:5])
         yield datapoints_batch
 
 
 def make_ndjson_batches(
-    datapoints_batches: typing.Iterable[pandas.DataFrame],
+    datapoints_batches: typing.Iterable[typing.Union[pandas.DataFrame, list]],
 ) -> typing.Iterable[str]:
-    """Convert datapoints batched from pandas.DataFrame to NDJSON format."""
-    for batch_df in datapoints_batches:
-        yield batch_df.to_json(orient="records", force_ascii=False, lines=True)
+    """Convert datapoints batches to NDJSON format."""
+    for datapoints_batch in datapoints_batches:
+        yield jsoncodec.dumps_ndjson(to_records(datapoints_batch))
+
+
+def make_records_batches(
+    datapoints_batches: typing.Iterable[typing.Union[pandas.DataFrame, list]],
+) -> typing.Iterable[typing.List[dict]]:
+    """Convert datapoints batches to lists of JSON datapoints."""
+    for datapoints_batch in datapoints_batches:
+        yield to_records(datapoints_batch)
 
 
 @log_execution(console)
@@ -129,35 +393,163 @@ def run(args):
 
     # make output path
     if not args.output_path:
-        args.output_path = args.input_path.replace(".zip", "_tra.zip")
+        root, _ = os.path.splitext(args.input_path)
+        args.output_path = root + "_tra" + file_models[args.format].extension
         console.warning("Default output path is {}".format(args.output_path))
 
     # input path validation
-    zip_file = ZipFileModel(args.input_path)
-    if not zip_file.is_valid():
-        raise TypeError("Not a valid zip file.")
+    input_file = open_file_model(args.input_path)
+    if not input_file.is_valid():
+        raise TypeError("Not a valid input file.")
 
     # DeepPavlov NER algorithm uses prefixes to indicate B-egin,
     # and I-nside relative positions of tokens. For more details, visit
     # http://docs.deeppavlov.ai/en/master/features/models/ner.html#ner-task.
     allowed_tags = ["B-GPE", "I-GPE", "B-FAC", "I-FAC", "B-LOC", "I-LOC"]
     console.info("Allowed NER tags={}".format(allowed_tags))
+    # NER results of texts seen in previous batches, or runs
+    ner_cache = None
+    if args.ner_cache_size > 0 or args.ner_cache_path:
+        ner_cache = NERCache(
+            args.ner_model_id,
+            path=args.ner_cache_path,
+            memory_size=args.ner_cache_size,
+            disk_size=args.ner_cache_disk_size,
+            ttl=args.ner_cache_ttl,
+        )
+    # texts of large batches are normalized by a pool of processes, started
+    # before the pipeline, and writer threads
+    normalizer = TextNormalizer(workers=args.normalize_workers)
+    # the NER cache, and the pool are closed even when the pipeline fails
+    try:
+        # NER requests are sized towards a target latency
+        ner_request_size = None
+        if args.ner_target_latency:
+            ner_request_size = AdaptiveBatchSize(
+                args.ner_target_latency,
+                min_size=args.ner_min_request_size,
+                max_size=args.ner_max_request_size or args.batch_size,
+            )
+        # NER requests reuse pooled connections, and in flight batches overlap
+        # with the preparation of the next ones
+        ner_options = dict(
+            session=make_session(args.ner_in_flight),
+            timeout=args.ner_timeout,
+            retries=args.ner_retries,
+            backoff=args.ner_backoff,
+            length_buckets=args.ner_length_buckets,
+            length_window=args.ner_length_window,
+            request_size=ner_request_size,
+        )
+        # only one text of each cluster of near-duplicate texts is tagged
+        near_duplicates = None
+        if args.near_duplicates:
+            near_duplicates = NearDuplicates(threshold=args.near_duplicate_threshold)
 
-    # build transformation pipeline
-    transform_pipeline = Pipeline()
-    transform_pipeline.add(iter_in_batches, dict(batch_size=args.batch_size))
-    transform_pipeline.add(convert_to_dataframe)
-    transform_pipeline.add(transform_datapoints, dict(allowed_tags=allowed_tags))
-    transform_pipeline.add(task_metrics)
-    transform_pipeline.add(log_datapoints)
-    transform_pipeline.add(make_ndjson_batches)
+        # build transformation pipeline
+        transform_pipeline = Pipeline(profile=args.profile, name="transform_tweets")
+        # input reading, and requests to the NER API run in their own threads
+        # when step queue size > 0, to overlap with each other, and with the other steps
+        transform_pipeline.add(
+            iter_in_batches,
+            dict(batch_size=args.batch_size),
+            queue_size=args.step_queue_size,
+        )
+        # the dataframe engine transforms batches as pandas.DataFrame,
+        # the records engine transforms the JSON datapoints in place
+        transform = transform_records
+        if args.engine == "dataframe":
+            transform_pipeline.add(convert_to_dataframe)
+            transform = transform_datapoints
+        transform_pipeline.add(
+            transform,
+            dict(
+                allowed_tags=allowed_tags,
+                ner_cache=ner_cache,
+                near_duplicates=near_duplicates,
+                ner_options=ner_options,
+                in_flight=max(args.ner_in_flight, 1),
+                normalizer=normalizer,
+            ),
+            queue_size=args.step_queue_size,
+        )
+        transform_pipeline.add(
+            task_metrics,
+            dict(
+                ner_cache=ner_cache,
+                near_duplicates=near_duplicates,
+                ner_request_size=ner_request_size,
+            ),
+        )
+        transform_pipeline.add(log_datapoints)
+        if args.format == "arrow":
+            transform_pipeline.add(make_records_batches)
+        else:
+            transform_pipeline.add(make_ndjson_batches)
 
-    # execute pipeline on extracted datapoints
-    datapoints = zip_file.iter_jsonl()
-    transformed_datapoints = transform_pipeline.execute(datapoints)
+        # process only the input members added since the previous run
+        members_manifest = new_members = None
+        # only zip input files are read by members
+        read_options = {}
+        append = False
+        if args.incremental:
+            if not isinstance(input_file, ZipFileModel) or args.format != "ndjson":
+                raise ValueError(
+                    "Incremental mode requires a zip input file, and the ndjson format."
+                )
+            members = input_file.get_members()
+            members_manifest = MembersManifest(
+                args.output_path + ".members.json", args.output_path
+            )
+            new_members = members_manifest.get_new_members(members)
+            read_options = dict(members=new_members)
+            # an output without processed members is overwritten
+            append = bool(members_manifest.members)
+        # execute pipeline on extracted datapoints
+        datapoints = input_file.iter_jsonl(workers=args.read_workers, **read_options)
+        # resume from the output batches committed by a previous run
+        checkpoint = None
+        if args.checkpoint:
+            if (
+                args.format != "ndjson"
+                or transform_pipeline.reads_ahead
+                or args.ner_in_flight > 1
+            ):
+                raise ValueError(
+                    "Checkpoints require the ndjson format, sequential pipeline steps, and one NER request in flight."
+                )
+            checkpoint = Checkpoint(
+                args.output_path,
+                args.input_path,
+                options=dict(
+                    incremental=args.incremental,
+                    engine=args.engine,
+                    batch_size=args.batch_size,
+                    near_duplicates=near_duplicates is not None,
+                    near_duplicate_threshold=args.near_duplicate_threshold,
+                ),
+            )
+            datapoints = checkpoint.iter_input(datapoints)
+        transformed_datapoints = transform_pipeline.execute(datapoints)
 
-    # cache
-    zip_file.cache(args.output_path, transformed_datapoints)
+        # cache
+        output_file = file_models[args.format](args.output_path)
+        output_file.cache(
+            args.output_path,
+            transformed_datapoints,
+            compression=args.compression,
+            compresslevel=args.compresslevel,
+            queue_size=args.write_queue_size,
+            checkpoint=checkpoint,
+            append=append,
+        )
+    finally:
+        if ner_cache is not None:
+            ner_cache.close()
+        normalizer.close()
+    # new members are processed once their output is appended
+    if members_manifest is not None:
+        members_manifest.add({name: members[name] for name in new_members})
 
 
 if __name__ == "__main__":
@@ -181,6 +573,166 @@ if __name__ == "__main__":
         default=1000,
         help="The size of each batch in which a file is split.",
     )
+    parser.add_argument(
+        "--format",
+        choices=list(file_models),
+        default="ndjson",
+        help="The output file format, NDJSON batches in a zip file or Arrow IPC stream. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compression",
+        default="stored",
+        help="The output file compression: stored, deflate, bzip2, lzma, or zstd (Python 3.14+) for zip files; stored, lz4, or zstd for Arrow files. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--compresslevel",
+        type=int,
+        default=None,
+        help="The output file compression level. Default is the compression default.",
+    )
+    parser.add_argument(
+        "--write-queue-size",
+        type=int,
+        default=4,
+        help="The number of output batches produced ahead of the (compressed) write in a background thread. 0 writes synchronously. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--step-queue-size",
+        type=int,
+        default=0,
+        help="The number of batches buffered between the threads of input reading, and NER requests. 0 runs them sequentially. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        default=0,
+        help="The number of processes that decompress, and parse the input file. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Log a JSON report of items, and time of each pipeline step, and of the process peak memory.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        default=False,
+        help="Commit output batches to <output path>.ckpt, and resume from them after a failure. Requires the ndjson format, and sequential steps.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Process only the input zip members added since the previous run, listed in <output path>.members.json, and append their output batches. Requires the ndjson format.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["records", "dataframe"],
+        default="records",
+        help="Transform batches as lists of JSON datapoints, in input order, or as pandas.DataFrame, with duplicated datapoints last. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-model-id",
+        default="ner_ontonotes_bert_mult",
+        help="The identifier of the DeepPavlov NER model, part of the NER cache keys. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-cache-size",
+        type=int,
+        default=100000,
+        help="The number of NER results of texts kept in memory across batches. 0 disables the in-memory cache. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-cache-path",
+        default=None,
+        help="The path of a SQLite database that caches NER results of texts across runs.",
+    )
+    parser.add_argument(
+        "--ner-cache-disk-size",
+        type=int,
+        default=1000000,
+        help="The number of NER results of texts kept in the SQLite database, least recently used are evicted. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-cache-ttl",
+        type=float,
+        default=None,
+        help="The seconds after which a cached NER result expires. Default is never.",
+    )
+    parser.add_argument(
+        "--ner-in-flight",
+        type=int,
+        default=1,
+        help="The number of batches tagged concurrently by the NER API, over pooled keep-alive connections. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-timeout",
+        type=float,
+        default=600,
+        help="The seconds after which a NER request times out. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-retries",
+        type=int,
+        default=3,
+        help="The number of retries of a NER request after a connection error, timeout, or server error. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-backoff",
+        type=float,
+        default=1.0,
+        help="The seconds before the first retry of a NER request, doubled at each retry. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-length-buckets",
+        nargs="*",
+        type=int,
+        default=None,
+        help="The token lengths that bound the buckets of texts tagged in separate NER requests e.g. 16 32 64, so that short texts are not padded to the longest ones. Default is one request per batch.",
+    )
+    parser.add_argument(
+        "--ner-length-window",
+        type=int,
+        default=0,
+        help="The number of texts sorted, and bucketed by token length together. Default is %(default)s i.e. the texts of a batch.",
+    )
+    parser.add_argument(
+        "--ner-target-latency",
+        type=float,
+        default=None,
+        help="The seconds towards which the size of NER requests is adjusted, from their observed latency, and payload bytes. Default is one request per batch, or length bucket.",
+    )
+    parser.add_argument(
+        "--ner-min-request-size",
+        type=int,
+        default=10,
+        help="The minimum number of texts of an adaptive NER request. Default is %(default)s.",
+    )
+    parser.add_argument(
+        "--ner-max-request-size",
+        type=int,
+        default=None,
+        help="The maximum number of texts of an adaptive NER request. Default is the batch size.",
+    )
+    parser.add_argument(
+        "--normalize-workers",
+        type=int,
+        default=0,
+        help="The number of processes that normalize the texts of batches larger than 1000. Default is %(default)s i.e. sequential.",
+    )
+    parser.add_argument(
+        "--near-duplicates",
+        action="store_true",
+        default=False,
+        help="Tag only one text of each cluster of near-duplicate texts of a batch e.g. that differ by URLs, user mentions, or RT prefix, and map its place candidates onto the others.",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=0.8,
+        help="The MinHash estimated Jaccard similarity of word 3-grams above which texts are near duplicates. Default is %(default)s.",
+    )
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument(
         "--version",
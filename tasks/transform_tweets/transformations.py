@@ -1,19 +1,38 @@
+import multiprocessing
 import os
 import re
-import json
 import pandas
 import string
 import requests
+import time
 import typing
 
+from libdrm import jsoncodec
 
 # typing
 pandas_series = pandas.core.series.Series
 pandas_df = pandas.core.frame.DataFrame
 
 
-def tag_with_mult_bert(texts: list) -> requests.Response:
-    """DeepPavlov Named Entity Recognition REST API call to tag a list of texts."""
+def make_session(pool_size: int = 1) -> requests.Session:
+    """HTTP session that keeps up to pool_size connections alive to the NER API."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    return session
+
+
+def tag_with_mult_bert(
+    texts: list,
+    session: requests.Session = None,
+    timeout: float = None,
+    retries: int = 0,
+    backoff: float = 1.0,
+) -> requests.Response:
+    """DeepPavlov Named Entity Recognition REST API call to tag a list of texts.
+    Requests are sent with session, if any, to reuse its connections. Connection errors,
+    timeouts, and server errors are retried up to retries times, after backoff seconds
+    doubled at each attempt."""
     headers = {
         "accept": "application/json",
         "Content-Type": "application/json",
@@ -22,51 +41,75 @@ def tag_with_mult_bert(texts: list) -> requests.Response:
     url = "http://{host}:{port}/{endpoint}".format(
         host="deeppavlov", port=5000, endpoint="model/annotate"
     )
-    r = requests.post(url, headers=headers, data=json.dumps({"texts": texts}))
-    return r.json()
+    data = jsoncodec.dumps({"texts": texts}).encode("utf-8")
+    post = requests.post if session is None else session.post
+    for attempt in range(retries + 1):
+        try:
+            r = post(url, headers=headers, data=data, timeout=timeout)
+            if r.status_code >= 500:
+                r.raise_for_status()
+            return r.json()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+def compile_allowed_tags(
+    allowed_tags: typing.List[str],
+) -> typing.Tuple[typing.FrozenSet[str], typing.Dict[str, str]]:
+    """Allowed tags, and the place type of the allowed B-<type> tags, for fast lookups."""
+    allowed = frozenset(allowed_tags)
+    begin_types = {tag: tag.split("-")[1] for tag in allowed if "B-" in tag}
+    return allowed, begin_types
+
+
+def decode_bio_spans(
+    y_hat: typing.List[list],
+    allowed: typing.FrozenSet[str],
+    begin_types: typing.Dict[str, str],
+) -> typing.List[typing.List[tuple]]:
+    """Place candidate spans of a batch of DeepPavlov output, in one pass over the tags.
+
+    A span starts at each allowed B-<tag>, and ends before the first tag that is not
+    allowed, whatever its type. Spans of a run of allowed tags end together, and may
+    overlap. Each span is (type, start, end, name) with token indices, and name joins
+    its alphanumeric tokens, as non-alphanumeric tokens might be wrongly tagged."""
+    batch_spans = []
+    for tokens, tags in zip(*y_hat):
+        spans = []
+        # allowed tags are visited backwards, so that the end of their run is known,
+        # and the name of a span is the suffix of the alphanumeric tokens of the run
+        end = next_position = -1
+        suffix = []
+        for position in reversed([i for i, tag in enumerate(tags) if tag in allowed]):
+            if position + 1 != next_position:
+                end = position + 1
+                suffix = []
+            next_position = position
+            token = tokens[position]
+            if token.isalnum():
+                suffix.append(token)
+            tag_type = begin_types.get(tags[position])
+            if tag_type is not None:
+                spans.append((tag_type, position, end, " ".join(reversed(suffix))))
+        spans.reverse()
+        batch_spans.append(spans)
+    return batch_spans
 
 
 def extract_place_candidates(
     y_hat: typing.List[list], allowed_tags: typing.List[str]
 ) -> dict:
     """Extract place candidates given a set of tags allowed by the user."""
-
     place_candidates = list()
-    tokens, tags = y_hat
-
-    for index in range(len(tags)):
+    for spans in decode_bio_spans(y_hat, *compile_allowed_tags(allowed_tags)):
         candidates = dict()
-        curr_tags = tags[index]
-        curr_tokens = tokens[index]
-
-        for tag_id, tag in enumerate(curr_tags):
-
-            # place candidates always begin with B-<tag>
-            if "B-" in tag:
-                _, tag_type = tag.split("-")
-
-                # create a dictionary for this tag
-                if tag in allowed_tags and tag_type not in candidates:
-                    candidates[tag_type] = list()
-
-                # rebuild the place candidate using I-inside tags
-                # that come after the current B-<tag>
-                subset = []
-                future_tags = curr_tags[tag_id:]
-                for ftid, future_tag in enumerate(future_tags, start=tag_id):
-                    # break place candidate rebuilding when an unknown tag is reached
-                    if future_tag not in allowed_tags:
-                        break
-                    # token is a substring of place candidate
-                    token = curr_tokens[ftid]
-                    # non-alphanumeric strings might be wrongly tagged
-                    if not token.isalnum():
-                        continue
-                    subset.append(token)
-
-                # subset exists if place candidates are found
-                if subset:
-                    candidates[tag_type].append(" ".join(subset))
+        for tag_type, _, _, name in spans:
+            names = candidates.setdefault(tag_type, [])
+            # name exists if place candidates are found
+            if name:
+                names.append(name)
         place_candidates.append({"candidates": candidates or None})
     return place_candidates
 
@@ -81,6 +124,22 @@ def normalize_places(text: str, place_candidates: dict) -> str:
     return text
 
 
+def mask_places(
+    texts: typing.List[str], place_candidates: typing.List[typing.Optional[dict]]
+) -> typing.List[str]:
+    """normalize_places() of a batch of texts, and their place candidates, in one loop.
+    Place names are replaced in sequence, as later names may match across, or inside
+    the _loc_ tags of earlier ones."""
+    masked = []
+    for text, candidates in zip(texts, place_candidates):
+        if candidates:
+            for names in candidates.values():
+                for name in names:
+                    text = text.replace(name, "_loc_")
+        masked.append(text)
+    return masked
+
+
 # non natural language compiled regex
 ampersand = re.compile(r"\s+&amp;?\s+")
 user_mentions = re.compile(r"@[A-Za-z0-9_]+\b")
@@ -193,3 +252,58 @@ def apply_transformations(text: str) -> str:
     for func in funcs:
         tmp = func(tmp)
     return tmp.strip().lower()
+
+
+# character passes of apply_transformations() merged, and compiled: special chars
+# with quotes, backslashes, and hashtags, and punctuation. Deletions by regex are
+# faster than str.translate() tables on non-ASCII texts
+removed_chars = re.compile(r"[^\w\d\s:,.\(\)@\?!\/’_]+")
+# cheap necessary conditions of the token regexes, to skip most of their passes
+maybe_datetimes = re.compile(r"\d:|\d\s*[ap]", flags=re.IGNORECASE)
+punctuation = re.compile("[{}]+".format(re.escape(string.punctuation.replace("_", ""))))
+
+
+def normalize_text(text: str) -> str:
+    """Same output as apply_transformations() in fewer passes. The token regexes
+    run in the same order, as they overlap e.g. datetimes in URLs, and only if the
+    text may match them. Removed characters are deleted in one regex pass, and
+    punctuation is compiled once."""
+    if "&amp" in text:
+        text = ampersand.sub(" and ", text)
+    if "@" in text:
+        text = user_mentions.sub(" ", text)
+    if maybe_datetimes.search(text):
+        text = datetimes.sub(" ", text)
+    text = url.sub(" _url_ ", text)
+    # broken URLs end the text, or its last new line
+    if "http" in text[-6:].lower():
+        text = url_broken.sub(" _url_", text)
+    text = text.replace("\n", " ").replace("\r", "").lstrip("RT ")
+    text = more_than_two_whitespaces.sub(" ", removed_chars.sub("", text))
+    text = merge_duplicated_normalization_tags(text)
+    return punctuation.sub("", text).strip().lower()
+
+
+class TextNormalizer:
+    """Normalize batches of texts with normalize_text(). With workers > 1, batches
+    larger than chunk_size are split in chunks normalized by a pool of processes.
+    The pool is started on creation, so that it forks before any thread is started
+    e.g. by a pipeline, and stopped by close()."""
+
+    def __init__(self, workers: int = 0, chunk_size: int = 1000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pool = None
+        if workers > 1:
+            self.pool = multiprocessing.Pool(workers)
+
+    def __call__(self, texts: typing.List[str]) -> typing.List[str]:
+        if self.pool is not None and len(texts) > self.chunk_size:
+            return self.pool.map(normalize_text, texts, chunksize=self.chunk_size)
+        return [normalize_text(text) for text in texts]
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None